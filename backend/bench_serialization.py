@@ -0,0 +1,72 @@
+"""Throughput of the hospital list response body: FastAPI's default path vs FastJSONResponse.
+
+Usage: python bench_serialization.py [rows] [seconds]
+"""
+import sys
+import time
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import fast_json
+from fast_json import FastJSONResponse
+
+
+def make_hospitals(n):
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "name": f"Government Hospital {i}",
+            "type": "Government" if i % 2 else "Private",
+            "city": "Kovilpatti",
+            "state": "Tamil Nadu",
+            "address": "Main Road, Kovilpatti",
+            "lat": 9.1742 + i / 1e4,
+            "lng": 77.8697 - i / 1e4,
+            "phone": "+91 4632 222333",
+            "emergency": True,
+            "ambulance": i % 3 == 0,
+            "specialties": ["General Medicine", "Emergency", "Pediatrics"],
+            "rating": 4.0,
+            "beds": 200,
+            "image": "https://images.unsplash.com/photo-1697120508416-89675565948d?w=400",
+        }
+        for i in range(n)
+    ]
+
+
+def default_path(docs):
+    # What FastAPI does for a route returning a list without a response_model
+    return JSONResponse(jsonable_encoder(docs)).body
+
+
+def fast_path(docs):
+    return FastJSONResponse(docs).body
+
+
+def measure(fn, docs, seconds):
+    fn(docs)
+    runs = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        fn(docs)
+        runs += 1
+    elapsed = time.perf_counter() - started
+    return runs / elapsed, len(fn(docs))
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    docs = make_hospitals(rows)
+    encoder = "orjson" if fast_json.orjson is not None else "stdlib json (orjson not installed)"
+    print(f"{rows} hospitals, {seconds:.0f}s per case, fast path encoder: {encoder}")
+    baseline, size = measure(default_path, docs, seconds)
+    print(f"  jsonable_encoder + JSONResponse: {baseline:8.1f} responses/s  ({size} bytes)")
+    fast, size = measure(fast_path, docs, seconds)
+    print(f"  FastJSONResponse:                {fast:8.1f} responses/s  ({size} bytes)  {fast / baseline:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
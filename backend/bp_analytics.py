@@ -0,0 +1,151 @@
+"""Per-user BP rollups, maintained incrementally on every reading.
+
+Each ``bp_daily_rollups`` document holds running sums for one user and one local
+day, so any window up to ROLLUP_DAYS is answered from at most that many small
+documents instead of scanning ``bp_records``.
+
+Run ``python bp_analytics.py [user_id]`` to rebuild rollups from existing records.
+"""
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+ROLLUP_DAYS = 90
+WINDOWS = (7, 30, 90)
+MORNING_HOURS = range(4, 12)
+EVENING_HOURS = range(16, 24)
+LOCAL_TZ = timezone(timedelta(minutes=int(os.environ.get('BP_LOCAL_TZ_OFFSET_MINUTES', '330'))))
+
+
+def local_time(recorded_at: str) -> datetime:
+    return datetime.fromisoformat(recorded_at).astimezone(LOCAL_TZ)
+
+
+def rollup_increments(doc):
+    """Return (day, increments by field) contributed by one bp_records document."""
+    ts = local_time(doc["recorded_at"])
+    inc = {
+        "count": 1,
+        "systolic_sum": doc["systolic"],
+        "diastolic_sum": doc["diastolic"],
+        "high_count": 1 if doc.get("status") == "high" else 0,
+    }
+    if doc.get("pulse") is not None:
+        inc["pulse_sum"] = doc["pulse"]
+        inc["pulse_count"] = 1
+    part = "morning" if ts.hour in MORNING_HOURS else "evening" if ts.hour in EVENING_HOURS else None
+    if part:
+        inc[f"{part}.count"] = 1
+        inc[f"{part}.systolic_sum"] = doc["systolic"]
+        inc[f"{part}.diastolic_sum"] = doc["diastolic"]
+    return ts.date().isoformat(), inc
+
+
+def merge_increments(docs, merged=None):
+    """Combine the increments of many readings into one set per (user_id, day)."""
+    if merged is None:
+        merged = defaultdict(lambda: defaultdict(int))
+    for doc in docs:
+        day, inc = rollup_increments(doc)
+        target = merged[(doc["user_id"], day)]
+        for field, value in inc.items():
+            target[field] += value
+    return merged
+
+
+async def apply_readings(rollups, docs):
+    if docs:
+        await rollups.increment(merge_increments(docs))
+
+
+def _averages(count, systolic_sum, diastolic_sum):
+    if not count:
+        return {"count": 0, "systolic": None, "diastolic": None}
+    return {"count": count, "systolic": round(systolic_sum / count, 1), "diastolic": round(diastolic_sum / count, 1)}
+
+
+def summarize(rollups, today=None):
+    """Build window averages, morning/evening splits and trend flags from daily rollups."""
+    today = today or datetime.now(LOCAL_TZ).date()
+    result = {}
+    for days in WINDOWS:
+        since = (today - timedelta(days=days - 1)).isoformat()
+        window = [r for r in rollups if r["day"] >= since]
+        totals = defaultdict(int)
+        for r in window:
+            for field in ("count", "systolic_sum", "diastolic_sum", "pulse_sum", "pulse_count", "high_count"):
+                totals[field] += r.get(field, 0)
+            for part in ("morning", "evening"):
+                for field in ("count", "systolic_sum", "diastolic_sum"):
+                    totals[f"{part}.{field}"] += r.get(part, {}).get(field, 0)
+        summary = _averages(totals["count"], totals["systolic_sum"], totals["diastolic_sum"])
+        summary["pulse"] = round(totals["pulse_sum"] / totals["pulse_count"], 1) if totals["pulse_count"] else None
+        summary["hypertensive_episodes"] = totals["high_count"]
+        for part in ("morning", "evening"):
+            summary[part] = _averages(totals[f"{part}.count"], totals[f"{part}.systolic_sum"], totals[f"{part}.diastolic_sum"])
+        result[f"{days}d"] = summary
+
+    recent, baseline = result["7d"], result["30d"]
+    flags = []
+    if recent["count"] and (recent["systolic"] >= 140 or recent["diastolic"] >= 90):
+        flags.append("uncontrolled")
+    if recent["count"] and baseline["count"] > recent["count"]:
+        delta = recent["systolic"] - baseline["systolic"]
+        if delta >= 5:
+            flags.append("rising")
+        elif delta <= -5:
+            flags.append("falling")
+    morning, evening = recent["morning"], recent["evening"]
+    if morning["count"] and evening["count"] and morning["systolic"] - evening["systolic"] >= 15:
+        flags.append("morning_surge")
+    result["flags"] = flags
+    return result
+
+
+async def backfill(repos, user_id=None):
+    """Rebuild rollups from bp_records, for one user or everyone.
+
+    Records are streamed in user order and folded into per-day sums as they arrive, so
+    memory is bounded by one user's day count. Readings written while a user is being
+    rebuilt may be counted twice or missed; run it off-peak.
+    """
+    fields = ("user_id", "recorded_at", "systolic", "diastolic", "pulse", "status")
+    current, merged, users = None, None, 0
+
+    async for doc in repos.bp_records.scan(user_id, fields):
+        if doc["user_id"] != current and merged:
+            await repos.bp_rollups.replace_user(current, merged)
+            users += 1
+            merged = None
+        current = doc["user_id"]
+        merged = merge_increments([doc], merged)
+    if merged:
+        await repos.bp_rollups.replace_user(current, merged)
+        users += 1
+    elif user_id is not None:
+        # No readings left: clear whatever rollups the user had
+        await repos.bp_rollups.replace_user(user_id, {})
+        users += 1
+    return users
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+    from pathlib import Path
+
+    from dotenv import load_dotenv
+
+    from storage import create_repositories
+
+    async def main(user_id):
+        repos = create_repositories()
+        try:
+            await repos.prepare()
+            return await backfill(repos, user_id)
+        finally:
+            await repos.close()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    rebuilt = asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else None))
+    print(f"Rebuilt BP rollups for {rebuilt} users")
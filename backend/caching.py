@@ -0,0 +1,114 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries also expire after ``ttl`` seconds.
+
+    Not thread-safe; intended for use from the event loop only.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header matches ``etag`` (weak comparison, lists and ``*``)."""
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+class VersionedResponseCache:
+    """Serialized responses for read-heavy listings, invalidated by bumping a version.
+
+    Each entry carries a content-hash ETag, so ETags agree across workers serving the
+    same data. ``ttl`` bounds staleness for writes made by other processes.
+    """
+
+    def __init__(self, ttl=60.0):
+        self.ttl = ttl
+        self._versions = {}
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def bump(self, name):
+        self._versions[name] = self._versions.get(name, 0) + 1
+
+    def version(self, name):
+        return self._versions.get(name, 0)
+
+    def get(self, name):
+        entry = self._entries.get(name)
+        if entry and entry["version"] == self.version(name) and entry["expires_at"] > time.monotonic():
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def put(self, name, body: bytes, version=None):
+        entry = {
+            "version": self.version(name) if version is None else version,
+            "body": body,
+            "etag": '"' + hashlib.sha1(body).hexdigest() + '"',
+            "expires_at": time.monotonic() + self.ttl,
+        }
+        self._entries[name] = entry
+        return entry
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
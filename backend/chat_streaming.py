@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class StreamBuffer:
+    """Accumulates LLM output produced independently of the client connection.
+
+    The producer keeps appending deltas regardless of how fast the client reads;
+    the reader receives everything produced since its last read as one coalesced
+    chunk, so a slow connection gets fewer, larger events instead of a backlog.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._sent = 0
+        self._changed = asyncio.Event()
+        self.done = False
+        self.error = None
+
+    def push(self, delta: str):
+        if delta:
+            self._parts.append(delta)
+            self._changed.set()
+
+    def finish(self, error: str = None):
+        self.done = True
+        self.error = error
+        self._changed.set()
+
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def _take(self) -> str:
+        chunk = "".join(self._parts[self._sent:])
+        self._sent = len(self._parts)
+        return chunk
+
+    async def next_chunk(self, timeout: float):
+        """Return new text (possibly empty once done), or None if nothing arrived within timeout."""
+        if self._sent == len(self._parts) and not self.done:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        self._changed.clear()
+        return self._take()
+
+
+async def iter_llm_reply(chat, user_message):
+    """Yield the assistant reply incrementally when the client library supports it.
+
+    Falls back to a single chunk from send_message otherwise.
+    """
+    stream = getattr(chat, "stream_message", None)
+    if stream is None:
+        yield await chat.send_message(user_message)
+        return
+    async for delta in stream(user_message):
+        yield delta
+
+
+async def relay_sse(buffer: StreamBuffer, is_disconnected, session_id: str, heartbeat: float = 15.0):
+    yield sse_event("session", {"session_id": session_id})
+    while True:
+        chunk = await buffer.next_chunk(heartbeat)
+        # Read before awaiting again: anything pushed later is picked up by the next chunk
+        finished = buffer.done
+        if await is_disconnected():
+            return
+        if chunk is None:
+            # Comment line keeps idle mobile connections and proxies from timing out
+            yield ": ping\n\n"
+            continue
+        if chunk:
+            yield sse_event("delta", {"delta": chunk})
+        if finished:
+            if buffer.error:
+                yield sse_event("error", {"detail": buffer.error})
+            else:
+                yield sse_event("done", {"session_id": session_id, "response": buffer.text()})
+            return
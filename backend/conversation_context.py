@@ -0,0 +1,68 @@
+import re
+
+SUMMARY_LINE_CHARS = 160
+_SENTENCE_END = re.compile(r"(?<=[.!?।])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 UTF-8 bytes per token; weighting by bytes makes Indic scripts count
+    # heavier, which matches how BPE tokenizers treat them.
+    return max(1, len(text.encode("utf-8")) // 4)
+
+
+def condense(role: str, content: str) -> str:
+    first = _SENTENCE_END.split(content.strip(), maxsplit=1)[0]
+    if len(first) > SUMMARY_LINE_CHARS:
+        first = first[:SUMMARY_LINE_CHARS - 1].rstrip() + "…"
+    speaker = "Patient" if role == "user" else "CareLens"
+    return f"{speaker}: {first}"
+
+
+class ConversationContext:
+    """Prompt context for one chat session: recent turns verbatim plus a rolling summary.
+
+    Turns older than the token budget are folded into ``summary_lines`` (one condensed
+    line per turn), which is itself trimmed from the oldest end to its own budget.
+    """
+
+    def __init__(self, token_budget=2000, summary_budget=400, min_recent=4):
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.min_recent = min_recent
+        self.turns = []
+        self.summary_lines = []
+
+    @classmethod
+    def from_history(cls, history, **policy):
+        ctx = cls(**policy)
+        for msg in history:
+            ctx.turns.append({"role": msg["role"], "content": msg["content"]})
+        ctx.compact()
+        return ctx
+
+    def append(self, role: str, content: str):
+        self.turns.append({"role": role, "content": content})
+        self.compact()
+
+    def compact(self):
+        used = 0
+        keep = len(self.turns)
+        for i in range(len(self.turns) - 1, -1, -1):
+            used += estimate_tokens(self.turns[i]["content"])
+            if used > self.token_budget and len(self.turns) - i > self.min_recent:
+                break
+            keep = i
+        for turn in self.turns[:keep]:
+            self.summary_lines.append(condense(turn["role"], turn["content"]))
+        del self.turns[:keep]
+
+        total = sum(estimate_tokens(line) for line in self.summary_lines)
+        while self.summary_lines and total > self.summary_budget:
+            total -= estimate_tokens(self.summary_lines.pop(0))
+
+    @property
+    def summary(self) -> str:
+        return "\n".join(self.summary_lines)
+
+    def prompt_tokens(self) -> int:
+        return sum(estimate_tokens(t["content"]) for t in self.turns) + estimate_tokens(self.summary)
@@ -0,0 +1,57 @@
+import logging
+
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# (collection, keys, options) for every index the API's queries rely on
+REQUIRED_INDEXES = [
+    ("users", [("email", 1)], {"unique": True}),
+    ("users", [("id", 1)], {"unique": True}),
+    ("hospitals", [("id", 1)], {"unique": True}),
+    ("hospitals", [("location", "2dsphere")], {}),
+    ("hospitals", [("city_key", 1)], {}),
+    ("doctor_profiles", [("user_id", 1)], {"unique": True}),
+    ("doctor_profiles", [("location", "2dsphere")], {}),
+    ("doctor_profiles", [("available", 1)], {}),
+    ("bp_records", [("user_id", 1), ("recorded_at", -1)], {}),
+    ("bp_daily_rollups", [("user_id", 1), ("day", 1)], {"unique": True}),
+    ("chat_messages", [("session_id", 1), ("timestamp", 1)], {}),
+    ("chat_messages", [("user_id", 1), ("timestamp", 1)], {}),
+    ("chat_sessions", [("user_id", 1), ("session_id", 1)], {"unique": True}),
+    ("chat_sessions", [("user_id", 1), ("timestamp", -1)], {}),
+    ("ambulance_requests", [("id", 1)], {"unique": True}),
+    ("ambulance_requests", [("user_id", 1), ("created_at", -1)], {}),
+    ("ambulance_requests", [("status", 1)], {}),
+    ("user_stats", [("user_id", 1)], {"unique": True}),
+    ("data_versions", [("name", 1)], {"unique": True}),
+]
+
+
+async def ensure_indexes(db, indexes=REQUIRED_INDEXES):
+    """Create the required indexes and verify each one exists with the expected options.
+
+    A failure (e.g. duplicate emails blocking a unique index) is logged rather than
+    raised so the API still starts; the returned list names the indexes that are missing.
+    """
+    missing = []
+    for collection, keys, options in indexes:
+        try:
+            await db[collection].create_index(keys, **options)
+        except OperationFailure as e:
+            logger.error(f"Could not create index {collection}{keys}: {e}")
+
+    for collection, keys, options in indexes:
+        existing = await db[collection].index_information()
+        found = any(
+            [tuple(k) for k in info["key"]] == [tuple(k) for k in keys]
+            and bool(info.get("unique")) == bool(options.get("unique"))
+            for info in existing.values()
+        )
+        if not found:
+            missing.append(f"{collection}{keys}")
+    if missing:
+        logger.error(f"Missing required indexes: {', '.join(missing)}")
+    else:
+        logger.info(f"Verified {len(indexes)} required indexes")
+    return missing
@@ -0,0 +1,232 @@
+"""In-process ambulance dispatch: a priority queue of open requests matched to hospital units.
+
+The engine is synchronous and does no I/O; the API feeds it requests, runs ``match()``
+from a single dispatcher task and persists the resulting assignments.
+"""
+import heapq
+import itertools
+import math
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from facility_index import haversine_matrix
+
+# Higher is more urgent; keys match the emergency types offered by the app
+SEVERITY = {
+    "cardiac": 5,
+    "breathing": 5,
+    "accident": 4,
+    "pregnancy": 3,
+    "general": 2,
+    "other": 1,
+}
+DEFAULT_SEVERITY = 2
+
+
+def severity_of(emergency_type: str) -> int:
+    return SEVERITY.get((emergency_type or "").lower(), DEFAULT_SEVERITY)
+
+
+class SpeedModel:
+    """ETA from great-circle distance: a road-winding factor, average speed and a fixed turnout time."""
+
+    def __init__(self, speed_kmh=40.0, road_factor=1.3, turnout_minutes=2.0):
+        self.speed_kmh = speed_kmh
+        self.road_factor = road_factor
+        self.turnout_minutes = turnout_minutes
+
+    def eta_minutes(self, distance_km: float) -> int:
+        return math.ceil(self.turnout_minutes + self.drive_minutes(distance_km))
+
+    def drive_minutes(self, distance_km: float) -> float:
+        # For a unit already on the road: no turnout time
+        return distance_km * self.road_factor / self.speed_kmh * 60
+
+    def reach_km(self, eta_minutes: float) -> float:
+        """Farthest distance whose ETA is within ``eta_minutes``."""
+        return max(eta_minutes - self.turnout_minutes, 0.0) * self.speed_kmh / 60 / self.road_factor
+
+
+@dataclass
+class DispatchRequest:
+    id: str
+    lat: float
+    lng: float
+    severity: int
+    created_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class Assignment:
+    request_id: str
+    hospital: dict
+    distance_km: float
+    eta_minutes: int
+    busy_until: float
+
+
+class DispatchEngine:
+    """Matches queued requests to the nearest ambulance-equipped hospital with a free unit.
+
+    Queue order is a single static key, ``created_at - severity * severity_headstart``:
+    each severity level counts as having waited ``severity_headstart`` seconds longer,
+    so urgent calls go first but a long wait eventually outranks severity.
+    ``match()`` assigns greedily in priority order, taking ``batch_size`` requests at a
+    time against one vectorized request x hospital distance matrix, until the queue is
+    exhausted or no unit is free.
+    Units farther than ``max_distance_km`` (or with an ETA over ``max_eta_minutes``)
+    are never assigned: the request keeps waiting for a nearer unit to come back, and
+    is dropped once it has waited ``max_queue_minutes``. ``expire()`` releases finished
+    missions and drops those requests; call it before ``match()``.
+    """
+
+    def __init__(self, speed_model=None, units_per_hospital=2, severity_headstart=300.0,
+                 batch_size=256, on_scene_minutes=30.0, max_distance_km=None, max_eta_minutes=None,
+                 max_queue_minutes=None):
+        self.speed_model = speed_model or SpeedModel()
+        self.units_per_hospital = units_per_hospital
+        self.severity_headstart = severity_headstart
+        self.batch_size = batch_size
+        self.on_scene_minutes = on_scene_minutes
+        self.max_distance_km = min(
+            max_distance_km or math.inf,
+            self.speed_model.reach_km(max_eta_minutes) if max_eta_minutes else math.inf,
+        )
+        self.max_queue_minutes = max_queue_minutes
+        self._queue = []
+        self._seq = itertools.count()
+        self._queued = {}  # request_id -> seq of its live heap entry
+        self._missions = {}  # request_id -> (hospital_id, busy_until)
+        self._busy = {}  # hospital_id -> units out on missions
+        self.hospitals = []
+        self._index = {}
+        self._lat = np.empty(0)
+        self._lng = np.empty(0)
+        self._capacity = np.empty(0, dtype=np.int64)
+        self.dispatched = 0
+
+    def load_fleet(self, hospitals):
+        """Replace the set of dispatching hospitals; missions in progress are kept."""
+        fleet = [h for h in hospitals if h.get("ambulance") and h.get("id")]
+        self.hospitals = fleet
+        self._index = {h["id"]: i for i, h in enumerate(fleet)}
+        self._lat = np.radians(np.array([h["lat"] for h in fleet], dtype=np.float64))
+        self._lng = np.radians(np.array([h["lng"] for h in fleet], dtype=np.float64))
+        self._capacity = np.array([h.get("ambulance_units", self.units_per_hospital) for h in fleet], dtype=np.int64)
+
+    def submit(self, request: DispatchRequest):
+        if request.id in self._queued:
+            return
+        key = request.created_at - request.severity * self.severity_headstart
+        seq = next(self._seq)
+        heapq.heappush(self._queue, (key, seq, request))
+        self._queued[request.id] = seq
+
+    def cancel(self, request_id):
+        # The heap entry is dropped lazily when it reaches the front
+        return self._queued.pop(request_id, None) is not None
+
+    def occupy(self, hospital_id, request_id, busy_until):
+        """Record a mission already in progress (e.g. restored after a restart)."""
+        if request_id not in self._missions:
+            self._missions[request_id] = (hospital_id, busy_until)
+            self._busy[hospital_id] = self._busy.get(hospital_id, 0) + 1
+
+    def release(self, request_id):
+        mission = self._missions.pop(request_id, None)
+        if mission:
+            hospital_id = mission[0]
+            self._busy[hospital_id] -= 1
+            if not self._busy[hospital_id]:
+                del self._busy[hospital_id]
+        return mission is not None
+
+    def expire(self, now=None):
+        """Release missions whose unit is back and drop requests that waited too long.
+
+        Returns (finished request ids, timed-out request ids).
+        """
+        now = now or time.time()
+        finished = [request_id for request_id, (_, busy_until) in self._missions.items() if busy_until <= now]
+        for request_id in finished:
+            self.release(request_id)
+        timed_out = []
+        if self.max_queue_minutes:
+            cutoff = now - self.max_queue_minutes * 60
+            for _, seq, request in self._queue:
+                if request.created_at <= cutoff and self._queued.get(request.id) == seq:
+                    # The heap entry is dropped lazily, as for cancel()
+                    del self._queued[request.id]
+                    timed_out.append(request.id)
+        return finished, timed_out
+
+    def free_units(self):
+        free = self._capacity.copy()
+        for hospital_id, busy in self._busy.items():
+            i = self._index.get(hospital_id)
+            if i is not None:
+                free[i] -= busy
+        return free
+
+    def match(self, now=None):
+        now = now or time.time()
+        if not self._queue or not len(self.hospitals):
+            return []
+        free = self.free_units()
+        free_total = int(free.clip(min=0).sum())
+        if free_total <= 0:
+            return []
+
+        assignments = []
+        held = []  # live entries that stay queued, pushed back once the pass is over
+        while self._queue and free_total > 0:
+            batch = []
+            while self._queue and len(batch) < self.batch_size:
+                entry = heapq.heappop(self._queue)
+                if self._queued.get(entry[2].id) == entry[1]:
+                    batch.append(entry)
+            if not batch:
+                break
+            requests = [entry[2] for entry in batch]
+            dist = haversine_matrix(
+                np.radians([r.lat for r in requests]), np.radians([r.lng for r in requests]), self._lat, self._lng
+            )
+            for i, (entry, request) in enumerate(zip(batch, requests)):
+                if free_total <= 0:
+                    # Out of units: this and every lower-priority request stay queued
+                    held.extend(batch[i:])
+                    break
+                row = np.where((free > 0) & (dist[i] <= self.max_distance_km), dist[i], np.inf)
+                j = int(np.argmin(row))
+                if not np.isfinite(row[j]):
+                    # No free unit within reach: wait for a nearer one rather than send one from afar,
+                    # and let lower-priority requests near a free unit go ahead
+                    held.append(entry)
+                    continue
+                free[j] -= 1
+                free_total -= 1
+                hospital = self.hospitals[j]
+                distance_km = float(row[j])
+                eta = self.speed_model.eta_minutes(distance_km)
+                # Unit is back after driving out, time on scene and the trip to hospital
+                busy_until = now + (2 * eta + self.on_scene_minutes) * 60
+                del self._queued[request.id]
+                self.occupy(hospital["id"], request.id, busy_until)
+                self.dispatched += 1
+                assignments.append(Assignment(request.id, hospital, distance_km, eta, busy_until))
+        for entry in held:
+            heapq.heappush(self._queue, entry)
+        return assignments
+
+    def stats(self):
+        free = self.free_units()
+        return {
+            "queued": len(self._queued),
+            "active_missions": len(self._missions),
+            "hospitals": len(self.hospitals),
+            "free_units": int(free.clip(min=0).sum()) if len(free) else 0,
+            "dispatched": self.dispatched,
+            "max_distance_km": round(self.max_distance_km, 1) if math.isfinite(self.max_distance_km) else None,
+        }
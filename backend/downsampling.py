@@ -0,0 +1,50 @@
+import numpy as np
+
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of ``threshold`` points that preserve the shape of y(x).
+
+    The first and last points are always kept. Returns all indices if there are no more
+    than ``threshold`` points.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def minmax_indices(series, threshold):
+    """Per equal-count bucket, keep the indices of each series' minimum and maximum.
+
+    Unlike LTTB this never drops an extreme reading, at the cost of up to
+    2 * len(series) points per bucket.
+    """
+    n = len(series[0]) if series else 0
+    if n <= threshold:
+        return np.arange(n)
+    buckets = max(1, threshold // (2 * len(series)))
+    arrays = [np.asarray(values, dtype=np.float64) for values in series]
+    keep = set()
+    for bucket in np.array_split(np.arange(n), buckets):
+        for values in arrays:
+            chunk = values[bucket]
+            keep.add(int(bucket[np.argmin(chunk)]))
+            keep.add(int(bucket[np.argmax(chunk)]))
+    return np.array(sorted(keep), dtype=np.int64)
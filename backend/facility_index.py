@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+# Rows of the origin x facility distance matrix computed at once; keeps the
+# working set around a few MB even for large snapshots.
+ORIGIN_CHUNK = 256
+
+
+def haversine_matrix(origin_lat, origin_lng, lat, lng):
+    """Great-circle distances (km) between every origin and every facility.
+
+    All inputs are in radians; returns an array of shape (len(origins), len(facilities)).
+    """
+    dlat = lat[None, :] - origin_lat[:, None]
+    dlng = lng[None, :] - origin_lng[:, None]
+    a = np.sin(dlat / 2) ** 2 + np.cos(origin_lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class FacilitySnapshot:
+    """Immutable array-backed copy of the hospitals collection for k-nearest lookups."""
+
+    def __init__(self, docs, version=0):
+        docs = [d for d in docs if isinstance(d.get("lat"), (int, float)) and isinstance(d.get("lng"), (int, float))]
+        self.docs = docs
+        self.version = version
+        self.lat = np.radians(np.array([d["lat"] for d in docs], dtype=np.float64))
+        self.lng = np.radians(np.array([d["lng"] for d in docs], dtype=np.float64))
+        self.emergency = np.array([bool(d.get("emergency")) for d in docs], dtype=bool)
+        self.ambulance = np.array([bool(d.get("ambulance")) for d in docs], dtype=bool)
+        self._specialties = [{s.lower() for s in d.get("specialties", [])} for d in docs]
+        self._specialty_masks = {}
+        self._derived = {}
+
+    def derived(self, name, factory):
+        """Memoize ``factory(docs)`` for the lifetime of this snapshot."""
+        if name not in self._derived:
+            self._derived[name] = factory(self.docs)
+        return self._derived[name]
+
+    def __len__(self):
+        return len(self.docs)
+
+    def specialty_mask(self, specialty):
+        key = specialty.strip().lower()
+        mask = self._specialty_masks.get(key)
+        if mask is None:
+            mask = np.array([key in s for s in self._specialties], dtype=bool)
+            self._specialty_masks[key] = mask
+        return mask
+
+    def filter_mask(self, emergency=None, ambulance=None, specialty=None):
+        mask = np.ones(len(self.docs), dtype=bool)
+        if emergency is not None:
+            mask &= self.emergency == emergency
+        if ambulance is not None:
+            mask &= self.ambulance == ambulance
+        if specialty:
+            mask &= self.specialty_mask(specialty)
+        return mask
+
+    def count_within(self, lat, lng, radius_km, mask=None):
+        if not self.docs:
+            return 0
+        dist = haversine_matrix(np.radians([lat]), np.radians([lng]), self.lat, self.lng)[0]
+        within = dist <= radius_km
+        if mask is not None:
+            within &= mask
+        return int(within.sum())
+
+    def nearest(self, origins, k=3, radius_km=None, mask=None):
+        """Return, for each (lat, lng) origin, up to k (doc_index, distance_km) pairs sorted by distance."""
+        candidates = np.arange(len(self.docs)) if mask is None else np.flatnonzero(mask)
+        if not origins:
+            return []
+        if len(candidates) == 0 or k <= 0:
+            return [[] for _ in origins]
+
+        lat, lng = self.lat[candidates], self.lng[candidates]
+        k = min(k, len(candidates))
+        coords = np.radians(np.asarray(origins, dtype=np.float64).reshape(-1, 2))
+        results = []
+        for start in range(0, len(coords), ORIGIN_CHUNK):
+            chunk = coords[start:start + ORIGIN_CHUNK]
+            dist = haversine_matrix(chunk[:, 0], chunk[:, 1], lat, lng)
+            if radius_km is not None:
+                dist[dist > radius_km] = np.inf
+            top = np.argpartition(dist, k - 1, axis=1)[:, :k]
+            top_dist = np.take_along_axis(dist, top, axis=1)
+            order = np.argsort(top_dist, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_dist = np.take_along_axis(top_dist, order, axis=1)
+            for row_idx, row_dist in zip(top, top_dist):
+                results.append([(int(candidates[i]), float(d)) for i, d in zip(row_idx, row_dist) if np.isfinite(d)])
+        return results
+
+
+class FacilitySnapshotCache:
+    """Holds the current FacilitySnapshot and rebuilds it when invalidated or older than ttl seconds.
+
+    ``loader`` is an async callable returning the facility documents. Writers in this
+    process call ``invalidate()``; the ttl picks up writes made by other workers.
+    """
+
+    def __init__(self, loader, ttl=300.0):
+        self._loader = loader
+        self._ttl = ttl
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._version = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._version += 1
+
+    def _fresh(self):
+        return (
+            self._snapshot is not None
+            and self._snapshot.version == self._version
+            and time.monotonic() - self._loaded_at < self._ttl
+        )
+
+    async def get(self):
+        if self._fresh():
+            return self._snapshot
+        async with self._lock:
+            if not self._fresh():
+                version = self._version
+                docs = await self._loader()
+                self._snapshot = FacilitySnapshot(docs, version)
+                self._loaded_at = time.monotonic()
+        return self._snapshot
@@ -0,0 +1,33 @@
+import json
+from typing import Any
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used when unavailable
+    orjson = None
+
+
+def _default(value):
+    # datetimes and other scalars Mongo may hand back; orjson handles datetimes itself
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+
+class FastJSONResponse(Response):
+    """JSON response for plain Mongo documents (already projected without ``_id``).
+
+    Returning it from a route skips FastAPI's generic jsonable_encoder pass, and the
+    body is encoded with orjson when installed.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,393 @@
+"""Streaming import of hospital registries (CSV or NDJSON) into the hospitals collection.
+
+Input is read in chunks, one record at a time, normalized into the API's hospital
+shape and upserted in batches keyed by a stable facility id, so memory stays bounded
+by one batch whatever the file size. Re-importing a registry updates the same
+documents; fields the registry does not carry (rating, image, ...) are left alone.
+
+Run ``python hospital_import.py FILE --source NAME`` for scheduled refreshes; the
+API exposes the same importer at ``POST /api/hospitals/import``.
+"""
+import codecs
+import csv
+import json
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from places import CITY_ALIASES, normalize_place
+
+BATCH_SIZE = 500
+# (min_lat, max_lat, min_lng, max_lng) every facility must fall in: India by default
+INDIA_BOUNDS = (6.0, 37.6, 68.0, 97.5)
+MAX_RECORD_BYTES = 16384
+MAX_REPORTED_ERRORS = 100
+FACILITY_NAMESPACE = uuid.UUID("6f1c4e2a-9b7d-4c1e-8a53-2d0b6e9f4a17")
+
+# Registry column names (normalized to snake_case) -> hospital fields
+COLUMN_ALIASES = {
+    "id": "registry_id", "facility_id": "registry_id", "hospital_id": "registry_id", "nin": "registry_id",
+    "nin_id": "registry_id", "registration_no": "registry_id", "registration_number": "registry_id",
+    "name": "name", "hospital_name": "name", "facility_name": "name",
+    "lat": "lat", "latitude": "lat",
+    "lng": "lng", "lon": "lng", "long": "lng", "longitude": "lng",
+    "city": "city", "town": "city", "city_town": "city", "location": "city",
+    "district": "district", "state": "state", "state_name": "state",
+    "address": "address", "full_address": "address",
+    "phone": "phone", "telephone": "phone", "contact": "phone", "contact_number": "phone", "mobile": "phone",
+    "type": "type", "category": "type", "ownership": "type", "hospital_type": "type",
+    "emergency": "emergency", "emergency_services": "emergency", "casualty": "emergency",
+    "ambulance": "ambulance", "ambulance_service": "ambulance",
+    "specialties": "specialties", "specialities": "specialties", "departments": "specialties",
+    "beds": "beds", "total_beds": "beds", "bed_count": "beds", "number_of_beds": "beds",
+}
+TRUE_VALUES = {"1", "true", "yes", "y", "t", "available"}
+FALSE_VALUES = {"0", "false", "no", "n", "f", "", "na", "n/a", "not available"}
+LIST_SEPARATORS = re.compile(r"\s*[;|,]\s*")
+_COLUMN = re.compile(r"[^0-9a-z]+")
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def column_name(raw):
+    return _COLUMN.sub("_", raw.strip().lower()).strip("_")
+
+
+def clean_text(value):
+    return " ".join(str(value).split()) if value is not None else ""
+
+
+def display_place(name, aliases=None):
+    """Tidy a place name; names in ``aliases`` map to the spelling our data uses."""
+    name = clean_text(name)
+    if not name:
+        return ""
+    canonical = (aliases or {}).get(normalize_place(name))
+    if canonical:
+        return canonical.title()
+    # Registries often shout; keep mixed-case names as written
+    return name.title() if name.isupper() or name.islower() else name
+
+
+def parse_coordinate(value, limit):
+    if value is None or isinstance(value, bool):
+        raise InvalidRecord("missing coordinate")
+    if isinstance(value, str):
+        value = value.strip().replace(",", ".")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise InvalidRecord(f"bad coordinate {value!r}")
+    if not -limit <= number <= limit or number != number:
+        raise InvalidRecord(f"coordinate out of range {value!r}")
+    return round(number, 6)
+
+
+def parse_bounds(text):
+    """``"min_lat,max_lat,min_lng,max_lng"`` -> tuple; an empty string means no bounds."""
+    if not text or not text.strip():
+        return None
+    bounds = tuple(float(v) for v in text.split(","))
+    if len(bounds) != 4 or bounds[0] >= bounds[1] or bounds[2] >= bounds[3]:
+        raise ValueError(f"bad bounds {text!r}: expected min_lat,max_lat,min_lng,max_lng")
+    return bounds
+
+
+def within(bounds, lat, lng):
+    min_lat, max_lat, min_lng, max_lng = bounds
+    return min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+
+
+def place_coordinates(lat, lng, bounds):
+    """Check a (lat, lng) pair, swapping it back if the source transposed the columns."""
+    if bounds:
+        if within(bounds, lat, lng):
+            return lat, lng
+        if within(bounds, lng, lat):
+            return lng, lat
+        raise InvalidRecord(f"coordinates ({lat}, {lng}) outside the expected region")
+    if abs(lat) > 90:
+        # Columns swapped in the source
+        lat, lng = lng, lat
+    if abs(lat) > 90:
+        raise InvalidRecord("coordinate out of range")
+    return lat, lng
+
+
+def parse_bool(value):
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    text = clean_text(value).lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise InvalidRecord(f"bad flag {value!r}")
+
+
+def facility_id(source, registry_id, name, city, state):
+    """Stable id: the same registry row maps to the same hospital on every import."""
+    if registry_id:
+        key = f"{source}|{registry_id}"
+    else:
+        key = f"{source}|{normalize_place(name)}|{normalize_place(city)}|{normalize_place(state)}"
+    return str(uuid.uuid5(FACILITY_NAMESPACE, key))
+
+
+def normalize_facility(record, source, bounds=INDIA_BOUNDS):
+    """Map one registry record to a hospital document; raises InvalidRecord.
+
+    With ``bounds``, coordinates must fall inside them (either way round, since
+    registries do swap the columns); without, only their range is checked.
+    """
+    raw = {}
+    for key, value in record.items():
+        target = COLUMN_ALIASES.get(column_name(key or ""))
+        if target and target not in raw and value not in (None, ""):
+            raw[target] = value
+
+    name = clean_text(raw.get("name"))
+    if not name:
+        raise InvalidRecord("missing name")
+    lat = parse_coordinate(raw.get("lat"), 180)
+    lng = parse_coordinate(raw.get("lng"), 180)
+    if lat == 0 and lng == 0:
+        raise InvalidRecord("missing coordinates (0, 0)")
+    lat, lng = place_coordinates(lat, lng, bounds)
+
+    city = display_place(raw.get("city") or raw.get("district"), CITY_ALIASES)
+    state = display_place(raw.get("state"))
+    registry_id = clean_text(raw.get("registry_id"))
+    doc = {
+        "id": facility_id(source, registry_id, name, city, state),
+        "name": name,
+        "city": city,
+        "state": state,
+        "lat": lat,
+        "lng": lng,
+        "source": source,
+    }
+    if registry_id:
+        doc["registry_id"] = registry_id
+    if raw.get("district"):
+        doc["district"] = display_place(raw["district"])
+    for key in ("address", "phone", "type"):
+        if raw.get(key):
+            doc[key] = clean_text(raw[key])
+    for key in ("emergency", "ambulance"):
+        if key in raw:
+            doc[key] = parse_bool(raw[key])
+    if raw.get("specialties"):
+        values = raw["specialties"]
+        if isinstance(values, str):
+            values = LIST_SEPARATORS.split(values)
+        doc["specialties"] = [clean_text(v) for v in values if clean_text(v)]
+    if raw.get("beds") not in (None, ""):
+        try:
+            doc["beds"] = int(float(raw["beds"]))
+        except (TypeError, ValueError):
+            raise InvalidRecord(f"bad beds {raw['beds']!r}")
+    return doc
+
+
+async def iter_lines(chunks, max_bytes=MAX_RECORD_BYTES):
+    """Yield (line_no, text) from an async iterator of byte chunks; over-long lines yield None."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    line_no = 0
+    oversized = False
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            line_no += 1
+            if oversized:
+                oversized = False
+                yield line_no, None
+            else:
+                yield line_no, line if len(line) <= max_bytes else None
+        if len(pending) > max_bytes:
+            oversized = True
+            pending = ""
+    pending += decoder.decode(b"", final=True)
+    if pending or oversized:
+        yield line_no + 1, None if oversized else pending
+
+
+async def iter_records(chunks, fmt, max_bytes=MAX_RECORD_BYTES):
+    """Yield (line_no, record dict or error string) for CSV (with header) or NDJSON input."""
+    if fmt == "ndjson":
+        async for line_no, line in iter_lines(chunks, max_bytes):
+            if line is None:
+                yield line_no, "line too long"
+            elif line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield line_no, f"invalid JSON: {e}"
+                    continue
+                yield line_no, record if isinstance(record, dict) else "expected a JSON object"
+        return
+
+    header = None
+    parts, start = [], None
+    async for line_no, line in iter_lines(chunks, max_bytes):
+        if line is None:
+            parts, start = [], None
+            yield line_no, "line too long"
+            continue
+        if start is None:
+            start = line_no
+        parts.append(line)
+        text = "\n".join(parts)
+        # A quoted field may span lines: wait until the quotes balance
+        if text.count('"') % 2:
+            if len(text) > max_bytes:
+                parts, start = [], None
+                yield line_no, "record too long"
+            continue
+        parts, record_line, start = [], start, None
+        if not text.strip():
+            continue
+        row = next(csv.reader([text]))
+        if header is None:
+            header = row
+            continue
+        if len(row) != len(header):
+            yield record_line, f"expected {len(header)} columns, got {len(row)}"
+            continue
+        yield record_line, dict(zip(header, row))
+    if parts:
+        yield start, "unterminated quoted field"
+
+
+@dataclass
+class ImportProgress:
+    source: str
+    fmt: str
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: str = "running"
+    rows: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    inserted: int = 0
+    updated: int = 0
+    batches: int = 0
+    truncated: bool = False
+    started_at: float = field(default_factory=time.time)
+    finished_at: float = None
+    error: str = None
+    errors: list = field(default_factory=list)
+
+    def reject(self, line_no, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": message})
+
+    def as_dict(self):
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "id": self.id, "source": self.source, "format": self.fmt, "status": self.status,
+            "rows": self.rows, "accepted": self.accepted, "rejected": self.rejected,
+            "inserted": self.inserted, "updated": self.updated, "batches": self.batches,
+            "truncated": self.truncated, "elapsed_s": round(elapsed, 1),
+            "rows_per_s": round(self.rows / elapsed, 1) if elapsed > 0 else None,
+            "error": self.error, "errors": self.errors,
+        }
+
+
+async def import_hospitals(hospitals, chunks, fmt, source, progress=None, batch_size=BATCH_SIZE,
+                           max_rows=None, on_batch=None, bounds=INDIA_BOUNDS):
+    """Stream ``chunks`` into ``hospitals.upsert_many``; returns the ImportProgress.
+
+    ``on_batch(progress)`` is awaited after every written batch. Rows sharing an id
+    within one batch collapse to the last one; across batches the later row wins.
+    """
+    progress = progress or ImportProgress(source, fmt)
+    batch = {}
+
+    async def flush():
+        if batch:
+            inserted, updated = await hospitals.upsert_many(list(batch.values()))
+            progress.inserted += inserted
+            progress.updated += updated
+            progress.batches += 1
+            batch.clear()
+            if on_batch:
+                await on_batch(progress)
+
+    try:
+        async for line_no, record in iter_records(chunks, fmt):
+            progress.rows += 1
+            if max_rows and progress.rows > max_rows:
+                progress.rows -= 1
+                progress.truncated = True
+                break
+            if isinstance(record, str):
+                progress.reject(line_no, record)
+                continue
+            try:
+                doc = normalize_facility(record, source, bounds)
+            except InvalidRecord as e:
+                progress.reject(line_no, str(e))
+                continue
+            batch[doc["id"]] = doc
+            progress.accepted += 1
+            if len(batch) >= batch_size:
+                await flush()
+        await flush()
+        progress.status = "completed"
+    except Exception as e:
+        progress.status = "failed"
+        progress.error = str(e)
+        raise
+    finally:
+        progress.finished_at = time.time()
+    return progress
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import sys
+    from pathlib import Path
+
+    from dotenv import load_dotenv
+
+    from storage import create_repositories
+
+    parser = argparse.ArgumentParser(description="Import a hospital registry (CSV or NDJSON).")
+    parser.add_argument("file")
+    parser.add_argument("--source", required=True, help="registry name; part of every facility id")
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--bounds", type=parse_bounds, default=INDIA_BOUNDS,
+                        help="min_lat,max_lat,min_lng,max_lng facilities must fall in (default: India; '' for none)")
+    args = parser.parse_args()
+    fmt = args.format or ("ndjson" if args.file.endswith((".ndjson", ".jsonl")) else "csv")
+
+    async def read_file(path, size=1 << 16):
+        with open(path, "rb") as f:
+            while chunk := f.read(size):
+                yield chunk
+
+    async def report(progress):
+        print(f"\r{progress.rows} rows, {progress.inserted} new, {progress.updated} updated, "
+              f"{progress.rejected} rejected", end="", file=sys.stderr, flush=True)
+
+    async def main():
+        repos = create_repositories()
+        try:
+            await repos.prepare()
+            return await import_hospitals(repos.hospitals, read_file(args.file), fmt, args.source,
+                                          batch_size=args.batch_size, on_batch=report, bounds=args.bounds)
+        finally:
+            await repos.close()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    result = asyncio.run(main()).as_dict()
+    print(file=sys.stderr)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,174 @@
+import asyncio
+import math
+import time
+from dataclasses import dataclass, replace
+
+from caching import TTLCache
+
+
+class RateLimited(Exception):
+    """The caller is over their own request rate; retry after ``retry_after`` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"rate limited, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class LlmOverloaded(Exception):
+    """No LLM slot freed up before the caller's deadline, or the wait queue is full."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"LLM capacity exhausted, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class LimitPolicy:
+    rate_per_minute: float = 6.0
+    burst: int = 3
+    user_concurrency: int = 2
+    max_wait: float = 10.0  # seconds a call may wait for a global slot before it is shed
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Take one token; returns 0 on success, else the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60
+
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class Permit:
+    def __init__(self, limiter, user_id):
+        self._limiter = limiter
+        self._user_id = user_id
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter._release(self._user_id, time.monotonic() - self._started)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class LlmLimiter:
+    """Per-user token buckets plus a global cap on in-flight LLM calls.
+
+    A call first takes a token from its user's bucket and a per-user concurrency slot
+    (RateLimited otherwise), then one of ``max_concurrent`` global slots. At most
+    ``max_queue`` calls wait for a global slot, each for at most its policy's
+    ``max_wait``; past either bound the call is shed with LlmOverloaded. Policies are
+    looked up by tier (the user's role), then language, then ``default``.
+    """
+
+    def __init__(self, max_concurrent=8, max_queue=32, default=None, overrides=None, max_users=10000):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.default = default or LimitPolicy()
+        self.policies = {
+            key.casefold(): replace(self.default, **fields) for key, fields in (overrides or {}).items()
+        }
+        # A bucket idle for this long has refilled anyway, so dropping it loses nothing
+        self._buckets = TTLCache(maxsize=max_users, ttl=600)
+        self._user_in_flight = {}
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.waiting = 0
+        self.rate_limited = 0
+        self.shed = 0
+        self._avg_call = 5.0  # seconds, exponentially weighted
+
+    def policy_for(self, tier=None, language=None):
+        for key in (tier, language):
+            if key and key.casefold() in self.policies:
+                return self.policies[key.casefold()]
+        return self.default
+
+    def _retry_after_overload(self):
+        return max(1, math.ceil(self._avg_call * (self.waiting + 1) / self.max_concurrent))
+
+    async def acquire(self, user_id, tier=None, language=None):
+        policy = self.policy_for(tier, language)
+        bucket = self._buckets.get((user_id, policy))
+        if bucket is None:
+            bucket = TokenBucket(policy.rate_per_minute, policy.burst)
+        self._buckets.set((user_id, policy), bucket)
+        wait = bucket.take()
+        if wait:
+            self.rate_limited += 1
+            raise RateLimited(max(1, math.ceil(wait)))
+        if self._user_in_flight.get(user_id, 0) >= policy.user_concurrency:
+            bucket.refund()
+            self.rate_limited += 1
+            raise RateLimited(max(1, math.ceil(self._avg_call)))
+
+        # Queued calls count against the user's concurrency too
+        self._user_in_flight[user_id] = self._user_in_flight.get(user_id, 0) + 1
+        try:
+            if self._slots.locked():
+                if self.waiting >= self.max_queue:
+                    raise LlmOverloaded(self._retry_after_overload())
+                self.waiting += 1
+                try:
+                    await asyncio.wait_for(self._slots.acquire(), timeout=policy.max_wait)
+                except asyncio.TimeoutError:
+                    raise LlmOverloaded(self._retry_after_overload())
+                finally:
+                    self.waiting -= 1
+            else:
+                await self._slots.acquire()
+        except LlmOverloaded:
+            bucket.refund()
+            self.shed += 1
+            self._user_done(user_id)
+            raise
+        except asyncio.CancelledError:
+            bucket.refund()
+            self._user_done(user_id)
+            raise
+
+        self.in_flight += 1
+        return Permit(self, user_id)
+
+    def _user_done(self, user_id):
+        remaining = self._user_in_flight.get(user_id, 1) - 1
+        if remaining:
+            self._user_in_flight[user_id] = remaining
+        else:
+            self._user_in_flight.pop(user_id, None)
+
+    def _release(self, user_id, elapsed):
+        self._slots.release()
+        self.in_flight -= 1
+        self._user_done(user_id)
+        self._avg_call = 0.8 * self._avg_call + 0.2 * elapsed
+
+    def stats(self):
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rate_limited": self.rate_limited,
+            "shed": self.shed,
+            "avg_call_s": round(self._avg_call, 2),
+        }
@@ -0,0 +1,197 @@
+"""Minimal Prometheus-style metrics: counters, gauges and histograms rendered in the text format.
+
+Observations are a dict lookup, a bisect and a few additions under a lock (Motor's
+command listener reports from driver threads), so they are cheap enough for every
+request and every database command.
+"""
+import bisect
+import threading
+import time
+
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in self._values.items()
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self):
+        lines = self.header()
+        for labels, (counts, total) in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "Time to produce a response, by route template",
+    ("method", "route", "status"),
+)
+http_in_flight = registry.gauge("http_requests_in_flight", "Requests being handled, by route template", ("method", "route"))
+db_command_seconds = registry.histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency, by collection and command",
+    ("collection", "command", "outcome"), buckets=DB_BUCKETS,
+)
+llm_request_seconds = registry.histogram(
+    "llm_request_duration_seconds", "Full LLM reply latency", ("mode", "language"), buckets=LLM_BUCKETS,
+)
+llm_first_token_seconds = registry.histogram(
+    "llm_time_to_first_token_seconds", "Latency until the first reply text arrives", ("mode", "language"), buckets=LLM_BUCKETS,
+)
+llm_tokens = registry.histogram(
+    "llm_tokens", "Estimated tokens per LLM call", ("direction",), buckets=TOKEN_BUCKETS,
+)
+llm_errors = registry.counter("llm_errors_total", "LLM calls that raised", ("mode",))
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that records latency and in-flight count under its path template.
+
+    For streaming responses the time covers producing the response object, not the
+    stream itself.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        method_labels = {}
+
+        async def timed_handler(request):
+            method = request.method
+            labels = method_labels.get(method)
+            if labels is None:
+                labels = method_labels[method] = (method, self.path_format)
+            http_in_flight.inc(*labels)
+            started = time.perf_counter()
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                return response
+            except HTTPException as e:
+                status = e.status_code
+                raise
+            except RequestValidationError:
+                # Raised while parsing parameters, before the endpoint runs; answered with a 422
+                status = 422
+                raise
+            finally:
+                http_in_flight.dec(*labels)
+                http_request_seconds.observe(time.perf_counter() - started, *labels, status)
+
+        return timed_handler
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command by collection; register through ``event_listeners``."""
+
+    def __init__(self):
+        self._started = {}
+
+    def started(self, event):
+        name = event.command_name
+        target = event.command.get("collection") if name == "getMore" else event.command.get(name)
+        self._started[event.request_id] = (target if isinstance(target, str) else "", name)
+
+    def _finish(self, event, outcome):
+        started = self._started.pop(event.request_id, None)
+        if started is not None:
+            db_command_seconds.observe(event.duration_micros / 1e6, *started, outcome)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
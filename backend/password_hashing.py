@@ -0,0 +1,81 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+
+class HasherOverloaded(Exception):
+    """Raised when the hashing queue is full and the request should be shed."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated, bounded thread pool so it never blocks the event loop.
+
+    At most ``workers`` hashes run at once and at most ``max_queue`` more wait for a
+    thread; anything beyond that is rejected immediately with HasherOverloaded.
+    """
+
+    def __init__(self, workers=2, max_queue=32):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self.rejected = 0
+        self._timings = {"hash": [0, 0.0, 0.0], "verify": [0, 0.0, 0.0]}  # count, total_s, max_s
+
+    @property
+    def queue_depth(self):
+        return max(0, self._pending - self.workers)
+
+    def _record(self, op, started):
+        elapsed = time.perf_counter() - started
+        t = self._timings[op]
+        t[0] += 1
+        t[1] += elapsed
+        t[2] = max(t[2], elapsed)
+
+    def _timed(self, op, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._record(op, started)
+
+    async def _submit(self, op, fn, *args):
+        if self._pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HasherOverloaded()
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._timed, op, fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._submit("hash", bcrypt.hashpw, password.encode(), bcrypt.gensalt())
+        return hashed.decode()
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._submit("verify", bcrypt.checkpw, password.encode(), hashed.encode())
+
+    def stats(self):
+        ops = {}
+        for op, (count, total, worst) in self._timings.items():
+            ops[op] = {
+                "count": count,
+                "avg_ms": round(total / count * 1000, 1) if count else 0.0,
+                "max_ms": round(worst * 1000, 1),
+            }
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(self._pending, self.workers),
+            "queue_depth": self.queue_depth,
+            "rejected": self.rejected,
+            **ops,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,95 @@
+import bisect
+import re
+import unicodedata
+
+# Alternate and historical spellings -> the spelling used in our facility data
+CITY_ALIASES = {
+    "tuticorin": "thoothukudi",
+    "thoothukkudi": "thoothukudi",
+    "bengaluru": "bangalore",
+    "bombay": "mumbai",
+    "madras": "chennai",
+    "calcutta": "kolkata",
+    "kovai": "coimbatore",
+    "nellai": "tirunelveli",
+    "tinnevelly": "tirunelveli",
+    "trichy": "tiruchirappalli",
+    "tiruchi": "tiruchirappalli",
+    "pondicherry": "puducherry",
+    "mysore": "mysuru",
+    "gurgaon": "gurugram",
+    "vizag": "visakhapatnam",
+    "trivandrum": "thiruvananthapuram",
+    "cochin": "kochi",
+    "poona": "pune",
+    "baroda": "vadodara",
+    "benares": "varanasi",
+    "banaras": "varanasi",
+    "delhi": "new delhi",
+    "orissa": "odisha",
+}
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_place(name: str) -> str:
+    """Lowercase ASCII key with accents, punctuation and extra spaces removed."""
+    text = unicodedata.normalize("NFKD", name or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def city_key(name: str) -> str:
+    key = normalize_place(name)
+    return CITY_ALIASES.get(key, key)
+
+
+class PlaceIndex:
+    """Sorted prefix index over the cities, districts and states of a set of facilities.
+
+    Aliases are indexed as extra entries pointing at their canonical place, so typing
+    either spelling finds it.
+    """
+
+    def __init__(self, docs):
+        places = {}
+        for doc in docs:
+            for kind in ("city", "district", "state"):
+                name = doc.get(kind)
+                if not name:
+                    continue
+                key = city_key(name) if kind == "city" else normalize_place(name)
+                place = places.setdefault((kind, key), {"name": name, "kind": kind, "state": doc.get("state"), "hospitals": 0})
+                place["hospitals"] += 1
+
+        entries = []
+        for (kind, key), place in places.items():
+            entries.append((key, kind, None, place))
+        for alias, canonical in CITY_ALIASES.items():
+            for kind in ("city", "district", "state"):
+                place = places.get((kind, canonical))
+                if place:
+                    entries.append((alias, kind, alias, place))
+        entries.sort(key=lambda e: (e[0], e[1]))
+        self._keys = [e[0] for e in entries]
+        self._entries = entries
+
+    def complete(self, prefix: str, limit: int = 10):
+        prefix = normalize_place(prefix)
+        if not prefix:
+            return []
+        matches = []
+        i = bisect.bisect_left(self._keys, prefix)
+        while i < len(self._keys) and self._keys[i].startswith(prefix):
+            matches.append(self._entries[i])
+            i += 1
+        # Report a place once, by its own name when that matched too
+        matches.sort(key=lambda e: e[2] is not None)
+        results, seen = [], set()
+        for key, kind, alias, place in matches:
+            if id(place) in seen:
+                continue
+            seen.add(id(place))
+            results.append({**place, "matched": alias.title() if alias else place["name"]})
+        results.sort(key=lambda p: (-p["hospitals"], p["name"]))
+        return results[:limit]
@@ -0,0 +1,170 @@
+"""Topic pub/sub for live updates pushed over WebSockets.
+
+``InProcessBroker`` fans messages out to subscribers in this process. ``RedisBroker``
+relays them through a Redis-compatible server so every worker's subscribers see
+every publish; use ``create_broker(url)`` to pick one from configuration.
+"""
+import asyncio
+import json
+import logging
+from collections import deque
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # only needed when PUBSUB_URL points at a Redis-compatible server
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+_POSITION = object()
+
+
+class Subscription:
+    """Bounded per-subscriber queue that never blocks the publisher.
+
+    Messages with ``type == "position"`` are coalesced: at most one is pending and a
+    newer one replaces it in place, since only the latest position matters. Other
+    messages are queued up to ``maxsize``; past that the oldest is dropped.
+    """
+
+    def __init__(self, topic, maxsize=32):
+        self.topic = topic
+        self.maxsize = maxsize
+        self._pending = deque()
+        self._position = None
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.coalesced = 0
+        self.dropped = 0
+
+    def deliver(self, message):
+        if self.closed:
+            return
+        if message.get("type") == "position":
+            if self._position is None:
+                self._pending.append(_POSITION)
+            else:
+                self.coalesced += 1
+            self._position = message
+        else:
+            if len(self._pending) >= self.maxsize:
+                if self._pending.popleft() is _POSITION:
+                    self._position = None
+                self.dropped += 1
+            self._pending.append(message)
+        self._ready.set()
+
+    async def get(self, timeout=None):
+        """Next message, or None if ``timeout`` elapses first."""
+        while not self._pending:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        message = self._pending.popleft()
+        if message is _POSITION:
+            message, self._position = self._position, None
+        return message
+
+    def close(self):
+        self.closed = True
+        self._pending.clear()
+        self._position = None
+
+
+class InProcessBroker:
+    def __init__(self, queue_size=32):
+        self.queue_size = queue_size
+        self._topics = {}
+        self.published = 0
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        for subs in self._topics.values():
+            for sub in subs:
+                sub.close()
+        self._topics.clear()
+
+    def subscribe(self, topic):
+        sub = Subscription(topic, self.queue_size)
+        self._topics.setdefault(topic, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        sub.close()
+        subs = self._topics.get(sub.topic)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._topics[sub.topic]
+
+    def fan_out(self, topic, message):
+        for sub in self._topics.get(topic, ()):
+            sub.deliver(message)
+
+    async def publish(self, topic, message):
+        self.published += 1
+        self.fan_out(topic, message)
+
+    def stats(self):
+        subs = [sub for subs in self._topics.values() for sub in subs]
+        return {
+            "backend": "memory",
+            "topics": len(self._topics),
+            "subscribers": len(subs),
+            "published": self.published,
+            "coalesced": sum(sub.coalesced for sub in subs),
+            "dropped": sum(sub.dropped for sub in subs),
+        }
+
+
+class RedisBroker(InProcessBroker):
+    """Publishes through Redis PUBLISH; one pattern subscription per process feeds local subscribers."""
+
+    def __init__(self, url, queue_size=32, pattern="*"):
+        if aioredis is None:
+            raise RuntimeError("PUBSUB_URL is set but the redis package is not installed")
+        super().__init__(queue_size)
+        self.url = url
+        self.pattern = pattern
+        self._redis = aioredis.from_url(url)
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub()
+                await pubsub.psubscribe(self.pattern)
+                async for item in pubsub.listen():
+                    if item["type"] == "pmessage":
+                        self.fan_out(item["channel"].decode(), json.loads(item["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Pub/sub listener error, reconnecting: {e}")
+                await asyncio.sleep(1)
+
+    async def publish(self, topic, message):
+        self.published += 1
+        await self._redis.publish(topic, json.dumps(message, default=str))
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+        await super().close()
+        await self._redis.aclose()
+
+    def stats(self):
+        return {**super().stats(), "backend": "redis"}
+
+
+def create_broker(url=None, queue_size=32):
+    if url and url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker(url, queue_size)
+    return InProcessBroker(queue_size)
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from collections import deque
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Driver-added fields: not part of the query shape and not accepted inside an explain
+_SESSION_FIELDS = {"lsid", "txnNumber", "$db", "$clusterTime", "$readPreference", "readConcern", "writeConcern"}
+
+
+def query_shape(value):
+    """Replace literal values with 1 so queries differing only in values share a shape."""
+    if isinstance(value, dict):
+        return {k: query_shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [query_shape(v) for v in value[:1]]
+    return 1
+
+
+def plan_stages(plan):
+    stages = [plan.get("stage")]
+    for child in ("inputStage", "queryPlan"):
+        if child in plan:
+            stages += plan_stages(plan[child])
+    for sub in plan.get("inputStages", []):
+        stages += plan_stages(sub)
+    return stages
+
+
+def winning_plans(explain):
+    if "queryPlanner" in explain:
+        yield explain["queryPlanner"]["winningPlan"]
+    for stage in explain.get("stages", []):
+        cursor = stage.get("$cursor")
+        if cursor and "queryPlanner" in cursor:
+            yield cursor["queryPlanner"]["winningPlan"]
+
+
+class QueryProfiler(monitoring.CommandListener):
+    """Logs slow Mongo commands and query shapes whose plan is a collection scan.
+
+    Register it through ``event_listeners`` on the client. Listener callbacks run on
+    driver threads, so they only record; ``run()`` explains new shapes from the loop.
+    """
+
+    def __init__(self, slow_ms=100, max_pending=1000):
+        self.slow_ms = slow_ms
+        self._started = {}
+        self._pending = deque(maxlen=max_pending)
+        self._seen_shapes = set()
+        self.slow_count = 0
+        self.collscan_shapes = []
+
+    def started(self, event):
+        if event.command_name in EXPLAINABLE:
+            command = {k: v for k, v in event.command.items() if k not in _SESSION_FIELDS}
+            self._started[event.request_id] = (event.database_name, command)
+
+    def succeeded(self, event):
+        started = self._started.pop(event.request_id, None)
+        if started is None:
+            return
+        database, command = started
+        collection = command.get(event.command_name)
+        elapsed_ms = event.duration_micros / 1000
+        if elapsed_ms >= self.slow_ms:
+            self.slow_count += 1
+            logger.warning(f"Slow {event.command_name} on {database}.{collection} ({elapsed_ms:.0f} ms): {query_shape(command)}")
+        shape = (database, event.command_name, collection, repr(query_shape(command)))
+        if shape not in self._seen_shapes:
+            self._seen_shapes.add(shape)
+            self._pending.append((database, command))
+
+    def failed(self, event):
+        self._started.pop(event.request_id, None)
+
+    async def explain_pending(self, client):
+        while self._pending:
+            database, command = self._pending.popleft()
+            try:
+                explain = await client[database].command({"explain": command, "verbosity": "queryPlanner"})
+            except Exception as e:
+                logger.debug(f"Explain failed for {query_shape(command)}: {e}")
+                continue
+            if any("COLLSCAN" in plan_stages(plan) for plan in winning_plans(explain)):
+                shape = query_shape(command)
+                self.collscan_shapes.append(shape)
+                name = next(iter(command))
+                logger.warning(f"COLLSCAN plan for {name} on {database}.{command[name]}: {shape}")
+
+    async def run(self, client, interval=1.0):
+        while True:
+            await self.explain_pending(client)
+            await asyncio.sleep(interval)
+
+    def stats(self):
+        return {
+            "slow_ms": self.slow_ms,
+            "slow_queries": self.slow_count,
+            "shapes_seen": len(self._seen_shapes),
+            "collscan_shapes": len(self.collscan_shapes),
+        }
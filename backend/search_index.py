@@ -0,0 +1,203 @@
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+_TOKEN = re.compile(r"\w+")
+FACET_LIMIT = 20
+# Filter combinations whose query-less (browse) results are kept between changes
+BROWSE_CACHE_SIZE = 64
+# Vocabulary terms a search-as-you-type prefix expands to, most frequent first
+MAX_PREFIX_TERMS = 50
+# Documents scored per query, taken from the most selective term's best postings
+MAX_CANDIDATES = 2000
+
+
+def tokenize(text: str):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return _TOKEN.findall(text)
+
+
+def _values(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+class SearchIndex:
+    """In-memory inverted index with weighted fields, prefix matching and facet counts.
+
+    ``fields`` maps document fields to a weight; a term's weight in a document is the
+    sum of the weights of the fields it appears in. Every query term must match (the
+    last one as a prefix, for search-as-you-type), and results are ranked by
+    idf-weighted field score, then by rating. Documents are keyed by their ``id``
+    and can be added or removed one at a time. Results for an empty query (browsing
+    with filters only) are rating-ordered and cached per filter combination until the
+    next add or remove, so they cost no more than a term query.
+
+    Term queries stay bounded however broad they are: a prefix expands to at most
+    ``MAX_PREFIX_TERMS`` terms, and only ``MAX_CANDIDATES`` documents are scored. The
+    candidates come from the query token with the fewest postings, taking the
+    highest-weighted (then best-rated) documents first; the other tokens only filter
+    and score them. Below the cap results are exact; above it, ``total`` and the
+    facets count the scored candidates only.
+    """
+
+    def __init__(self, fields, facets):
+        self.fields = fields
+        self.facets = facets
+        self.docs = {}
+        self._postings = defaultdict(dict)
+        self._doc_terms = {}
+        self._terms = None  # sorted vocabulary, rebuilt on first use after a change
+        self._ranked = {}  # term -> its best MAX_CANDIDATES doc ids
+        self._browse = {}
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, doc):
+        doc_id = doc["id"]
+        if doc_id in self.docs:
+            self.remove(doc_id)
+        weights = Counter()
+        for field, weight in self.fields.items():
+            for value in _values(doc.get(field)):
+                for token in set(tokenize(str(value))):
+                    weights[token] += weight
+        for term, weight in weights.items():
+            if term not in self._postings:
+                self._terms = None
+            self._postings[term][doc_id] = weight
+        self.docs[doc_id] = doc
+        self._doc_terms[doc_id] = list(weights)
+        self._changed()
+
+    def remove(self, doc_id):
+        self.docs.pop(doc_id, None)
+        self._changed()
+        for term in self._doc_terms.pop(doc_id, []):
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                self._terms = None
+
+    def _changed(self):
+        self._browse.clear()
+        self._ranked.clear()
+
+    def _expand(self, token, prefix):
+        if not prefix:
+            return [token] if token in self._postings else []
+        if self._terms is None:
+            self._terms = sorted(self._postings)
+        i = bisect.bisect_left(self._terms, token)
+        terms = []
+        while i < len(self._terms) and self._terms[i].startswith(token):
+            terms.append(self._terms[i])
+            i += 1
+        if len(terms) > MAX_PREFIX_TERMS:
+            # Keep the exact term, then the completions found in the most documents
+            terms = heapq.nlargest(MAX_PREFIX_TERMS, terms, key=lambda t: (t == token, len(self._postings[t])))
+        return terms
+
+    def _best_postings(self, term):
+        ranked = self._ranked.get(term)
+        if ranked is None:
+            postings = self._postings[term]
+            ranked = self._ranked[term] = heapq.nsmallest(
+                MAX_CANDIDATES, postings, key=lambda d: (-postings[d], -(self.docs[d].get("rating") or 0))
+            )
+        return ranked
+
+    def _candidates(self, token, terms):
+        if sum(len(self._postings[t]) for t in terms) <= MAX_CANDIDATES:
+            return {doc_id for term in terms for doc_id in self._postings[term]}
+        candidates = set()
+        # Exact matches first, then the most common completions
+        for term in sorted(terms, key=lambda t: (t != token, -len(self._postings[t]))):
+            for doc_id in self._best_postings(term):
+                candidates.add(doc_id)
+                if len(candidates) >= MAX_CANDIDATES:
+                    return candidates
+        return candidates
+
+    def _score(self, tokens):
+        n = len(self.docs)
+        expanded = []
+        for i, token in enumerate(tokens):
+            terms = self._expand(token, prefix=i == len(tokens) - 1)
+            if not terms:
+                return {}
+            expanded.append((token, terms))
+        lead = min(expanded, key=lambda e: sum(len(self._postings[t]) for t in e[1]))
+        scores = dict.fromkeys(self._candidates(*lead), 0.0)
+        for token, terms in expanded:
+            # Exact matches outrank prefix completions of the same token
+            weighted = [
+                (self._postings[term], math.log(1 + n / len(self._postings[term])) * (1.0 if term == token else 0.8))
+                for term in terms
+            ]
+            for doc_id in list(scores):
+                best = max((idf * postings[doc_id] for postings, idf in weighted if doc_id in postings), default=0.0)
+                if best:
+                    scores[doc_id] += best
+                else:
+                    del scores[doc_id]
+            if not scores:
+                break
+        return scores
+
+    @staticmethod
+    def _matches(doc, filters):
+        for field, wanted in filters.items():
+            value = doc.get(field)
+            if isinstance(wanted, bool):
+                if bool(value) != wanted:
+                    return False
+            elif str(wanted).casefold() not in {str(v).casefold() for v in _values(value)}:
+                return False
+        return True
+
+    def _facet_counts(self, matched):
+        facets = {}
+        for field in self.facets:
+            counts = Counter()
+            for doc_id in matched:
+                for value in _values(self.docs[doc_id].get(field)):
+                    counts[str(value).lower() if isinstance(value, bool) else value] += 1
+            facets[field] = dict(counts.most_common(FACET_LIMIT))
+        return facets
+
+    def _browse_results(self, filters):
+        key = tuple(sorted(filters.items()))
+        cached = self._browse.get(key)
+        if cached is None:
+            matched = [doc_id for doc_id, doc in self.docs.items() if self._matches(doc, filters)]
+            matched.sort(key=lambda doc_id: -(self.docs[doc_id].get("rating") or 0))
+            if len(self._browse) >= BROWSE_CACHE_SIZE:
+                self._browse.clear()
+            cached = self._browse[key] = (matched, self._facet_counts(matched))
+        return cached
+
+    def search(self, query="", filters=None, limit=20, offset=0):
+        filters = {k: v for k, v in (filters or {}).items() if v is not None}
+        tokens = tokenize(query)
+        if not tokens:
+            matched, facets = self._browse_results(filters)
+            results = [{**self.docs[doc_id], "score": 0.0} for doc_id in matched[offset:offset + limit]]
+            return {"total": len(matched), "results": results, "facets": facets}
+
+        scores = self._score(tokens)
+        matched = [doc_id for doc_id in scores if self._matches(self.docs[doc_id], filters)]
+        facets = self._facet_counts(matched)
+        matched.sort(key=lambda doc_id: (-scores[doc_id], -(self.docs[doc_id].get("rating") or 0)))
+        results = [
+            {**self.docs[doc_id], "score": round(scores[doc_id], 3)}
+            for doc_id in matched[offset:offset + limit]
+        ]
+        return {"total": len(matched), "results": results, "facets": facets}
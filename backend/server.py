@@ -1,37 +1,110 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Header, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
+import json
 import logging
 import math
+import time
+from collections import deque
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ValidationError
 from typing import List, Optional
 import uuid
+import unicodedata
 import jwt
-import bcrypt
 from datetime import datetime, timezone, timedelta
 from emergentintegrations.llm.chat import LlmChat, UserMessage
+from facility_index import FacilitySnapshotCache
+from caching import TTLCache, VersionedResponseCache, etag_matches
+from password_hashing import PasswordHasher, HasherOverloaded
+from chat_streaming import StreamBuffer, iter_llm_reply, relay_sse
+from conversation_context import ConversationContext, estimate_tokens
+from write_behind import WriteBehindBuffer
+from downsampling import lttb_indices, minmax_indices
+import bp_analytics
+from query_profiler import QueryProfiler
+import metrics
+from places import PlaceIndex, city_key
+from search_index import SearchIndex
+from storage import create_repositories, haversine_km
+from fast_json import FastJSONResponse, dumps as json_dumps
+from dispatch import DispatchEngine, DispatchRequest, SpeedModel, severity_of
+from pubsub import create_broker
+from llm_limits import LlmLimiter, LimitPolicy, RateLimited, LlmOverloaded
+from hospital_import import INDIA_BOUNDS, ImportProgress, import_hospitals, iter_records, parse_bounds
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# STORAGE_BACKEND=mongo (MONGO_URL, DB_NAME) or sqlite (SQLITE_PATH) for offline single-box deployments
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo').lower()
+# DB_PROFILE=1 logs queries slower than DB_SLOW_MS and query shapes planned as COLLSCAN (Mongo only)
+query_profiler = QueryProfiler(slow_ms=float(os.environ.get('DB_SLOW_MS', '100'))) if os.environ.get('DB_PROFILE') == '1' and STORAGE_BACKEND == 'mongo' else None
+repos = create_repositories(STORAGE_BACKEND, event_listeners=[metrics.CommandMetrics()] + ([query_profiler] if query_profiler else []))
 
 JWT_SECRET = os.environ.get('JWT_SECRET', 'carelens_secret')
+HOSPITAL_SNAPSHOT_TTL = float(os.environ.get('HOSPITAL_SNAPSHOT_TTL', '300'))
+SEARCH_INDEX_REFRESH = float(os.environ.get('SEARCH_INDEX_REFRESH', '300'))
+LISTING_CACHE_TTL = float(os.environ.get('LISTING_CACHE_TTL', '60'))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', '60'))
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '10000'))
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', '2'))
+BCRYPT_MAX_QUEUE = int(os.environ.get('BCRYPT_MAX_QUEUE', '32'))
+CHAT_CONTEXT_CACHE_SIZE = int(os.environ.get('CHAT_CONTEXT_CACHE_SIZE', '5000'))
+CHAT_CONTEXT_TTL = float(os.environ.get('CHAT_CONTEXT_TTL', '1800'))
+CHAT_CONTEXT_TOKENS = int(os.environ.get('CHAT_CONTEXT_TOKENS', '2000'))
+CHAT_SUMMARY_TOKENS = int(os.environ.get('CHAT_SUMMARY_TOKENS', '400'))
+CHAT_RESPONSE_CACHE_SIZE = int(os.environ.get('CHAT_RESPONSE_CACHE_SIZE', '2000'))
+CHAT_RESPONSE_CACHE_TTL = float(os.environ.get('CHAT_RESPONSE_CACHE_TTL', '21600'))
+WRITE_BEHIND_BATCH = int(os.environ.get('WRITE_BEHIND_BATCH', '200'))
+WRITE_BEHIND_INTERVAL = float(os.environ.get('WRITE_BEHIND_INTERVAL', '0.25'))
+AMBULANCE_SPEED_KMH = float(os.environ.get('AMBULANCE_SPEED_KMH', '40'))
+AMBULANCE_ROAD_FACTOR = float(os.environ.get('AMBULANCE_ROAD_FACTOR', '1.3'))
+AMBULANCE_TURNOUT_MINUTES = float(os.environ.get('AMBULANCE_TURNOUT_MINUTES', '2'))
+AMBULANCE_UNITS_PER_HOSPITAL = int(os.environ.get('AMBULANCE_UNITS_PER_HOSPITAL', '2'))
+AMBULANCE_ON_SCENE_MINUTES = float(os.environ.get('AMBULANCE_ON_SCENE_MINUTES', '30'))
+DISPATCH_WAIT_SECONDS = float(os.environ.get('DISPATCH_WAIT_SECONDS', '2'))
+# Farthest unit sent to a request (0 disables a limit); beyond it the request waits for a nearer unit
+DISPATCH_MAX_KM = float(os.environ.get('DISPATCH_MAX_KM', '100'))
+DISPATCH_MAX_ETA_MINUTES = float(os.environ.get('DISPATCH_MAX_ETA_MINUTES', '0'))
+# Queued requests no unit could take within this long are closed as expired
+DISPATCH_QUEUE_MINUTES = float(os.environ.get('DISPATCH_QUEUE_MINUTES', '60'))
+DISPATCH_RESTORE_LIMIT = int(os.environ.get('DISPATCH_RESTORE_LIMIT', '10000'))
+PUBSUB_URL = os.environ.get('PUBSUB_URL')
+TRACKING_QUEUE_SIZE = int(os.environ.get('TRACKING_QUEUE_SIZE', '32'))
+AMBULANCE_DEVICE_KEY = os.environ.get('AMBULANCE_DEVICE_KEY')
+HOSPITAL_IMPORT_KEY = os.environ.get('HOSPITAL_IMPORT_KEY')
+# Operators' key for internal endpoints such as /system/stats; unset disables them
+ADMIN_API_KEY = os.environ.get('ADMIN_API_KEY')
+HOSPITAL_IMPORT_MAX_ROWS = int(os.environ.get('HOSPITAL_IMPORT_MAX_ROWS', '500000'))
+# "min_lat,max_lat,min_lng,max_lng" imported facilities must fall in; empty disables the check
+HOSPITAL_IMPORT_BOUNDS = parse_bounds(os.environ.get('HOSPITAL_IMPORT_BOUNDS', ','.join(map(str, INDIA_BOUNDS))))
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
+LLM_MAX_CONCURRENT = int(os.environ.get('LLM_MAX_CONCURRENT', '8'))
+LLM_MAX_QUEUE = int(os.environ.get('LLM_MAX_QUEUE', '32'))
+LLM_DEFAULT_POLICY = LimitPolicy(
+    rate_per_minute=float(os.environ.get('LLM_RATE_PER_MINUTE', '6')),
+    burst=int(os.environ.get('LLM_BURST', '3')),
+    user_concurrency=int(os.environ.get('LLM_USER_CONCURRENCY', '2')),
+    max_wait=float(os.environ.get('LLM_MAX_WAIT', '10')),
+)
+# JSON object of per-tier (user role) or per-language overrides, e.g. {"doctor": {"rate_per_minute": 30}}
+LLM_LIMIT_OVERRIDES = json.loads(os.environ.get('LLM_LIMIT_OVERRIDES') or '{}')
 
 app = FastAPI()
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", route_class=metrics.TimedRoute)
 security = HTTPBearer()
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Batched inserts for writes whose durability may trail the response by a few hundred ms
+write_behind = WriteBehindBuffer(max_batch=WRITE_BEHIND_BATCH, flush_interval=WRITE_BEHIND_INTERVAL)
+
 # ============ MODELS ============
 
 class UserRegister(BaseModel):
@@ -66,10 +139,27 @@ class BPRecord(BaseModel):
     pulse: Optional[int] = None
     notes: Optional[str] = None
 
+class BPReading(BPRecord):
+    recorded_at: Optional[datetime] = None  # device timestamp; defaults to upload time
+
 class ChatMessage(BaseModel):
     message: str
     language: str = "English"
     session_id: Optional[str] = None
+    no_cache: bool = False  # skip the shared first-turn response cache
+
+class Origin(BaseModel):
+    lat: float
+    lng: float
+    ref: Optional[str] = None  # caller/incident id echoed back in the response
+
+class NearestFacilityQuery(BaseModel):
+    origins: List[Origin]
+    k: int = Field(3, ge=1, le=50)
+    radius: Optional[float] = None
+    emergency: Optional[bool] = None
+    ambulance: Optional[bool] = None
+    specialty: Optional[str] = None
 
 class AmbulanceRequest(BaseModel):
     lat: float
@@ -79,37 +169,75 @@ class AmbulanceRequest(BaseModel):
     emergency_type: str = "general"
     notes: Optional[str] = None
 
+class AmbulancePosition(BaseModel):
+    lat: float
+    lng: float
+    heading: Optional[float] = None
+
 # ============ AUTH HELPERS ============
 
-def create_token(user_id: str, role: str):
+def create_token(user_id: str, role: str, name: Optional[str] = None):
     payload = {
         "user_id": user_id,
         "role": role,
         "exp": datetime.now(timezone.utc) + timedelta(days=7)
     }
+    if name is not None:
+        payload["name"] = name
     return jwt.encode(payload, JWT_SECRET, algorithm="HS256")
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def decode_token(token: str):
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=["HS256"])
-        user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0})
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
+        return jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+# Resolved user documents keyed by (user_id, token); the JWT is still verified on every request.
+# Users are only written at registration, so there is nothing to invalidate; a route that
+# updates a users document must drop that user's entries from this cache.
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    token = credentials.credentials
+    payload = decode_token(token)
+    key = (payload["user_id"], token)
+    user = user_cache.get(key)
+    if user is None:
+        user = await repos.users.get(payload["user_id"])
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        user_cache.set(key, user)
+    return user
+
+async def get_current_principal(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Lightweight identity (id, name, role) taken from signed claims, without a users lookup.
+
+    Tokens issued before name was added to the claims fall back to get_current_user.
+    """
+    payload = decode_token(credentials.credentials)
+    if "name" in payload and "role" in payload:
+        return {"id": payload["user_id"], "name": payload["name"], "role": payload["role"]}
+    return await get_current_user(credentials)
+
 # ============ AUTH ROUTES ============
 
+password_hasher = PasswordHasher(workers=BCRYPT_WORKERS, max_queue=BCRYPT_MAX_QUEUE)
+
+def auth_busy():
+    return HTTPException(status_code=503, detail="Authentication service busy, please retry", headers={"Retry-After": "1"})
+
 @api_router.post("/auth/register")
 async def register(data: UserRegister):
-    existing = await db.users.find_one({"email": data.email})
+    existing = await repos.users.get_by_email(data.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed = bcrypt.hashpw(data.password.encode(), bcrypt.gensalt()).decode()
+    try:
+        hashed = await password_hasher.hash(data.password)
+    except HasherOverloaded:
+        raise auth_busy()
     user_id = str(uuid.uuid4())
     user_doc = {
         "id": user_id,
@@ -120,17 +248,23 @@ async def register(data: UserRegister):
         "phone": data.phone,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.users.insert_one(user_doc)
-    token = create_token(user_id, data.role)
+    await repos.users.insert(user_doc)
+    token = create_token(user_id, data.role, data.name)
     return {"token": token, "user": {"id": user_id, "name": data.name, "email": data.email, "role": data.role}}
 
 @api_router.post("/auth/login")
 async def login(data: UserLogin):
-    user = await db.users.find_one({"email": data.email})
-    if not user or not bcrypt.checkpw(data.password.encode(), user["password"].encode()):
+    user = await repos.users.get_by_email(data.email)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    try:
+        valid = await password_hasher.verify(data.password, user["password"])
+    except HasherOverloaded:
+        raise auth_busy()
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    token = create_token(user["id"], user["role"])
+    token = create_token(user["id"], user["role"], user["name"])
     return {"token": token, "user": {"id": user["id"], "name": user["name"], "email": user["email"], "role": user["role"]}}
 
 @api_router.get("/auth/me")
@@ -139,35 +273,60 @@ async def get_me(user=Depends(get_current_user)):
 
 # ============ HOSPITALS ============
 
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
-    return R * 2 * math.asin(math.sqrt(a))
-
 @api_router.get("/hospitals/nearby")
-async def get_nearby_hospitals(lat: float, lng: float, radius: float = 50):
-    hospitals = await db.hospitals.find({}, {"_id": 0}).to_list(1000)
+async def get_nearby_hospitals(lat: float, lng: float, radius: float = 50,
+                               limit: int = Query(100, ge=1, le=500), skip: int = Query(0, ge=0)):
+    return FastJSONResponse(await repos.hospitals.nearby(lat, lng, radius, skip=skip, limit=limit))
+
+hospital_snapshot = FacilitySnapshotCache(repos.hospitals.all, ttl=HOSPITAL_SNAPSHOT_TTL)
+
+MAX_BATCH_ORIGINS = 1000
+
+@api_router.post("/hospitals/nearest-batch")
+async def get_nearest_hospitals_batch(data: NearestFacilityQuery):
+    if len(data.origins) > MAX_BATCH_ORIGINS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ORIGINS} origins per request")
+
+    snapshot = await hospital_snapshot.get()
+    mask = snapshot.filter_mask(data.emergency, data.ambulance, data.specialty)
+    origins = [(o.lat, o.lng) for o in data.origins]
+    matches = await asyncio.to_thread(snapshot.nearest, origins, data.k, data.radius, mask)
+
     results = []
-    for h in hospitals:
-        dist = haversine(lat, lng, h["lat"], h["lng"])
-        if dist <= radius:
-            h["distance_km"] = round(dist, 1)
-            results.append(h)
-    results.sort(key=lambda x: x["distance_km"])
-    return results
+    for origin, nearest in zip(data.origins, matches):
+        hospitals = [{**snapshot.docs[i], "distance_km": round(dist, 1)} for i, dist in nearest]
+        results.append({"origin": origin.model_dump(), "hospitals": hospitals})
+    return FastJSONResponse({"count": len(results), "results": results})
+
+# Serialized /hospitals and /doctors bodies; seed_data and create_doctor_profile bump the versions
+listing_cache = VersionedResponseCache(ttl=LISTING_CACHE_TTL)
+
+async def cached_listing(request: Request, name: str, loader):
+    entry = listing_cache.get(name)
+    if entry is None:
+        version = listing_cache.version(name)
+        data = await loader()
+        body = json_dumps(data)
+        entry = listing_cache.put(name, body, version)
+    headers = {"ETag": entry["etag"], "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
 
 @api_router.get("/hospitals")
-async def get_all_hospitals():
-    hospitals = await db.hospitals.find({}, {"_id": 0}).to_list(1000)
-    return hospitals
+async def get_all_hospitals(request: Request):
+    return await cached_listing(request, "hospitals", lambda: repos.hospitals.all(1000))
 
 @api_router.get("/hospitals/by-city")
 async def get_hospitals_by_city(city: str):
-    hospitals = await db.hospitals.find({"city": {"$regex": city, "$options": "i"}}, {"_id": 0}).to_list(100)
+    hospitals = await repos.hospitals.by_city_prefix(city_key(city), 100)
     return {"city": city, "count": len(hospitals), "hospitals": hospitals}
 
+@api_router.get("/places/autocomplete")
+async def autocomplete_places(q: str, limit: int = Query(10, ge=1, le=50)):
+    snapshot = await hospital_snapshot.get()
+    return snapshot.derived("places", PlaceIndex).complete(q, limit)
+
 # ============ DOCTOR PROFILE ============
 
 @api_router.post("/doctors/profile")
@@ -184,64 +343,291 @@ async def create_doctor_profile(profile: DoctorProfile, user=Depends(get_current
     profile_doc["rating"] = 4.5
     profile_doc["reviews_count"] = 0
     
-    existing = await db.doctor_profiles.find_one({"user_id": user["id"]})
-    if existing:
-        await db.doctor_profiles.update_one({"user_id": user["id"]}, {"$set": profile_doc})
-    else:
-        await db.doctor_profiles.insert_one(profile_doc)
+    previous_id = await repos.doctors.save(profile_doc)
+    if previous_id:
+        search_indexes["doctors"].remove(previous_id)
+    search_indexes["doctors"].add(profile_doc)
+    listing_cache.bump("doctors")
+    await repos.data_versions.bump("doctors")
     
     return {"message": "Profile saved", "profile_id": profile_doc["id"]}
 
 @api_router.get("/doctors/profile")
-async def get_my_doctor_profile(user=Depends(get_current_user)):
-    profile = await db.doctor_profiles.find_one({"user_id": user["id"]}, {"_id": 0})
+async def get_my_doctor_profile(user=Depends(get_current_principal)):
+    profile = await repos.doctors.get_by_user(user["id"])
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
     return profile
 
 @api_router.get("/doctors")
-async def get_all_doctors():
-    doctors = await db.doctor_profiles.find({"available": True}, {"_id": 0}).to_list(100)
-    return doctors
+async def get_all_doctors(request: Request):
+    return await cached_listing(request, "doctors", lambda: repos.doctors.available(100))
 
 @api_router.get("/doctors/nearby")
-async def get_nearby_doctors(lat: float, lng: float, radius: float = 30):
-    doctors = await db.doctor_profiles.find({"available": True, "lat": {"$exists": True}}, {"_id": 0}).to_list(100)
-    results = []
+async def get_nearby_doctors(lat: float, lng: float, radius: float = 30,
+                             limit: int = Query(100, ge=1, le=500), skip: int = Query(0, ge=0)):
+    return FastJSONResponse(await repos.doctors.nearby(lat, lng, radius, skip, limit))
+
+# ============ SEARCH ============
+
+HOSPITAL_SEARCH_FIELDS = {"name": 3, "specialties": 2, "type": 1, "city": 1.5}
+DOCTOR_SEARCH_FIELDS = {"specialization": 3, "doctor_name": 2, "hospital_name": 1.5, "languages": 1, "city": 1}
+def new_search_indexes():
+    return {
+        "hospitals": SearchIndex(HOSPITAL_SEARCH_FIELDS, facets=["emergency", "ambulance", "specialties", "type"]),
+        "doctors": SearchIndex(DOCTOR_SEARCH_FIELDS, facets=["specialization", "languages", "available"]),
+    }
+
+# Replaced wholesale by load_search_indexes; updated in place by seed_data and create_doctor_profile
+search_indexes = new_search_indexes()
+# data_versions the current indexes were built from
+search_index_versions = {"versions": None}
+
+def build_search_indexes(hospitals, doctors):
+    fresh = new_search_indexes()
+    for h in hospitals:
+        fresh["hospitals"].add(h)
     for d in doctors:
-        if d.get("lat") and d.get("lng"):
-            dist = haversine(lat, lng, d["lat"], d["lng"])
-            if dist <= radius:
-                d["distance_km"] = round(dist, 1)
-                results.append(d)
-    results.sort(key=lambda x: x["distance_km"])
-    return results
+        fresh["doctors"].add(d)
+    # Warm the query-less listings the search pages open with
+    fresh["hospitals"].search()
+    fresh["doctors"].search(filters={"available": True})
+    return fresh
+
+async def load_search_indexes(force=True):
+    """Rebuild both indexes off the event loop; unless forced, only if hospitals or doctors changed."""
+    global search_indexes
+    # Read before the documents, so a write landing mid-load triggers another rebuild
+    versions = await repos.data_versions.get()
+    current = {name: versions.get(name, 0) for name in ("hospitals", "doctors")}
+    if not force and current == search_index_versions["versions"]:
+        return False
+    hospitals = await repos.hospitals.all()
+    doctors = await repos.doctors.all()
+    search_indexes = await asyncio.to_thread(build_search_indexes, hospitals, doctors)
+    search_index_versions["versions"] = current
+    return True
+
+async def refresh_search_indexes():
+    # Picks up writes made by other workers
+    while True:
+        await asyncio.sleep(SEARCH_INDEX_REFRESH)
+        try:
+            await load_search_indexes(force=False)
+        except Exception as e:
+            logger.error(f"Search index refresh failed: {e}")
+
+@api_router.get("/search/hospitals")
+async def search_hospitals(q: str = "", emergency: Optional[bool] = None, ambulance: Optional[bool] = None,
+                           specialty: Optional[str] = None, type: Optional[str] = None,
+                           limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0)):
+    filters = {"emergency": emergency, "ambulance": ambulance, "specialties": specialty, "type": type}
+    return FastJSONResponse(search_indexes["hospitals"].search(q, filters, limit, offset))
+
+@api_router.get("/search/doctors")
+async def search_doctors(q: str = "", specialization: Optional[str] = None, language: Optional[str] = None,
+                         available: Optional[bool] = True,
+                         limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0)):
+    filters = {"specialization": specialization, "languages": language, "available": available}
+    return FastJSONResponse(search_indexes["doctors"].search(q, filters, limit, offset))
+
+# ============ HOSPITAL IMPORT ============
+
+# One import at a time; the most recent ones stay listed with their progress
+hospital_import_lock = asyncio.Lock()
+hospital_imports = deque(maxlen=20)
+IMPORT_LOG_EVERY_BATCHES = 20
+
+def require_import_key(x_import_key: Optional[str] = Header(None)):
+    if not HOSPITAL_IMPORT_KEY or x_import_key != HOSPITAL_IMPORT_KEY:
+        raise HTTPException(status_code=403, detail="Invalid import key")
+
+async def log_import_progress(progress: ImportProgress):
+    if progress.batches % IMPORT_LOG_EVERY_BATCHES == 0:
+        logger.info(f"Hospital import {progress.id}: {progress.rows} rows, {progress.accepted} accepted, {progress.rejected} rejected")
+
+async def refresh_hospital_views():
+    hospital_snapshot.invalidate()
+    listing_cache.bump("hospitals")
+    await repos.data_versions.bump("hospitals")
+    await load_search_indexes()
+
+@api_router.post("/hospitals/import", dependencies=[Depends(require_import_key)])
+async def import_hospital_registry(request: Request, source: str = Query(..., pattern=r"^[\w.-]{1,64}$"),
+                                   format: str = Query("csv", pattern="^(csv|ndjson)$")):
+    """Stream a registry (CSV with a header row, or NDJSON) from the request body into hospitals.
+
+    Rows are upserted in batches as they arrive, so reads keep being served from what is
+    already written; caches and search indexes are refreshed once at the end.
+    """
+    if hospital_import_lock.locked():
+        raise HTTPException(status_code=409, detail="Another hospital import is running")
+    async with hospital_import_lock:
+        progress = ImportProgress(source, format)
+        hospital_imports.append(progress)
+        try:
+            await import_hospitals(repos.hospitals, request.stream(), format, source, progress,
+                                   max_rows=HOSPITAL_IMPORT_MAX_ROWS, on_batch=log_import_progress,
+                                   bounds=HOSPITAL_IMPORT_BOUNDS)
+        except Exception as e:
+            logger.error(f"Hospital import {progress.id} failed: {e}")
+        finally:
+            if progress.inserted or progress.updated:
+                await refresh_hospital_views()
+    if progress.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Import failed after {progress.rows} rows: {progress.error}")
+    return progress.as_dict()
+
+@api_router.get("/hospitals/imports", dependencies=[Depends(require_import_key)])
+async def list_hospital_imports():
+    return [p.as_dict() for p in reversed(hospital_imports)]
+
+@api_router.get("/hospitals/imports/{import_id}", dependencies=[Depends(require_import_key)])
+async def get_hospital_import(import_id: str):
+    for p in hospital_imports:
+        if p.id == import_id:
+            return p.as_dict()
+    raise HTTPException(status_code=404, detail="Import not found")
 
 # ============ BP MONITORING ============
 
-@api_router.post("/bp/record")
-async def add_bp_record(record: BPRecord, user=Depends(get_current_user)):
-    doc = record.model_dump()
+def as_utc(dt: datetime) -> datetime:
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+def classify_bp(systolic: int, diastolic: int) -> str:
+    if systolic < 90:
+        return "low"
+    elif systolic <= 120 and diastolic <= 80:
+        return "normal"
+    elif systolic <= 139 or diastolic <= 89:
+        return "elevated"
+    return "high"
+
+def build_bp_doc(record: BPRecord, user_id: str, recorded_at: Optional[datetime] = None):
+    doc = BPRecord.model_dump(record)
     doc["id"] = str(uuid.uuid4())
-    doc["user_id"] = user["id"]
-    doc["recorded_at"] = datetime.now(timezone.utc).isoformat()
-    
-    if record.systolic < 90:
-        doc["status"] = "low"
-    elif record.systolic <= 120 and record.diastolic <= 80:
-        doc["status"] = "normal"
-    elif record.systolic <= 139 or record.diastolic <= 89:
-        doc["status"] = "elevated"
-    else:
-        doc["status"] = "high"
-    
-    await db.bp_records.insert_one(doc)
-    return {k: v for k, v in doc.items() if k != "_id"}
+    doc["user_id"] = user_id
+    doc["recorded_at"] = as_utc(recorded_at).isoformat() if recorded_at else datetime.now(timezone.utc).isoformat()
+    doc["status"] = classify_bp(record.systolic, record.diastolic)
+    return doc
+
+@api_router.post("/bp/record")
+async def add_bp_record(record: BPRecord, user=Depends(get_current_principal)):
+    doc = build_bp_doc(record, user["id"])
+    await write_behind.add(repos.bp_records, [doc])
+    # Rollups and stats are written through: the dashboard and analytics read them next
+    await bp_analytics.apply_readings(repos.bp_rollups, [doc])
+    await record_bp_stats(user["id"], [doc])
+    return doc
+
+BP_BULK_CHUNK = 500
+BP_BULK_MAX_ROWS = 50000
+BP_BULK_MAX_LINE = 4096
+
+@api_router.post("/bp/records/bulk")
+async def bulk_add_bp_records(request: Request, user=Depends(get_current_principal)):
+    """Ingest newline-delimited JSON readings (one BPReading per line) from the request stream.
+
+    Rows are validated and written in chunks of BP_BULK_CHUNK, so memory use does not
+    depend on upload size. Each non-empty line gets a result with its 1-based line number.
+    At most BP_BULK_MAX_ROWS non-empty lines are read; ``truncated`` means more followed.
+    """
+    results = []
+    chunk = []
+
+    async def flush():
+        if not chunk:
+            return
+        docs = [doc for _, doc in chunk]
+        try:
+            await repos.bp_records.insert_many(docs, ordered=False)
+            await bp_analytics.apply_readings(repos.bp_rollups, docs)
+            await record_bp_stats(user["id"], docs)
+            results.extend({"line": n, "id": doc["id"], "status": doc["status"]} for n, doc in chunk)
+        except Exception as e:
+            logger.error(f"BP bulk insert error: {e}")
+            results.extend({"line": n, "error": "write failed"} for n, _ in chunk)
+        chunk.clear()
+
+    rows = 0
+    truncated = False
+    # Line framing, blank lines, over-long lines and JSON errors as for NDJSON hospital imports
+    async for line_no, record in iter_records(request.stream(), "ndjson", BP_BULK_MAX_LINE):
+        if rows >= BP_BULK_MAX_ROWS:
+            truncated = True
+            break
+        rows += 1
+        if isinstance(record, str):
+            results.append({"line": line_no, "error": record})
+            continue
+        try:
+            reading = BPReading.model_validate(record)
+        except ValidationError as e:
+            err = e.errors()[0]
+            field = ".".join(str(p) for p in err["loc"]) or "row"
+            results.append({"line": line_no, "error": f"{field}: {err['msg']}"})
+            continue
+        chunk.append((line_no, build_bp_doc(reading, user["id"], reading.recorded_at)))
+        if len(chunk) >= BP_BULK_CHUNK:
+            await flush()
+    await flush()
+
+    results.sort(key=lambda r: r["line"])
+    accepted = sum(1 for r in results if "id" in r)
+    return {"accepted": accepted, "rejected": len(results) - accepted, "truncated": truncated, "results": results}
 
 @api_router.get("/bp/records")
-async def get_bp_records(user=Depends(get_current_user)):
-    records = await db.bp_records.find({"user_id": user["id"]}, {"_id": 0}).sort("recorded_at", -1).to_list(100)
-    return records
+async def get_bp_records(user=Depends(get_current_principal)):
+    records = await repos.bp_records.recent(user["id"], 100)
+    # Readings still in the write-behind buffer, so a new reading shows up immediately
+    buffered = write_behind.buffered("bp_records", lambda d: d["user_id"] == user["id"])
+    if buffered:
+        seen = {r["id"] for r in records}
+        records += [b for b in buffered if b["id"] not in seen]
+        records = sorted(records, key=lambda r: r["recorded_at"], reverse=True)[:100]
+    return FastJSONResponse(records)
+
+@api_router.get("/bp/analytics")
+async def get_bp_analytics(user=Depends(get_current_principal)):
+    today = datetime.now(bp_analytics.LOCAL_TZ).date()
+    since = (today - timedelta(days=bp_analytics.ROLLUP_DAYS - 1)).isoformat()
+    rollups = await repos.bp_rollups.since(user["id"], since, bp_analytics.ROLLUP_DAYS)
+    return bp_analytics.summarize(rollups, today)
+
+@api_router.post("/bp/analytics/rebuild")
+async def rebuild_bp_analytics(user=Depends(get_current_principal)):
+    # Readings still in the write-behind buffer would be left out of the rebuilt rollups
+    await write_behind.flush()
+    await bp_analytics.backfill(repos, user["id"])
+    return {"message": "BP analytics rebuilt"}
+
+BP_SERIES_FIELDS = ("recorded_at", "systolic", "diastolic", "pulse", "status")
+
+@api_router.get("/bp/series")
+async def get_bp_series(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                        points: int = Query(200, ge=10, le=1000), method: str = Query("lttb", pattern="^(lttb|minmax)$"),
+                        user=Depends(get_current_principal)):
+    end = as_utc(end) if end else datetime.now(timezone.utc)
+    start = as_utc(start) if start else end - timedelta(days=30)
+    records = await repos.bp_records.series(user["id"], start.isoformat(), end.isoformat(), BP_SERIES_FIELDS)
+
+    if len(records) > points:
+        systolic = [r["systolic"] for r in records]
+        if method == "minmax":
+            keep = minmax_indices([systolic, [r["diastolic"] for r in records]], points)
+        else:
+            x = [datetime.fromisoformat(r["recorded_at"]).timestamp() for r in records]
+            keep = lttb_indices(x, systolic, points)
+        series = [records[i] for i in keep]
+    else:
+        series = records
+    return FastJSONResponse({
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "total": len(records),
+        "method": method,
+        "points": series,
+    })
 
 # ============ AI CHAT ============
 
@@ -263,12 +649,9 @@ LANGUAGE_PROMPTS = {
     "Sindhi": "Respond in Sindhi (سنڌي)."
 }
 
-@api_router.post("/chat/message")
-async def chat_with_ai(data: ChatMessage, user=Depends(get_current_user)):
-    session_id = data.session_id or f"chat_{user['id']}_{str(uuid.uuid4())[:8]}"
-    lang_prompt = LANGUAGE_PROMPTS.get(data.language, "Respond in English.")
-    
-    system_msg = f"""You are CareLens AI, a friendly and interactive healthcare assistant for rural India. 
+def build_system_message(language: str) -> str:
+    lang_prompt = LANGUAGE_PROMPTS.get(language, "Respond in English.")
+    return f"""You are CareLens AI, a friendly and interactive healthcare assistant for rural India. 
 {lang_prompt}
 You help patients with:
 - Symptom analysis and health guidance
@@ -282,91 +665,444 @@ Be warm, empathetic, and use simple language. If symptoms seem serious, strongly
 Keep responses concise but helpful. Use culturally appropriate examples.
 IMPORTANT: You are NOT a replacement for a real doctor. Always recommend professional consultation for serious concerns."""
 
-    # Get chat history for context
-    history = await db.chat_messages.find(
-        {"session_id": session_id, "user_id": user["id"]},
-        {"_id": 0}
-    ).sort("timestamp", 1).to_list(20)
+def new_session_id(user_id: str) -> str:
+    return f"chat_{user_id}_{str(uuid.uuid4())[:8]}"
 
-    try:
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=session_id,
-            system_message=system_msg
-        )
-        chat.with_model("openai", "gpt-5.2")
-
-        # Replay history
-        for msg in history:
-            if msg["role"] == "user":
-                chat.messages.append({"role": "user", "content": msg["content"]})
-            else:
-                chat.messages.append({"role": "assistant", "content": msg["content"]})
+CHAT_HISTORY_LOAD = 50
+SESSION_PREVIEW_CHARS = 60
+
+async def load_chat_history(session_id: str, user_id: str):
+    # Most recent messages, returned oldest first
+    history = await repos.chat_messages.recent(session_id, user_id, CHAT_HISTORY_LOAD)
+    history.reverse()
+    return history
+
+# Warm sessions keep their prompt context in memory, keyed by (user_id, session_id)
+chat_context_cache = TTLCache(maxsize=CHAT_CONTEXT_CACHE_SIZE, ttl=CHAT_CONTEXT_TTL)
+
+async def get_chat_context(session_id: str, user_id: str, is_new: bool = False):
+    key = (user_id, session_id)
+    ctx = chat_context_cache.get(key)
+    if ctx is None:
+        history = [] if is_new else await load_chat_history(session_id, user_id)
+        ctx = ConversationContext.from_history(history, token_budget=CHAT_CONTEXT_TOKENS, summary_budget=CHAT_SUMMARY_TOKENS)
+        chat_context_cache.set(key, ctx)
+    return ctx
 
-        user_message = UserMessage(text=data.message)
-        response = await chat.send_message(user_message)
+def create_llm_chat(session_id: str, language: str, ctx: ConversationContext):
+    system_msg = build_system_message(language)
+    if ctx.summary:
+        system_msg += f"\n\nSummary of the earlier conversation:\n{ctx.summary}"
+    chat = LlmChat(
+        api_key=EMERGENT_LLM_KEY,
+        session_id=session_id,
+        system_message=system_msg
+    )
+    chat.with_model("openai", "gpt-5.2")
 
-        # Save messages
-        ts = datetime.now(timezone.utc).isoformat()
-        await db.chat_messages.insert_one({
+    # Replay recent turns
+    for msg in ctx.turns:
+        if msg["role"] == "user":
+            chat.messages.append({"role": "user", "content": msg["content"]})
+        else:
+            chat.messages.append({"role": "assistant", "content": msg["content"]})
+    return chat
+
+async def save_chat_exchange(session_id: str, user_id: str, language: str, message: str, response: str):
+    ts = datetime.now(timezone.utc).isoformat()
+    await write_behind.add(repos.chat_messages, [
+        {
             "session_id": session_id,
-            "user_id": user["id"],
+            "user_id": user_id,
             "role": "user",
-            "content": data.message,
-            "language": data.language,
+            "content": message,
+            "language": language,
             "timestamp": ts
-        })
-        await db.chat_messages.insert_one({
+        },
+        {
             "session_id": session_id,
-            "user_id": user["id"],
+            "user_id": user_id,
             "role": "assistant",
             "content": response,
-            "language": data.language,
+            "language": language,
             "timestamp": ts
-        })
+        },
+    ])
+    # Written through, unlike the messages: the dashboard and session list read them next
+    await repos.user_stats.increment(user_id, {"ai_consultations": 1})
+    await repos.chat_sessions.record_exchange(user_id, session_id, response[:SESSION_PREVIEW_CHARS], ts, language)
+
+# First-turn answers shared across users, keyed by (language, normalized question)
+chat_response_cache = TTLCache(maxsize=max(CHAT_RESPONSE_CACHE_SIZE, 1), ttl=CHAT_RESPONSE_CACHE_TTL)
+
+def normalize_question(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = "".join(" " if unicodedata.category(ch).startswith("P") else ch for ch in text)
+    return " ".join(text.split())
+
+def response_cache_key(data: ChatMessage):
+    # Only first-turn messages: with history the answer depends on the conversation
+    if data.session_id or data.no_cache or CHAT_RESPONSE_CACHE_SIZE <= 0:
+        return None
+    language = data.language if data.language in LANGUAGE_PROMPTS else "English"
+    return (language, normalize_question(data.message))
+
+llm_limiter = LlmLimiter(
+    max_concurrent=LLM_MAX_CONCURRENT, max_queue=LLM_MAX_QUEUE,
+    default=LLM_DEFAULT_POLICY, overrides=LLM_LIMIT_OVERRIDES, max_users=USER_CACHE_SIZE,
+)
+
+async def acquire_llm_permit(user: dict, language: str):
+    # Taken only for calls that reach the model; cached answers skip the limits
+    try:
+        return await llm_limiter.acquire(user["id"], tier=user.get("role"), language=language)
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail="Too many AI requests, please slow down", headers={"Retry-After": str(e.retry_after)})
+    except LlmOverloaded as e:
+        raise HTTPException(status_code=503, detail="AI service busy, please retry", headers={"Retry-After": str(e.retry_after)})
+
+def record_llm_call(mode, language, started, first_token_at, ctx, message, response):
+    finished = time.perf_counter()
+    language = language if language in LANGUAGE_PROMPTS else "other"  # bounded label values
+    metrics.llm_request_seconds.observe(finished - started, mode, language)
+    metrics.llm_first_token_seconds.observe((first_token_at or finished) - started, mode, language)
+    # Estimates from text length; the provider's exact counts are not exposed by LlmChat
+    metrics.llm_tokens.observe(ctx.prompt_tokens() + estimate_tokens(message), "prompt")
+    metrics.llm_tokens.observe(estimate_tokens(response), "completion")
+
+@api_router.post("/chat/message")
+async def chat_with_ai(data: ChatMessage, user=Depends(get_current_principal)):
+    session_id = data.session_id or new_session_id(user["id"])
+
+    # Get chat history for context
+    ctx = await get_chat_context(session_id, user["id"], is_new=data.session_id is None)
+
+    cache_key = response_cache_key(data)
+    response = chat_response_cache.get(cache_key) if cache_key else None
+    permit = await acquire_llm_permit(user, data.language) if response is None else None
+
+    try:
+        if response is None:
+            async with permit:
+                chat = create_llm_chat(session_id, data.language, ctx)
+                user_message = UserMessage(text=data.message)
+                started = time.perf_counter()
+                try:
+                    response = await chat.send_message(user_message)
+                except Exception:
+                    metrics.llm_errors.inc("message")
+                    raise
+                # The whole reply arrives at once, so first token and full reply coincide
+                record_llm_call("message", data.language, started, time.perf_counter(), ctx, data.message, response)
+            if cache_key:
+                chat_response_cache.set(cache_key, response)
+
+        await save_chat_exchange(session_id, user["id"], data.language, data.message, response)
+        ctx.append("user", data.message)
+        ctx.append("assistant", response)
 
         return {"response": response, "session_id": session_id}
     except Exception as e:
         logger.error(f"AI Chat error: {e}")
         raise HTTPException(status_code=500, detail=f"AI service error: {str(e)}")
 
+# Keeps streaming producers alive after the client goes away so their reply is still persisted
+background_tasks = set()
+
+def spawn_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+@api_router.post("/chat/message/stream")
+async def chat_with_ai_stream(data: ChatMessage, request: Request, user=Depends(get_current_principal)):
+    session_id = data.session_id or new_session_id(user["id"])
+    ctx = await get_chat_context(session_id, user["id"], is_new=data.session_id is None)
+    cache_key = response_cache_key(data)
+    cached = chat_response_cache.get(cache_key) if cache_key else None
+    # Limits are enforced before the stream opens so callers get a plain 429/503
+    permit = await acquire_llm_permit(user, data.language) if cached is None else None
+    buffer = StreamBuffer()
+
+    async def produce():
+        try:
+            if cached is not None:
+                buffer.push(cached)
+            else:
+                async with permit:
+                    chat = create_llm_chat(session_id, data.language, ctx)
+                    started = time.perf_counter()
+                    first_token_at = None
+                    try:
+                        async for delta in iter_llm_reply(chat, UserMessage(text=data.message)):
+                            if first_token_at is None:
+                                first_token_at = time.perf_counter()
+                            buffer.push(delta)
+                    except Exception:
+                        metrics.llm_errors.inc("stream")
+                        raise
+                    record_llm_call("stream", data.language, started, first_token_at, ctx, data.message, buffer.text())
+            response = buffer.text()
+            if cache_key and cached is None:
+                chat_response_cache.set(cache_key, response)
+            await save_chat_exchange(session_id, user["id"], data.language, data.message, response)
+            ctx.append("user", data.message)
+            ctx.append("assistant", response)
+            buffer.finish()
+        except Exception as e:
+            logger.error(f"AI Chat stream error: {e}")
+            buffer.finish(error=f"AI service error: {str(e)}")
+
+    spawn_background(produce())
+    return StreamingResponse(
+        relay_sse(buffer, request.is_disconnected, session_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @api_router.get("/chat/history")
-async def get_chat_history(session_id: Optional[str] = None, user=Depends(get_current_user)):
-    query = {"user_id": user["id"]}
-    if session_id:
-        query["session_id"] = session_id
-    messages = await db.chat_messages.find(query, {"_id": 0}).sort("timestamp", 1).to_list(100)
-    return messages
+async def get_chat_history(session_id: Optional[str] = None, user=Depends(get_current_principal)):
+    messages = await repos.chat_messages.history(user["id"], session_id, 100)
+    return FastJSONResponse(messages)
+
+# Users whose chat_sessions summaries are known to cover their pre-existing history
+sessions_backfilled = TTLCache(maxsize=USER_CACHE_SIZE, ttl=3600)
+
+async def backfill_chat_sessions(user_id: str):
+    if user_id in sessions_backfilled:
+        return
+    stats = await repos.user_stats.get(user_id)
+    if not (stats and stats.get("chat_sessions_backfilled")):
+        # Sessions older than chat_sessions: summarize from the messages, flushed first so
+        # buffered exchanges are counted, merging with what record_exchange already wrote
+        await write_behind.flush()
+        for s in await repos.chat_messages.session_summaries(user_id):
+            await repos.chat_sessions.merge_summary(user_id, s["session_id"], {
+                "last_message": s["last_message"][:SESSION_PREVIEW_CHARS],
+                "timestamp": s["timestamp"],
+                "language": s["language"],
+                "created_at": s["created_at"],
+                "message_count": s["count"],
+            })
+        await repos.user_stats.set(user_id, {"chat_sessions_backfilled": True})
+    sessions_backfilled.set(user_id, True)
 
 @api_router.get("/chat/sessions")
-async def get_chat_sessions(user=Depends(get_current_user)):
-    pipeline = [
-        {"$match": {"user_id": user["id"]}},
-        {"$group": {"_id": "$session_id", "last_message": {"$last": "$content"}, "timestamp": {"$last": "$timestamp"}, "count": {"$sum": 1}}},
-        {"$sort": {"timestamp": -1}},
-        {"$limit": 20}
-    ]
-    sessions = await db.chat_messages.aggregate(pipeline).to_list(20)
-    return [{"session_id": s["_id"], "last_message": s["last_message"][:60], "timestamp": s["timestamp"], "message_count": s["count"]} for s in sessions]
+async def get_chat_sessions(limit: int = Query(20, ge=1, le=100), skip: int = Query(0, ge=0),
+                            user=Depends(get_current_principal)):
+    await backfill_chat_sessions(user["id"])
+    sessions = await repos.chat_sessions.list(user["id"], skip, limit)
+    return [{"session_id": s["session_id"], "last_message": s["last_message"], "timestamp": s["timestamp"], "message_count": s["message_count"], "language": s.get("language")} for s in sessions]
 
 # ============ AMBULANCE ============
 
+# Single in-process dispatcher: requests queue in the engine and one task matches them to units
+dispatch_engine = DispatchEngine(
+    SpeedModel(AMBULANCE_SPEED_KMH, AMBULANCE_ROAD_FACTOR, AMBULANCE_TURNOUT_MINUTES),
+    units_per_hospital=AMBULANCE_UNITS_PER_HOSPITAL,
+    on_scene_minutes=AMBULANCE_ON_SCENE_MINUTES,
+    max_distance_km=DISPATCH_MAX_KM,
+    max_eta_minutes=DISPATCH_MAX_ETA_MINUTES,
+    max_queue_minutes=DISPATCH_QUEUE_MINUTES,
+)
+dispatch_waiters = {}
+dispatch_wakeup = asyncio.Event()
+dispatch_fleet = {"snapshot": None}
+
+# Live tracking updates, one topic per request; PUBSUB_URL shares them across workers
+tracking_broker = create_broker(PUBSUB_URL, queue_size=TRACKING_QUEUE_SIZE)
+TRACKING_HEARTBEAT_SECONDS = 15
+TRACKING_FIELDS = ("status", "eta_minutes", "hospital_name", "hospital_phone", "distance_km")
+TERMINAL_AMBULANCE_STATUSES = ("completed", "cancelled", "expired")
+
+def tracking_topic(request_id: str) -> str:
+    return f"ambulance:{request_id}"
+
+def tracking_snapshot(req: dict) -> dict:
+    message = {"type": "snapshot", "request_id": req["id"], **{k: req.get(k) for k in TRACKING_FIELDS}}
+    if req.get("last_position"):
+        message["position"] = req["last_position"]
+    return message
+
+async def publish_status(request_id: str, update: dict):
+    message = {"type": "status", "request_id": request_id, **{k: update.get(k) for k in TRACKING_FIELDS if k in update}}
+    await tracking_broker.publish(tracking_topic(request_id), message)
+
+def epoch_to_iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+async def sync_dispatch_fleet():
+    snapshot = await hospital_snapshot.get()
+    if dispatch_fleet["snapshot"] is not snapshot:
+        dispatch_engine.load_fleet(snapshot.docs)
+        dispatch_fleet["snapshot"] = snapshot
+
+async def apply_assignments(assignments):
+    updates = {}
+    for a in assignments:
+        updates[a.request_id] = {
+            "status": "dispatched",
+            "hospital_id": a.hospital["id"],
+            "hospital_name": a.hospital.get("name"),
+            "hospital_phone": a.hospital.get("phone"),
+            "distance_km": round(a.distance_km, 1),
+            "eta_minutes": a.eta_minutes,
+            "dispatched_at": datetime.now(timezone.utc).isoformat(),
+            "busy_until": epoch_to_iso(a.busy_until),
+        }
+    await repos.ambulance.mark_dispatched(updates)
+    for request_id, update in updates.items():
+        waiter = dispatch_waiters.pop(request_id, None)
+        if waiter and not waiter.done():
+            waiter.set_result(update)
+        await publish_status(request_id, update)
+
+async def finish_requests(request_ids, status: str):
+    """Close requests the engine is done with: missions whose unit is back, or requests that waited too long."""
+    if not request_ids:
+        return
+    await repos.ambulance.finish(request_ids, {"status": status, f"{status}_at": datetime.now(timezone.utc).isoformat()})
+    for request_id in request_ids:
+        await publish_status(request_id, {"status": status})
+
+async def run_dispatcher():
+    while True:
+        try:
+            # Periodic wakeups release finished missions and retry queued requests
+            await asyncio.wait_for(dispatch_wakeup.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+        dispatch_wakeup.clear()
+        try:
+            finished, timed_out = dispatch_engine.expire()
+            await finish_requests(finished, "completed")
+            await finish_requests(timed_out, "expired")
+            await sync_dispatch_fleet()
+            # One pass scans the whole queue, skipping requests no free unit can reach
+            assignments = dispatch_engine.match()
+            if assignments:
+                await apply_assignments(assignments)
+        except Exception as e:
+            logger.error(f"Dispatcher error: {e}")
+
+async def restore_dispatch_state():
+    await sync_dispatch_fleet()
+    # Missions that ended while the server was down, and ones dispatched before units had a
+    # return time, are over; what is left open is bounded by the queue timeout and the fleet
+    now = datetime.now(timezone.utc).isoformat()
+    closed = await repos.ambulance.finish_elapsed(now, {"status": "completed", "completed_at": now})
+    if closed:
+        logger.info(f"Closed {closed} finished ambulance missions")
+    for r in await repos.ambulance.open(DISPATCH_RESTORE_LIMIT):
+        if r["status"] == "queued":
+            created = datetime.fromisoformat(r["created_at"]).timestamp()
+            dispatch_engine.submit(DispatchRequest(r["id"], r["lat"], r["lng"], severity_of(r.get("emergency_type")), created))
+        else:
+            dispatch_engine.occupy(r["hospital_id"], r["id"], datetime.fromisoformat(r["busy_until"]).timestamp())
+
+def public_ambulance_request(doc):
+    return {k: v for k, v in doc.items() if k != "busy_until"}
+
 @api_router.post("/ambulance/request")
-async def request_ambulance(data: AmbulanceRequest, user=Depends(get_current_user)):
+async def request_ambulance(data: AmbulanceRequest, user=Depends(get_current_principal)):
+    now = datetime.now(timezone.utc)
     req_doc = data.model_dump()
     req_doc["id"] = str(uuid.uuid4())
     req_doc["user_id"] = user["id"]
-    req_doc["status"] = "dispatched"
-    req_doc["created_at"] = datetime.now(timezone.utc).isoformat()
-    req_doc["eta_minutes"] = 8
-    await db.ambulance_requests.insert_one(req_doc)
-    return {k: v for k, v in req_doc.items() if k != "_id"}
+    req_doc["status"] = "queued"
+    req_doc["severity"] = severity_of(data.emergency_type)
+    req_doc["created_at"] = now.isoformat()
+    req_doc["eta_minutes"] = None
+    await repos.ambulance.insert(req_doc)
+    await repos.user_stats.increment(user["id"], {"ambulance_requests": 1}, {"last_location": {"lat": data.lat, "lng": data.lng}})
+
+    waiter = asyncio.get_running_loop().create_future()
+    dispatch_waiters[req_doc["id"]] = waiter
+    dispatch_engine.submit(DispatchRequest(req_doc["id"], data.lat, data.lng, req_doc["severity"], now.timestamp()))
+    dispatch_wakeup.set()
+    try:
+        req_doc.update(await asyncio.wait_for(asyncio.shield(waiter), timeout=DISPATCH_WAIT_SECONDS))
+    except asyncio.TimeoutError:
+        # No free unit yet; the dispatcher keeps the request queued and records the assignment later
+        dispatch_waiters.pop(req_doc["id"], None)
+    return public_ambulance_request(req_doc)
+
+@api_router.get("/ambulance/requests/{request_id}")
+async def get_ambulance_request(request_id: str, user=Depends(get_current_principal)):
+    req = await repos.ambulance.get(request_id, user_id=user["id"])
+    if not req:
+        raise HTTPException(status_code=404, detail="Ambulance request not found")
+    return public_ambulance_request(req)
+
+@api_router.post("/ambulance/requests/{request_id}/complete")
+async def complete_ambulance_request(request_id: str, user=Depends(get_current_principal)):
+    req = await repos.ambulance.close_open(
+        request_id, user["id"], {"status": "completed", "completed_at": datetime.now(timezone.utc).isoformat()}
+    )
+    if not req:
+        raise HTTPException(status_code=404, detail="No open ambulance request with this id")
+    # Frees the unit for the next queued request; a still-queued request is skipped when matched
+    if dispatch_engine.release(request_id):
+        dispatch_wakeup.set()
+    else:
+        dispatch_engine.cancel(request_id)
+    await publish_status(request_id, req)
+    return public_ambulance_request(req)
+
+@api_router.post("/ambulance/requests/{request_id}/position")
+async def report_ambulance_position(request_id: str, data: AmbulancePosition, x_device_key: Optional[str] = Header(None)):
+    # Reported by the assigned vehicle's device, which authenticates with a shared key
+    if not AMBULANCE_DEVICE_KEY or x_device_key != AMBULANCE_DEVICE_KEY:
+        raise HTTPException(status_code=403, detail="Invalid device key")
+    req = await repos.ambulance.get(request_id, status="dispatched")
+    if not req:
+        raise HTTPException(status_code=404, detail="No dispatched ambulance request with this id")
+    position = {**data.model_dump(), "at": datetime.now(timezone.utc).isoformat()}
+    distance_km = haversine_km(data.lat, data.lng, req["lat"], req["lng"])
+    eta = math.ceil(dispatch_engine.speed_model.drive_minutes(distance_km))
+    await repos.ambulance.update(request_id, {"last_position": position, "eta_minutes": eta})
+    await tracking_broker.publish(tracking_topic(request_id), {
+        "type": "position", "request_id": request_id, **position, "eta_minutes": eta,
+    })
+    return {"ok": True}
+
+@api_router.websocket("/ambulance/requests/{request_id}/track")
+async def track_ambulance(websocket: WebSocket, request_id: str, token: str = ""):
+    # Browsers cannot set headers on a WebSocket, so the JWT comes as ?token=
+    try:
+        user_id = decode_token(token)["user_id"]
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    req = await repos.ambulance.get(request_id, user_id=user_id)
+    if not req:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    # Subscribe before sending the snapshot so no update falls between the two
+    sub = tracking_broker.subscribe(tracking_topic(request_id))
+    try:
+        await websocket.send_json(tracking_snapshot(req))
+        status = req["status"]
+        while status not in TERMINAL_AMBULANCE_STATUSES:
+            message = await sub.get(timeout=TRACKING_HEARTBEAT_SECONDS)
+            if message is None:
+                message = {"type": "ping"}
+            status = message.get("status", status)
+            await websocket.send_json(message)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        tracking_broker.unsubscribe(sub)
 
 # ============ SEED DATA ============
 
 @api_router.post("/seed")
 async def seed_data():
-    count = await db.hospitals.count_documents({})
+    count = await repos.hospitals.count()
     if count > 0:
         return {"message": f"Already seeded {count} hospitals"}
     
@@ -402,7 +1138,12 @@ async def seed_data():
         {"id": str(uuid.uuid4()), "name": "SSKM Hospital", "type": "Government", "city": "Kolkata", "state": "West Bengal", "address": "AJC Bose Road, Kolkata", "lat": 22.5397, "lng": 88.3426, "phone": "+91 33 22041101", "emergency": True, "ambulance": True, "specialties": ["General Medicine", "Surgery", "Orthopedics"], "rating": 4.1, "beds": 1800, "image": "https://images.unsplash.com/photo-1697120508416-89675565948d?w=400"},
     ]
     
-    await db.hospitals.insert_many(hospitals)
+    await repos.hospitals.insert_many(hospitals)
+    hospital_snapshot.invalidate()
+    for h in hospitals:
+        search_indexes["hospitals"].add(h)
+    listing_cache.bump("hospitals")
+    await repos.data_versions.bump("hospitals")
     
     # Seed some doctor profiles
     doctors = [
@@ -413,25 +1154,96 @@ async def seed_data():
         {"id": str(uuid.uuid4()), "user_id": "seed_doc_5", "doctor_name": "Dr. Lakshmi Narayanan", "email": "lakshmi@care.com", "specialization": "Gynecology", "qualification": "MBBS, DGO, MD", "experience_years": 20, "hospital_name": "Government Rajaji Hospital", "address": "Panagal Road, Madurai", "city": "Madurai", "state": "Tamil Nadu", "lat": 9.9195, "lng": 78.1270, "phone": "+91 98765 43214", "available": True, "consultation_fee": 350, "languages": ["Tamil", "English", "Malayalam"], "rating": 4.9, "reviews_count": 200, "created_at": datetime.now(timezone.utc).isoformat()},
     ]
     
-    await db.doctor_profiles.insert_many(doctors)
+    await repos.doctors.insert_many(doctors)
+    for d in doctors:
+        search_indexes["doctors"].add(d)
+    listing_cache.bump("doctors")
+    await repos.data_versions.bump("doctors")
     return {"message": f"Seeded {len(hospitals)} hospitals and {len(doctors)} doctors"}
 
 # ============ DASHBOARD STATS ============
 
+# One user_stats document per user, kept current by the BP, chat and ambulance handlers
+
+NEARBY_RADIUS_KM = 50
+# last_location is kept to ~1 km, the nearby-count cache's grid, so small GPS jitter costs no write
+LOCATION_DECIMALS = 2
+
+# Hospital counts around ~1 km grid cells, keyed by (lat, lng, snapshot version)
+nearby_count_cache = TTLCache(maxsize=10000, ttl=HOSPITAL_SNAPSHOT_TTL)
+
+async def record_bp_stats(user_id: str, docs):
+    await repos.user_stats.record_bp(user_id, len(docs), max(docs, key=lambda d: d["recorded_at"]))
+
+async def backfill_user_stats(user_id: str):
+    # Users whose activity predates user_stats: count once from the source collections.
+    # Drain the write-behind buffer first so the counts include just-accepted readings and
+    # chat turns, and merge rather than overwrite so increments made meanwhile survive.
+    await write_behind.flush()
+    return await repos.user_stats.merge_counts(user_id, {
+        "bp_readings": await repos.bp_records.count(user_id),
+        "ai_consultations": await repos.chat_messages.count_user_turns(user_id),
+        "ambulance_requests": await repos.ambulance.count(user_id),
+    }, latest_bp=await repos.bp_records.latest(user_id), fields={"backfilled": True})
+
+async def count_hospitals_nearby(lat: float, lng: float):
+    snapshot = await hospital_snapshot.get()
+    key = (round(lat, LOCATION_DECIMALS), round(lng, LOCATION_DECIMALS), snapshot.version)
+    count = nearby_count_cache.get(key)
+    if count is None:
+        count = snapshot.count_within(lat, lng, NEARBY_RADIUS_KM)
+        nearby_count_cache.set(key, count)
+    return count
+
 @api_router.get("/dashboard/stats")
-async def get_dashboard_stats(user=Depends(get_current_user)):
-    bp_count = await db.bp_records.count_documents({"user_id": user["id"]})
-    chat_count = await db.chat_messages.count_documents({"user_id": user["id"], "role": "user"})
-    latest_bp = await db.bp_records.find_one({"user_id": user["id"]}, {"_id": 0}, sort=[("recorded_at", -1)])
+async def get_dashboard_stats(lat: Optional[float] = None, lng: Optional[float] = None,
+                              user=Depends(get_current_principal)):
+    stats = await repos.user_stats.get(user["id"])
+    if not stats or not stats.get("backfilled"):
+        stats = await backfill_user_stats(user["id"])
+
+    if lat is not None and lng is not None:
+        location = {"lat": round(lat, LOCATION_DECIMALS), "lng": round(lng, LOCATION_DECIMALS)}
+        if stats.get("last_location") != location:
+            await repos.user_stats.set(user["id"], {"last_location": location})
+    else:
+        location = stats.get("last_location")
+
     return {
-        "bp_readings": bp_count,
-        "ai_consultations": chat_count,
-        "latest_bp": latest_bp,
-        "hospitals_nearby": 0
+        "bp_readings": stats.get("bp_readings", 0),
+        "ai_consultations": stats.get("ai_consultations", 0),
+        "latest_bp": stats.get("latest_bp"),
+        "hospitals_nearby": await count_hospitals_nearby(location["lat"], location["lng"]) if location else 0
+    }
+
+# ============ SYSTEM STATS ============
+
+def require_admin_key(x_admin_key: Optional[str] = Header(None)):
+    if not ADMIN_API_KEY or x_admin_key != ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Invalid admin key")
+
+@api_router.get("/system/stats", dependencies=[Depends(require_admin_key)])
+async def get_system_stats():
+    return {
+        "password_hasher": password_hasher.stats(),
+        "user_cache": user_cache.stats(),
+        "chat_context_cache": chat_context_cache.stats(),
+        "chat_response_cache": chat_response_cache.stats(),
+        "listing_cache": listing_cache.stats(),
+        "write_behind": write_behind.stats(),
+        "llm_limiter": llm_limiter.stats(),
+        "dispatch": dispatch_engine.stats(),
+        "tracking": tracking_broker.stats(),
+        "query_profiler": query_profiler.stats() if query_profiler else None,
+        "storage": repos.stats(),
     }
 
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(content=metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -440,6 +1252,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup_db_client():
+    await repos.prepare()
+    await load_search_indexes()
+    spawn_background(refresh_search_indexes())
+    await restore_dispatch_state()
+    spawn_background(run_dispatcher())
+    if query_profiler:
+        spawn_background(query_profiler.run(repos.client))
+    write_behind.start()
+    await tracking_broker.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    await write_behind.close()
+    await tracking_broker.close()
+    password_hasher.shutdown()
+    await repos.close()
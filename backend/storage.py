@@ -0,0 +1,41 @@
+"""Repository layer between the API and its database.
+
+``create_repositories()`` returns an object with one repository per collection
+(``users``, ``hospitals``, ``doctors``, ``bp_records``, ``bp_rollups``,
+``chat_messages``, ``chat_sessions``, ``ambulance``, ``user_stats``, ``data_versions``)
+plus ``prepare()`` and ``close()``. Two implementations share the same method names:
+
+- ``storage_mongo.MongoRepositories``: Motor, the default.
+- ``storage_sqlite.SQLiteRepositories``: embedded SQLite for single-box edge
+  deployments (``STORAGE_BACKEND=sqlite``), with no server to run or wait for.
+
+Repositories take and return plain dicts shaped like the API's documents; storage
+details such as Mongo's ``_id``, GeoJSON ``location`` and ``city_key`` never leak out.
+Repositories used with the write-behind buffer expose ``name`` and ``insert_many``.
+``data_versions`` holds a change counter per dataset that writers bump, so every
+worker can tell whether its in-memory copy (e.g. the search indexes) is stale.
+"""
+import math
+import os
+from pathlib import Path
+
+EARTH_RADIUS_KM = 6371
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    dlat = math.radians(lat2 - lat1)
+    dlng = math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * math.asin(math.sqrt(a))
+
+
+def create_repositories(backend=None, event_listeners=()):
+    backend = (backend or os.environ.get('STORAGE_BACKEND', 'mongo')).lower()
+    if backend == 'sqlite':
+        from storage_sqlite import SQLiteRepositories
+        path = os.environ.get('SQLITE_PATH') or str(Path(__file__).parent / 'carelens.db')
+        return SQLiteRepositories(path, readers=int(os.environ.get('SQLITE_READERS', '4')))
+    if backend == 'mongo':
+        from storage_mongo import MongoRepositories
+        return MongoRepositories(os.environ['MONGO_URL'], os.environ['DB_NAME'], event_listeners=list(event_listeners))
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}' (expected mongo or sqlite)")
@@ -0,0 +1,381 @@
+"""MongoDB repositories (Motor); the queries the API has always run, behind the storage interface."""
+import re
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+
+from db_indexes import ensure_indexes
+from places import city_key
+
+# Storage-only fields never returned to callers
+HIDDEN = {"_id": 0, "location": 0, "city_key": 0}
+OPEN_AMBULANCE_STATUSES = ["queued", "dispatched"]
+
+
+def geo_point(lat, lng):
+    # GeoJSON stores coordinates as [longitude, latitude]
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+class MongoRepository:
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+
+    def stored(self, doc):
+        """Copy of ``doc`` as written, so Motor's generated _id never lands on the caller's dict."""
+        return dict(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        if docs:
+            await self.collection.insert_many([self.stored(d) for d in docs], ordered=ordered)
+
+
+class MongoGeoRepository(MongoRepository):
+    async def nearby(self, lat, lng, radius_km, skip=0, limit=100, query=None):
+        pipeline = [
+            {"$geoNear": {
+                "near": geo_point(lat, lng),
+                "distanceField": "distance_m",
+                "maxDistance": radius_km * 1000,
+                "spherical": True,
+                "query": query or {},
+            }},
+            {"$skip": skip},
+            {"$limit": limit},
+            {"$addFields": {"distance_km": {"$round": [{"$divide": ["$distance_m", 1000]}, 1]}}},
+            {"$project": {**HIDDEN, "distance_m": 0}},
+        ]
+        return await self.collection.aggregate(pipeline).to_list(limit)
+
+    async def backfill_geo_points(self):
+        # GeoJSON points for documents written before geo search existed
+        await self.collection.update_many(
+            {"location": {"$exists": False}, "lat": {"$type": "number"}, "lng": {"$type": "number"}},
+            [{"$set": {"location": {"type": "Point", "coordinates": ["$lng", "$lat"]}}}]
+        )
+
+
+class MongoUsers(MongoRepository):
+    async def get(self, user_id):
+        return await self.collection.find_one({"id": user_id}, {"_id": 0, "password": 0})
+
+    async def get_by_email(self, email):
+        return await self.collection.find_one({"email": email}, {"_id": 0})
+
+    async def insert(self, doc):
+        await self.collection.insert_one(self.stored(doc))
+
+
+class MongoHospitals(MongoGeoRepository):
+    def stored(self, doc):
+        doc = {**doc, "city_key": city_key(doc.get("city", ""))}
+        if doc.get("lat") is not None and doc.get("lng") is not None:
+            doc["location"] = geo_point(doc["lat"], doc["lng"])
+        return doc
+
+    async def count(self):
+        return await self.collection.count_documents({})
+
+    async def all(self, limit=None):
+        return await self.collection.find({}, HIDDEN).to_list(limit)
+
+    async def by_city_prefix(self, key, limit=100):
+        # Anchored prefix on the normalized key can use the city_key index
+        return await self.collection.find({"city_key": {"$regex": f"^{re.escape(key)}"}}, HIDDEN).to_list(limit)
+
+    async def upsert_many(self, docs):
+        """Insert or update hospitals by ``id``, setting only the given fields; returns (inserted, updated)."""
+        if not docs:
+            return 0, 0
+        result = await self.collection.bulk_write(
+            [UpdateOne({"id": d["id"]}, {"$set": self.stored(d)}, upsert=True) for d in docs], ordered=False
+        )
+        return result.upserted_count, result.matched_count
+
+    async def backfill_city_keys(self):
+        updates = []
+        async for h in self.collection.find({"city_key": {"$exists": False}}, {"_id": 1, "city": 1}):
+            updates.append(UpdateOne({"_id": h["_id"]}, {"$set": {"city_key": city_key(h.get("city", ""))}}))
+            if len(updates) >= 1000:
+                await self.collection.bulk_write(updates, ordered=False)
+                updates = []
+        if updates:
+            await self.collection.bulk_write(updates, ordered=False)
+
+
+class MongoDoctors(MongoGeoRepository):
+    def stored(self, doc):
+        doc = dict(doc)
+        if doc.get("lat") is not None and doc.get("lng") is not None:
+            doc["location"] = geo_point(doc["lat"], doc["lng"])
+        return doc
+
+    async def get_by_user(self, user_id):
+        return await self.collection.find_one({"user_id": user_id}, HIDDEN)
+
+    async def save(self, doc):
+        """Create or update the profile for ``doc["user_id"]``; returns the replaced profile's id, if any."""
+        previous = await self.collection.find_one_and_update(
+            {"user_id": doc["user_id"]}, {"$set": self.stored(doc)}, projection={"_id": 0, "id": 1}, upsert=True
+        )
+        return previous["id"] if previous else None
+
+    async def available(self, limit=100):
+        return await self.collection.find({"available": True}, HIDDEN).to_list(limit)
+
+    async def nearby(self, lat, lng, radius_km, skip=0, limit=100):
+        return await super().nearby(lat, lng, radius_km, skip, limit, {"available": True})
+
+    async def all(self):
+        return await self.collection.find({}, HIDDEN).to_list(None)
+
+
+class MongoBPRecords(MongoRepository):
+    async def recent(self, user_id, limit=100):
+        return await self.collection.find({"user_id": user_id}, {"_id": 0}).sort("recorded_at", -1).to_list(limit)
+
+    async def series(self, user_id, start, end, fields):
+        """Readings with ``start <= recorded_at <= end`` (ISO strings), oldest first, limited to ``fields``."""
+        query = {"user_id": user_id, "recorded_at": {"$gte": start, "$lte": end}}
+        projection = {"_id": 0, **{f: 1 for f in fields}}
+        return [r async for r in self.collection.find(query, projection).sort("recorded_at", 1)]
+
+    async def count(self, user_id):
+        return await self.collection.count_documents({"user_id": user_id})
+
+    async def latest(self, user_id):
+        return await self.collection.find_one({"user_id": user_id}, {"_id": 0}, sort=[("recorded_at", -1)])
+
+    async def scan(self, user_id=None, fields=None):
+        """Yield readings grouped by user (one user's, or everyone's)."""
+        query = {"user_id": user_id} if user_id else {}
+        projection = {"_id": 0, **{f: 1 for f in fields}} if fields else {"_id": 0}
+        async for doc in self.collection.find(query, projection).sort("user_id", 1):
+            yield doc
+
+
+class MongoBPRollups(MongoRepository):
+    @staticmethod
+    def rollup_updates(merged):
+        return [
+            UpdateOne({"user_id": user_id, "day": day}, {"$inc": dict(inc)}, upsert=True)
+            for (user_id, day), inc in merged.items()
+        ]
+
+    async def increment(self, merged, batch_size=1000):
+        """Add ``{(user_id, day): {field: amount}}`` to the rollups; dotted fields address sub-documents."""
+        updates = self.rollup_updates(merged)
+        for i in range(0, len(updates), batch_size):
+            await self.collection.bulk_write(updates[i:i + batch_size], ordered=False)
+
+    async def replace_user(self, user_id, merged):
+        await self.collection.delete_many({"user_id": user_id})
+        await self.increment(merged)
+
+    async def since(self, user_id, day, limit):
+        return await self.collection.find({"user_id": user_id, "day": {"$gte": day}}, {"_id": 0}).to_list(limit)
+
+
+class MongoChatMessages(MongoRepository):
+    async def recent(self, session_id, user_id, limit):
+        """The latest ``limit`` messages of a session, newest first."""
+        return await self.collection.find(
+            {"session_id": session_id, "user_id": user_id}, {"_id": 0}
+        ).sort([("timestamp", -1), ("_id", -1)]).to_list(limit)
+
+    async def history(self, user_id, session_id=None, limit=100):
+        query = {"user_id": user_id}
+        if session_id:
+            query["session_id"] = session_id
+        return await self.collection.find(query, {"_id": 0}).sort("timestamp", 1).to_list(limit)
+
+    async def count_user_turns(self, user_id):
+        return await self.collection.count_documents({"user_id": user_id, "role": "user"})
+
+    async def session_summaries(self, user_id):
+        """Per-session last message, timestamps, language and message count for one user."""
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {"$sort": {"timestamp": 1, "_id": 1}},
+            {"$group": {
+                "_id": "$session_id",
+                "last_message": {"$last": "$content"},
+                "timestamp": {"$last": "$timestamp"},
+                "language": {"$last": "$language"},
+                "created_at": {"$first": "$timestamp"},
+                "count": {"$sum": 1},
+            }},
+        ]
+        return [
+            {"session_id": s.pop("_id"), **s} async for s in self.collection.aggregate(pipeline)
+        ]
+
+
+class MongoChatSessions(MongoRepository):
+    async def record_exchange(self, user_id, session_id, preview, timestamp, language, messages=2):
+        await self.collection.update_one(
+            {"user_id": user_id, "session_id": session_id},
+            {
+                "$set": {"last_message": preview, "timestamp": timestamp, "language": language},
+                "$inc": {"message_count": messages},
+                "$setOnInsert": {"created_at": timestamp},
+            },
+            upsert=True
+        )
+
+    async def merge_summary(self, user_id, session_id, summary):
+        """Fold a summary recounted from chat_messages into the stored one.
+
+        message_count only grows, created_at only moves earlier, and the preview fields
+        are replaced only if the summary is at least as recent as what is stored, so
+        exchanges recorded meanwhile are kept.
+        """
+        newer = {"$gte": [summary["timestamp"], {"$ifNull": ["$timestamp", ""]}]}
+        await self.collection.update_one({"user_id": user_id, "session_id": session_id}, [{"$set": {
+            "message_count": {"$max": [{"$ifNull": ["$message_count", 0]}, summary["message_count"]]},
+            "created_at": {"$min": [{"$ifNull": ["$created_at", summary["created_at"]]}, summary["created_at"]]},
+            **{field: {"$cond": [newer, {"$literal": summary[field]}, f"${field}"]}
+               for field in ("last_message", "timestamp", "language")},
+        }}], upsert=True)
+
+    async def list(self, user_id, skip=0, limit=20):
+        return await self.collection.find(
+            {"user_id": user_id}, {"_id": 0}
+        ).sort("timestamp", -1).skip(skip).limit(limit).to_list(limit)
+
+
+class MongoAmbulanceRequests(MongoRepository):
+    async def insert(self, doc):
+        await self.collection.insert_one(self.stored(doc))
+
+    async def get(self, request_id, user_id=None, status=None):
+        query = {"id": request_id}
+        if user_id is not None:
+            query["user_id"] = user_id
+        if status is not None:
+            query["status"] = status
+        return await self.collection.find_one(query, {"_id": 0})
+
+    async def open(self, limit=None):
+        return await self.collection.find(
+            {"status": {"$in": OPEN_AMBULANCE_STATUSES}}, {"_id": 0}
+        ).sort("created_at", 1).to_list(limit)
+
+    async def mark_dispatched(self, updates):
+        """Apply ``{request_id: fields}`` to requests that are still queued."""
+        if updates:
+            await self.collection.bulk_write(
+                [UpdateOne({"id": request_id, "status": "queued"}, {"$set": fields}) for request_id, fields in updates.items()],
+                ordered=False
+            )
+
+    async def close_open(self, request_id, user_id, fields):
+        """Set ``fields`` on the user's request if it is still open; returns the updated request or None."""
+        return await self.collection.find_one_and_update(
+            {"id": request_id, "user_id": user_id, "status": {"$in": OPEN_AMBULANCE_STATUSES}},
+            {"$set": fields},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def finish(self, request_ids, fields):
+        """Set ``fields`` on those of ``request_ids`` that are still open."""
+        if request_ids:
+            await self.collection.update_many(
+                {"id": {"$in": list(request_ids)}, "status": {"$in": OPEN_AMBULANCE_STATUSES}}, {"$set": fields}
+            )
+
+    async def finish_elapsed(self, now, fields):
+        """Set ``fields`` on dispatched requests whose unit was due back by ``now`` (ISO) or that
+        never recorded when; returns how many were closed."""
+        result = await self.collection.update_many(
+            {"status": "dispatched", "$or": [{"busy_until": {"$lte": now}}, {"busy_until": None}]}, {"$set": fields}
+        )
+        return result.modified_count
+
+    async def update(self, request_id, fields):
+        await self.collection.update_one({"id": request_id}, {"$set": fields})
+
+    async def count(self, user_id):
+        return await self.collection.count_documents({"user_id": user_id})
+
+
+class MongoUserStats(MongoRepository):
+    async def get(self, user_id):
+        return await self.collection.find_one({"user_id": user_id}, {"_id": 0})
+
+    async def increment(self, user_id, amounts, fields=None):
+        update = {"$inc": amounts}
+        if fields:
+            update["$set"] = fields
+        await self.collection.update_one({"user_id": user_id}, update, upsert=True)
+
+    async def set(self, user_id, fields):
+        await self.collection.update_one({"user_id": user_id}, {"$set": fields}, upsert=True)
+
+    @staticmethod
+    def newer_latest_bp(latest):
+        # Pipeline expression so bulk uploads of older readings don't replace a newer latest_bp
+        return {"$cond": [
+            {"$gt": [latest["recorded_at"], {"$ifNull": ["$latest_bp.recorded_at", ""]}]},
+            {"$literal": latest},
+            "$latest_bp",
+        ]}
+
+    async def record_bp(self, user_id, count, latest):
+        await self.collection.update_one({"user_id": user_id}, [{"$set": {
+            "bp_readings": {"$add": [{"$ifNull": ["$bp_readings", 0]}, count]},
+            "latest_bp": self.newer_latest_bp(latest),
+        }}], upsert=True)
+
+    async def merge_counts(self, user_id, counts, latest_bp=None, fields=None):
+        """Raise each counter to at least ``counts``, keep the newer latest_bp, set ``fields``.
+
+        Counters incremented since ``counts`` were taken are never lowered. Returns the
+        whole stats document.
+        """
+        stage = {field: {"$max": [{"$ifNull": [f"${field}", 0]}, count]} for field, count in counts.items()}
+        if latest_bp:
+            stage["latest_bp"] = self.newer_latest_bp(latest_bp)
+        stage.update({field: {"$literal": value} for field, value in (fields or {}).items()})
+        await self.collection.update_one({"user_id": user_id}, [{"$set": stage}], upsert=True)
+        return await self.get(user_id)
+
+
+class MongoDataVersions(MongoRepository):
+    async def bump(self, name):
+        await self.collection.update_one({"name": name}, {"$inc": {"version": 1}}, upsert=True)
+
+    async def get(self):
+        return {d["name"]: d["version"] for d in await self.collection.find({}, HIDDEN).to_list(None)}
+
+
+class MongoRepositories:
+    backend = "mongo"
+
+    def __init__(self, url, db_name, event_listeners=()):
+        self.client = AsyncIOMotorClient(url, event_listeners=list(event_listeners))
+        self.db = self.client[db_name]
+        self.users = MongoUsers(self.db.users)
+        self.hospitals = MongoHospitals(self.db.hospitals)
+        self.doctors = MongoDoctors(self.db.doctor_profiles)
+        self.bp_records = MongoBPRecords(self.db.bp_records)
+        self.bp_rollups = MongoBPRollups(self.db.bp_daily_rollups)
+        self.chat_messages = MongoChatMessages(self.db.chat_messages)
+        self.chat_sessions = MongoChatSessions(self.db.chat_sessions)
+        self.ambulance = MongoAmbulanceRequests(self.db.ambulance_requests)
+        self.user_stats = MongoUserStats(self.db.user_stats)
+        self.data_versions = MongoDataVersions(self.db.data_versions)
+
+    async def prepare(self):
+        await self.hospitals.backfill_geo_points()
+        await self.doctors.backfill_geo_points()
+        await self.hospitals.backfill_city_keys()
+        await ensure_indexes(self.db)
+
+    async def close(self):
+        self.client.close()
+
+    def stats(self):
+        return {"backend": self.backend}
@@ -0,0 +1,629 @@
+"""Embedded SQLite repositories for offline, single-box deployments (``STORAGE_BACKEND=sqlite``).
+
+Each table keeps the columns its queries filter or sort on, indexed, next to the whole
+document as JSON. The database runs in WAL mode so readers never wait for the writer:
+every write goes through one connection on a dedicated thread, in submission order
+(so there is no lock contention between writers), and reads are spread over a small
+pool of read-only connections. Startup is opening the file and a few
+``CREATE ... IF NOT EXISTS`` statements; nothing is loaded into memory up front.
+"""
+import abc
+import asyncio
+import json
+import logging
+import math
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from places import city_key
+from storage import haversine_km
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY, email TEXT NOT NULL UNIQUE, doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hospitals (
+    id TEXT PRIMARY KEY, city_key TEXT NOT NULL, lat REAL, lng REAL, doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hospitals_city_key ON hospitals (city_key);
+CREATE INDEX IF NOT EXISTS hospitals_lat_lng ON hospitals (lat, lng);
+CREATE TABLE IF NOT EXISTS doctor_profiles (
+    user_id TEXT PRIMARY KEY, id TEXT NOT NULL, available INTEGER NOT NULL, lat REAL, lng REAL, doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS doctor_profiles_available ON doctor_profiles (available);
+CREATE INDEX IF NOT EXISTS doctor_profiles_lat_lng ON doctor_profiles (lat, lng);
+CREATE TABLE IF NOT EXISTS bp_records (
+    id TEXT PRIMARY KEY, user_id TEXT NOT NULL, recorded_at TEXT NOT NULL, doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bp_records_user_recorded ON bp_records (user_id, recorded_at);
+CREATE TABLE IF NOT EXISTS bp_daily_rollups (
+    user_id TEXT NOT NULL, day TEXT NOT NULL, doc TEXT NOT NULL, PRIMARY KEY (user_id, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS chat_messages (
+    seq INTEGER PRIMARY KEY, session_id TEXT NOT NULL, user_id TEXT NOT NULL, role TEXT NOT NULL,
+    timestamp TEXT NOT NULL, doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chat_messages_session_ts ON chat_messages (session_id, user_id, timestamp);
+CREATE INDEX IF NOT EXISTS chat_messages_user_ts ON chat_messages (user_id, timestamp);
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    user_id TEXT NOT NULL, session_id TEXT NOT NULL, timestamp TEXT, doc TEXT NOT NULL,
+    PRIMARY KEY (user_id, session_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS chat_sessions_user_ts ON chat_sessions (user_id, timestamp);
+CREATE TABLE IF NOT EXISTS ambulance_requests (
+    id TEXT PRIMARY KEY, user_id TEXT NOT NULL, status TEXT NOT NULL, created_at TEXT NOT NULL, doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ambulance_requests_user_created ON ambulance_requests (user_id, created_at);
+CREATE INDEX IF NOT EXISTS ambulance_requests_status ON ambulance_requests (status);
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id TEXT PRIMARY KEY, doc TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS data_versions (
+    name TEXT PRIMARY KEY, version INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+OPEN_AMBULANCE_STATUSES = ("queued", "dispatched")
+
+
+def encode(doc):
+    return json.dumps(doc, separators=(",", ":"), ensure_ascii=False)
+
+
+def decode(text):
+    return json.loads(text)
+
+
+def increment_path(doc, field, amount):
+    """Mongo-style ``$inc`` of a possibly dotted field, in place."""
+    *parents, last = field.split(".")
+    for key in parents:
+        doc = doc.setdefault(key, {})
+    doc[last] = doc.get(last, 0) + amount
+
+
+class SQLiteStore:
+    """One writer connection and a pool of readers over a WAL-mode database file."""
+
+    def __init__(self, path, readers=4, busy_timeout_ms=5000, cache_kib=4096):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_kib = cache_kib
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+        self._readers = ThreadPoolExecutor(max_workers=max(readers, 1), thread_name_prefix="sqlite-reader")
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.writes = 0
+
+    def _connect(self, readonly):
+        # Autocommit mode; _call opens the transactions explicitly
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_kib)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if readonly:
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            conn.execute("PRAGMA journal_mode = WAL")
+            # In WAL mode NORMAL only syncs at checkpoints; a power cut can lose the last
+            # commits but never corrupts the database
+            conn.execute("PRAGMA synchronous = NORMAL")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _call(self, readonly, fn, args):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect(readonly)
+        conn.execute("BEGIN" if readonly else "BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, *args)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    async def read(self, fn, *args):
+        """Run ``fn(conn, *args)`` in a read transaction on a pooled reader."""
+        self.reads += 1
+        return await asyncio.get_running_loop().run_in_executor(self._readers, self._call, True, fn, args)
+
+    async def write(self, fn, *args):
+        """Run ``fn(conn, *args)`` in a write transaction on the writer thread."""
+        self.writes += 1
+        return await asyncio.get_running_loop().run_in_executor(self._writer, self._call, False, fn, args)
+
+    async def create_schema(self):
+        # Runs first, on the writer, so the file is in WAL mode before any reader opens it
+        await self.write(lambda conn: [conn.execute(s) for s in SCHEMA.split(";") if s.strip()])
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.execute("PRAGMA optimize")
+                except sqlite3.Error:
+                    pass
+                conn.close()
+            self._connections.clear()
+
+    def stats(self):
+        return {"path": self.path, "reads": self.reads, "writes": self.writes}
+
+
+class SQLiteRepository:
+    name = ""
+
+    def __init__(self, store):
+        self.store = store
+
+    def rows(self, sql, params=()):
+        return lambda conn: [decode(r[0]) for r in conn.execute(sql, params)]
+
+    def one(self, sql, params=()):
+        def fetch(conn):
+            row = conn.execute(sql, params).fetchone()
+            return decode(row[0]) if row else None
+        return fetch
+
+    async def query(self, sql, params=()):
+        return await self.store.read(self.rows(sql, params))
+
+    async def query_one(self, sql, params=()):
+        return await self.store.read(self.one(sql, params))
+
+    async def scalar(self, sql, params=()):
+        return await self.store.read(lambda conn: conn.execute(sql, params).fetchone()[0])
+
+
+class SQLiteTableRepository(SQLiteRepository, abc.ABC):
+    """A repository whose documents are inserted one row each with ``insert_sql``."""
+    insert_sql = ""
+
+    @abc.abstractmethod
+    def row(self, doc):
+        """Column values for ``insert_sql``, ending with the encoded document."""
+
+    async def insert_many(self, docs, ordered=True):
+        # One transaction per batch: all or nothing, whatever ``ordered`` says
+        if docs:
+            rows = [self.row(d) for d in docs]
+            await self.store.write(lambda conn: conn.executemany(self.insert_sql, rows))
+
+
+class SQLiteGeoRepository(SQLiteTableRepository):
+    table = ""
+
+    async def nearby(self, lat, lng, radius_km, skip=0, limit=100, where="1"):
+        # Bounding box on the (lat, lng) index, then exact great-circle distances
+        dlat = math.degrees(radius_km / 6371)
+        cos_lat = math.cos(math.radians(lat))
+        dlng = 180.0 if cos_lat < 1e-6 else min(180.0, dlat / cos_lat)
+        sql = (f"SELECT lat, lng, doc FROM {self.table} "
+               f"WHERE {where} AND lat BETWEEN ? AND ? AND lng BETWEEN ? AND ?")
+        params = (lat - dlat, lat + dlat, lng - dlng, lng + dlng)
+
+        def fetch(conn):
+            found = []
+            for plat, plng, doc in conn.execute(sql, params):
+                distance = haversine_km(lat, lng, plat, plng)
+                if distance <= radius_km:
+                    found.append((distance, doc))
+            found.sort(key=lambda f: f[0])
+            return [{**decode(doc), "distance_km": round(distance, 1)} for distance, doc in found[skip:skip + limit]]
+
+        return await self.store.read(fetch)
+
+
+class SQLiteUsers(SQLiteTableRepository):
+    name = "users"
+    insert_sql = "INSERT INTO users (id, email, doc) VALUES (?, ?, ?)"
+
+    def row(self, doc):
+        return doc["id"], doc["email"], encode(doc)
+
+    async def get(self, user_id):
+        user = await self.query_one("SELECT doc FROM users WHERE id = ?", (user_id,))
+        if user:
+            user.pop("password", None)
+        return user
+
+    async def get_by_email(self, email):
+        return await self.query_one("SELECT doc FROM users WHERE email = ?", (email,))
+
+    async def insert(self, doc):
+        await self.insert_many([doc])
+
+
+class SQLiteHospitals(SQLiteGeoRepository):
+    name = table = "hospitals"
+    insert_sql = "INSERT INTO hospitals (id, city_key, lat, lng, doc) VALUES (?, ?, ?, ?, ?)"
+
+    def row(self, doc):
+        return doc["id"], city_key(doc.get("city", "")), doc.get("lat"), doc.get("lng"), encode(doc)
+
+    async def count(self):
+        return await self.scalar("SELECT COUNT(*) FROM hospitals")
+
+    async def all(self, limit=None):
+        return await self.query("SELECT doc FROM hospitals LIMIT ?", (-1 if limit is None else limit,))
+
+    async def by_city_prefix(self, key, limit=100):
+        # Range on the indexed key: every string starting with ``key`` sorts in [key, key + U+10FFFF)
+        return await self.query(
+            "SELECT doc FROM hospitals WHERE city_key >= ? AND city_key < ? LIMIT ?", (key, key + "\U0010ffff", limit)
+        )
+
+    async def upsert_many(self, docs):
+        """Insert or update hospitals by ``id``, setting only the given fields; returns (inserted, updated)."""
+        def upsert(conn):
+            existing = {}
+            ids = [d["id"] for d in docs]
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                existing.update(conn.execute(f"SELECT id, doc FROM hospitals WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+            conn.executemany(
+                self.insert_sql + " ON CONFLICT (id) DO UPDATE SET "
+                "city_key = excluded.city_key, lat = excluded.lat, lng = excluded.lng, doc = excluded.doc",
+                [self.row({**decode(existing[d["id"]]), **d} if d["id"] in existing else d) for d in docs],
+            )
+            return len(docs) - len(existing), len(existing)
+        return await self.store.write(upsert) if docs else (0, 0)
+
+
+class SQLiteDoctors(SQLiteGeoRepository):
+    name = table = "doctor_profiles"
+    insert_sql = "INSERT INTO doctor_profiles (user_id, id, available, lat, lng, doc) VALUES (?, ?, ?, ?, ?, ?)"
+
+    def row(self, doc):
+        return doc["user_id"], doc["id"], int(bool(doc.get("available"))), doc.get("lat"), doc.get("lng"), encode(doc)
+
+    async def get_by_user(self, user_id):
+        return await self.query_one("SELECT doc FROM doctor_profiles WHERE user_id = ?", (user_id,))
+
+    async def save(self, doc):
+        """Create or update the profile for ``doc["user_id"]``; returns the replaced profile's id, if any."""
+        def upsert(conn):
+            row = conn.execute("SELECT doc FROM doctor_profiles WHERE user_id = ?", (doc["user_id"],)).fetchone()
+            previous = decode(row[0]) if row else None
+            merged = {**previous, **doc} if previous else doc
+            conn.execute(self.insert_sql.replace("INSERT", "INSERT OR REPLACE"), self.row(merged))
+            return previous["id"] if previous else None
+        return await self.store.write(upsert)
+
+    async def available(self, limit=100):
+        return await self.query("SELECT doc FROM doctor_profiles WHERE available = 1 LIMIT ?", (limit,))
+
+    async def nearby(self, lat, lng, radius_km, skip=0, limit=100):
+        return await super().nearby(lat, lng, radius_km, skip, limit, where="available = 1")
+
+    async def all(self):
+        return await self.query("SELECT doc FROM doctor_profiles")
+
+
+class SQLiteBPRecords(SQLiteTableRepository):
+    name = "bp_records"
+    insert_sql = "INSERT INTO bp_records (id, user_id, recorded_at, doc) VALUES (?, ?, ?, ?)"
+
+    def row(self, doc):
+        return doc["id"], doc["user_id"], doc["recorded_at"], encode(doc)
+
+    async def recent(self, user_id, limit=100):
+        return await self.query(
+            "SELECT doc FROM bp_records WHERE user_id = ? ORDER BY recorded_at DESC LIMIT ?", (user_id, limit)
+        )
+
+    async def series(self, user_id, start, end, fields):
+        """Readings with ``start <= recorded_at <= end`` (ISO strings), oldest first, limited to ``fields``."""
+        def fetch(conn):
+            cursor = conn.execute(
+                "SELECT doc FROM bp_records WHERE user_id = ? AND recorded_at BETWEEN ? AND ? ORDER BY recorded_at",
+                (user_id, start, end),
+            )
+            return [{f: d[f] for f in fields if f in d} for d in (decode(r[0]) for r in cursor)]
+        return await self.store.read(fetch)
+
+    async def count(self, user_id):
+        return await self.scalar("SELECT COUNT(*) FROM bp_records WHERE user_id = ?", (user_id,))
+
+    async def latest(self, user_id):
+        return await self.query_one(
+            "SELECT doc FROM bp_records WHERE user_id = ? ORDER BY recorded_at DESC LIMIT 1", (user_id,)
+        )
+
+    async def scan(self, user_id=None, fields=None, page=1000):
+        """Yield readings grouped by user (one user's, or everyone's), a page at a time."""
+        if user_id:
+            user_ids = [user_id]
+        else:
+            user_ids = await self.store.read(lambda conn: [r[0] for r in conn.execute("SELECT DISTINCT user_id FROM bp_records")])
+        for uid in user_ids:
+            # Keyset pagination in (user_id, recorded_at, rowid) index order
+            after = ("", 0)
+            while True:
+                rows = await self.store.read(lambda conn: conn.execute(
+                    "SELECT recorded_at, rowid, doc FROM bp_records WHERE user_id = ? AND (recorded_at, rowid) > (?, ?) "
+                    "ORDER BY recorded_at, rowid LIMIT ?", (uid, *after, page)
+                ).fetchall())
+                for _, _, doc in rows:
+                    doc = decode(doc)
+                    yield {f: doc[f] for f in fields if f in doc} if fields else doc
+                if len(rows) < page:
+                    break
+                after = rows[-1][:2]
+
+
+class SQLiteBPRollups(SQLiteRepository):
+    name = "bp_daily_rollups"
+
+    @staticmethod
+    def apply(conn, merged):
+        for (user_id, day), inc in merged.items():
+            row = conn.execute("SELECT doc FROM bp_daily_rollups WHERE user_id = ? AND day = ?", (user_id, day)).fetchone()
+            doc = decode(row[0]) if row else {"user_id": user_id, "day": day}
+            for field, amount in inc.items():
+                increment_path(doc, field, amount)
+            conn.execute("INSERT OR REPLACE INTO bp_daily_rollups (user_id, day, doc) VALUES (?, ?, ?)", (user_id, day, encode(doc)))
+
+    async def increment(self, merged):
+        """Add ``{(user_id, day): {field: amount}}`` to the rollups; dotted fields address sub-documents."""
+        if merged:
+            await self.store.write(self.apply, merged)
+
+    async def replace_user(self, user_id, merged):
+        def replace(conn):
+            conn.execute("DELETE FROM bp_daily_rollups WHERE user_id = ?", (user_id,))
+            self.apply(conn, merged)
+        await self.store.write(replace)
+
+    async def since(self, user_id, day, limit):
+        return await self.query(
+            "SELECT doc FROM bp_daily_rollups WHERE user_id = ? AND day >= ? LIMIT ?", (user_id, day, limit)
+        )
+
+
+class SQLiteChatMessages(SQLiteTableRepository):
+    name = "chat_messages"
+    insert_sql = "INSERT INTO chat_messages (session_id, user_id, role, timestamp, doc) VALUES (?, ?, ?, ?, ?)"
+
+    def row(self, doc):
+        return doc["session_id"], doc["user_id"], doc["role"], doc["timestamp"], encode(doc)
+
+    async def recent(self, session_id, user_id, limit):
+        """The latest ``limit`` messages of a session, newest first."""
+        return await self.query(
+            "SELECT doc FROM chat_messages WHERE session_id = ? AND user_id = ? ORDER BY timestamp DESC, seq DESC LIMIT ?",
+            (session_id, user_id, limit),
+        )
+
+    async def history(self, user_id, session_id=None, limit=100):
+        if session_id:
+            return await self.query(
+                "SELECT doc FROM chat_messages WHERE session_id = ? AND user_id = ? ORDER BY timestamp, seq LIMIT ?",
+                (session_id, user_id, limit),
+            )
+        return await self.query(
+            "SELECT doc FROM chat_messages WHERE user_id = ? ORDER BY timestamp, seq LIMIT ?", (user_id, limit)
+        )
+
+    async def count_user_turns(self, user_id):
+        return await self.scalar("SELECT COUNT(*) FROM chat_messages WHERE user_id = ? AND role = 'user'", (user_id,))
+
+    async def session_summaries(self, user_id):
+        """Per-session last message, timestamps, language and message count for one user."""
+        summaries = {}
+        for m in await self.history(user_id, limit=-1):
+            s = summaries.get(m["session_id"])
+            if s is None:
+                s = summaries[m["session_id"]] = {"session_id": m["session_id"], "created_at": m["timestamp"], "count": 0}
+            s.update(last_message=m["content"], timestamp=m["timestamp"], language=m.get("language"))
+            s["count"] += 1
+        return list(summaries.values())
+
+
+class SQLiteChatSessions(SQLiteRepository):
+    name = "chat_sessions"
+
+    def update(self, user_id, session_id, change):
+        def apply(conn):
+            row = conn.execute(
+                "SELECT doc FROM chat_sessions WHERE user_id = ? AND session_id = ?", (user_id, session_id)
+            ).fetchone()
+            doc = decode(row[0]) if row else {"user_id": user_id, "session_id": session_id}
+            change(doc, row is None)
+            conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions (user_id, session_id, timestamp, doc) VALUES (?, ?, ?, ?)",
+                (user_id, session_id, doc.get("timestamp"), encode(doc)),
+            )
+        return self.store.write(apply)
+
+    async def record_exchange(self, user_id, session_id, preview, timestamp, language, messages=2):
+        def change(doc, created):
+            doc.update(last_message=preview, timestamp=timestamp, language=language)
+            increment_path(doc, "message_count", messages)
+            if created:
+                doc["created_at"] = timestamp
+        await self.update(user_id, session_id, change)
+
+    async def merge_summary(self, user_id, session_id, summary):
+        """Fold a summary recounted from chat_messages into the stored one (see the Mongo repository)."""
+        def change(doc, created):
+            doc["message_count"] = max(doc.get("message_count", 0), summary["message_count"])
+            doc["created_at"] = min(doc.get("created_at") or summary["created_at"], summary["created_at"])
+            if summary["timestamp"] >= (doc.get("timestamp") or ""):
+                doc.update({field: summary[field] for field in ("last_message", "timestamp", "language")})
+        await self.update(user_id, session_id, change)
+
+    async def list(self, user_id, skip=0, limit=20):
+        return await self.query(
+            "SELECT doc FROM chat_sessions WHERE user_id = ? ORDER BY timestamp DESC LIMIT ? OFFSET ?", (user_id, limit, skip)
+        )
+
+
+class SQLiteAmbulanceRequests(SQLiteTableRepository):
+    name = "ambulance_requests"
+    insert_sql = "INSERT INTO ambulance_requests (id, user_id, status, created_at, doc) VALUES (?, ?, ?, ?, ?)"
+
+    def row(self, doc):
+        return doc["id"], doc["user_id"], doc["status"], doc["created_at"], encode(doc)
+
+    async def insert(self, doc):
+        await self.insert_many([doc])
+
+    async def get(self, request_id, user_id=None, status=None):
+        sql, params = "SELECT doc FROM ambulance_requests WHERE id = ?", [request_id]
+        if user_id is not None:
+            sql += " AND user_id = ?"
+            params.append(user_id)
+        if status is not None:
+            sql += " AND status = ?"
+            params.append(status)
+        return await self.query_one(sql, params)
+
+    async def open(self, limit=None):
+        return await self.query(
+            "SELECT doc FROM ambulance_requests WHERE status IN (?, ?) ORDER BY created_at LIMIT ?",
+            (*OPEN_AMBULANCE_STATUSES, -1 if limit is None else limit),
+        )
+
+    @staticmethod
+    def _set(conn, request_id, fields, where="", params=()):
+        row = conn.execute(f"SELECT doc FROM ambulance_requests WHERE id = ?{where}", (request_id, *params)).fetchone()
+        if row is None:
+            return None
+        doc = {**decode(row[0]), **fields}
+        conn.execute("UPDATE ambulance_requests SET status = ?, doc = ? WHERE id = ?", (doc["status"], encode(doc), request_id))
+        return doc
+
+    async def mark_dispatched(self, updates):
+        """Apply ``{request_id: fields}`` to requests that are still queued."""
+        def apply(conn):
+            for request_id, fields in updates.items():
+                self._set(conn, request_id, fields, " AND status = 'queued'")
+        if updates:
+            await self.store.write(apply)
+
+    async def close_open(self, request_id, user_id, fields):
+        """Set ``fields`` on the user's request if it is still open; returns the updated request or None."""
+        return await self.store.write(
+            self._set, request_id, fields, " AND user_id = ? AND status IN (?, ?)", (user_id, *OPEN_AMBULANCE_STATUSES)
+        )
+
+    async def finish(self, request_ids, fields):
+        """Set ``fields`` on those of ``request_ids`` that are still open."""
+        def apply(conn):
+            for request_id in request_ids:
+                self._set(conn, request_id, fields, " AND status IN (?, ?)", OPEN_AMBULANCE_STATUSES)
+        if request_ids:
+            await self.store.write(apply)
+
+    async def finish_elapsed(self, now, fields):
+        """Set ``fields`` on dispatched requests whose unit was due back by ``now`` (ISO) or that
+        never recorded when; returns how many were closed."""
+        def apply(conn):
+            ids = [r[0] for r in conn.execute(
+                "SELECT id FROM ambulance_requests WHERE status = 'dispatched'"
+                " AND coalesce(json_extract(doc, '$.busy_until'), '') <= ?", (now,)
+            )]
+            for request_id in ids:
+                self._set(conn, request_id, fields)
+            return len(ids)
+        return await self.store.write(apply)
+
+    async def update(self, request_id, fields):
+        await self.store.write(self._set, request_id, fields)
+
+    async def count(self, user_id):
+        return await self.scalar("SELECT COUNT(*) FROM ambulance_requests WHERE user_id = ?", (user_id,))
+
+
+class SQLiteUserStats(SQLiteRepository):
+    name = "user_stats"
+
+    def update(self, user_id, change):
+        def apply(conn):
+            row = conn.execute("SELECT doc FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()
+            doc = decode(row[0]) if row else {"user_id": user_id}
+            change(doc)
+            conn.execute("INSERT OR REPLACE INTO user_stats (user_id, doc) VALUES (?, ?)", (user_id, encode(doc)))
+            return doc
+        return self.store.write(apply)
+
+    async def get(self, user_id):
+        return await self.query_one("SELECT doc FROM user_stats WHERE user_id = ?", (user_id,))
+
+    async def increment(self, user_id, amounts, fields=None):
+        def change(doc):
+            for field, amount in amounts.items():
+                increment_path(doc, field, amount)
+            doc.update(fields or {})
+        await self.update(user_id, change)
+
+    async def set(self, user_id, fields):
+        await self.update(user_id, lambda doc: doc.update(fields))
+
+    async def record_bp(self, user_id, count, latest):
+        def change(doc):
+            doc["bp_readings"] = doc.get("bp_readings", 0) + count
+            # Bulk uploads of older readings must not replace a newer latest_bp
+            if latest["recorded_at"] > ((doc.get("latest_bp") or {}).get("recorded_at") or ""):
+                doc["latest_bp"] = latest
+        await self.update(user_id, change)
+
+    async def merge_counts(self, user_id, counts, latest_bp=None, fields=None):
+        """Raise each counter to at least ``counts``, keep the newer latest_bp, set ``fields``."""
+        def change(doc):
+            for field, count in counts.items():
+                doc[field] = max(doc.get(field, 0), count)
+            if latest_bp and latest_bp["recorded_at"] > ((doc.get("latest_bp") or {}).get("recorded_at") or ""):
+                doc["latest_bp"] = latest_bp
+            doc.update(fields or {})
+        return await self.update(user_id, change)
+
+
+class SQLiteDataVersions(SQLiteRepository):
+    name = "data_versions"
+
+    async def bump(self, name):
+        await self.store.write(lambda conn: conn.execute(
+            "INSERT INTO data_versions (name, version) VALUES (?, 1)"
+            " ON CONFLICT (name) DO UPDATE SET version = version + 1", (name,)))
+
+    async def get(self):
+        return await self.store.read(lambda conn: dict(conn.execute("SELECT name, version FROM data_versions")))
+
+
+class SQLiteRepositories:
+    backend = "sqlite"
+
+    def __init__(self, path, readers=4):
+        self.store = SQLiteStore(path, readers=readers)
+        self.users = SQLiteUsers(self.store)
+        self.hospitals = SQLiteHospitals(self.store)
+        self.doctors = SQLiteDoctors(self.store)
+        self.bp_records = SQLiteBPRecords(self.store)
+        self.bp_rollups = SQLiteBPRollups(self.store)
+        self.chat_messages = SQLiteChatMessages(self.store)
+        self.chat_sessions = SQLiteChatSessions(self.store)
+        self.ambulance = SQLiteAmbulanceRequests(self.store)
+        self.user_stats = SQLiteUserStats(self.store)
+        self.data_versions = SQLiteDataVersions(self.store)
+
+    async def prepare(self):
+        await self.store.create_schema()
+        logger.info(f"SQLite storage ready at {self.store.path}")
+
+    async def close(self):
+        await asyncio.to_thread(self.store.close)
+
+    def stats(self):
+        return {"backend": self.backend, **self.store.stats()}
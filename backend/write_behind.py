@@ -0,0 +1,107 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Collects inserts per collection and writes them with insert_many in the background.
+
+    A batch is flushed when a collection reaches ``max_batch`` pending documents or
+    every ``flush_interval`` seconds, whichever comes first. Callers that push the total
+    backlog past ``max_pending`` wait for a flush, which bounds memory if Mongo stalls.
+    ``close()`` drains everything still buffered and must run before the client closes.
+
+    Only inserts are buffered. The rollup, user_stats and chat session upserts that
+    accompany them stay awaited on the request path, because the dashboard, analytics
+    and session list read them right after the write with no buffered copy to merge
+    in. A BP reading or chat turn therefore still waits on one or two small upserts;
+    only the insert's latency is taken off the request.
+    """
+
+    def __init__(self, max_batch=200, flush_interval=0.25, max_pending=20000):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._inflight = {}
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._closing = False
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def pending(self):
+        return sum(len(docs) for _, docs in self._pending.values())
+
+    def buffered(self, collection_name, predicate):
+        """Documents accepted but not yet confirmed written, for read-your-writes merging."""
+        docs = []
+        for source in (self._inflight, self._pending):
+            if collection_name in source:
+                docs.extend(d for d in source[collection_name][1] if predicate(d))
+        return [{k: v for k, v in d.items() if k != "_id"} for d in docs]
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def add(self, collection, docs):
+        if self._task is None:
+            # Not running (startup not reached or already closed): write through
+            await collection.insert_many(docs)
+            return
+        _, queued = self._pending.setdefault(collection.name, (collection, []))
+        queued.extend(docs)
+        if len(queued) >= self.max_batch:
+            self._wakeup.set()
+        if self.pending >= self.max_pending:
+            await self.flush()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush error: {e}")
+
+    async def flush(self):
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            self._inflight = pending
+            for name, (collection, docs) in pending.items():
+                for i in range(0, len(docs), self.max_batch):
+                    batch = docs[i:i + self.max_batch]
+                    try:
+                        await collection.insert_many(batch, ordered=False)
+                        self.written += len(batch)
+                    except Exception as e:
+                        self.failed += len(batch)
+                        logger.error(f"Write-behind insert into {name} failed for {len(batch)} documents: {e}")
+                    self.batches += 1
+            self._inflight = {}
+
+    async def close(self):
+        if self._task is not None:
+            # Let an in-progress flush finish rather than cancelling it mid-insert
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            "pending": self.pending,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
@@ -3,9 +3,12 @@
 import requests
 import sys
 import json
-import uuid
 from datetime import datetime
 
+from tests.scenarios import (
+    TEST_PASSWORD, NEARBY_HOSPITALS, HOSPITALS_BY_CITY, BP_READING, CHAT_MESSAGE, AMBULANCE_REQUEST, new_user
+)
+
 class CareLensAPITester:
     def __init__(self, base_url="https://health-insights-ai.preview.emergentagent.com"):
         self.base_url = base_url
@@ -66,13 +69,7 @@ class CareLensAPITester:
         print("\n👤 Testing user registration...")
         
         # Test patient registration
-        patient_data = {
-            "name": f"Test Patient {uuid.uuid4().hex[:8]}",
-            "email": f"patient_{uuid.uuid4().hex[:8]}@test.com",
-            "password": "testpass123",
-            "phone": "+91 98765 43210",
-            "role": "patient"
-        }
+        patient_data = new_user("patient")
         
         success, response = self.test_api_endpoint("POST", "auth/register", 200, patient_data)
         
@@ -94,13 +91,7 @@ class CareLensAPITester:
                 self.log_test("Patient Registration", False, f"Error: {response}")
 
         # Test doctor registration
-        doctor_data = {
-            "name": f"Dr. Test Doctor {uuid.uuid4().hex[:8]}",
-            "email": f"doctor_{uuid.uuid4().hex[:8]}@test.com", 
-            "password": "testpass123",
-            "phone": "+91 98765 43211",
-            "role": "doctor"
-        }
+        doctor_data = new_user("doctor")
         
         success, response = self.test_api_endpoint("POST", "auth/register", 200, doctor_data)
         self.log_test("Doctor Registration", success, f"Status: {response.status_code if hasattr(response, 'status_code') else 'Error'}")
@@ -115,7 +106,7 @@ class CareLensAPITester:
         
         login_data = {
             "email": self.user_data['email'], 
-            "password": "testpass123"
+            "password": TEST_PASSWORD
         }
         
         success, response = self.test_api_endpoint("POST", "auth/login", 200, login_data)
@@ -168,7 +159,7 @@ class CareLensAPITester:
         print("\n🏥 Testing nearby hospitals...")
         
         # Test with Kovilpatti coordinates
-        success, response = self.test_api_endpoint("GET", "hospitals/nearby?lat=9.17&lng=77.87&radius=50", 200)
+        success, response = self.test_api_endpoint("GET", NEARBY_HOSPITALS, 200)
         
         if success:
             try:
@@ -189,7 +180,7 @@ class CareLensAPITester:
         """Test hospitals by city search"""
         print("\n🏥 Testing hospitals by city...")
         
-        success, response = self.test_api_endpoint("GET", "hospitals/by-city?city=Kovilpatti", 200)
+        success, response = self.test_api_endpoint("GET", HOSPITALS_BY_CITY, 200)
         
         if success:
             try:
@@ -217,14 +208,7 @@ class CareLensAPITester:
         headers = {"Authorization": f"Bearer {self.token}"}
         
         # Add BP record
-        bp_data = {
-            "systolic": 120,
-            "diastolic": 80,
-            "pulse": 72,
-            "notes": "Morning reading"
-        }
-        
-        success, response = self.test_api_endpoint("POST", "bp/record", 200, bp_data, headers)
+        success, response = self.test_api_endpoint("POST", "bp/record", 200, BP_READING, headers)
         
         if success:
             try:
@@ -269,18 +253,13 @@ class CareLensAPITester:
         
         headers = {"Authorization": f"Bearer {self.token}"}
         
-        chat_data = {
-            "message": "I have a headache. What should I do?",
-            "language": "English"
-        }
-        
         # Give extra time for AI response
         url = f"{self.api_url}/chat/message"
         test_headers = {'Content-Type': 'application/json'}
         test_headers.update(headers)
         
         try:
-            response = requests.post(url, json=chat_data, headers=test_headers, timeout=60)
+            response = requests.post(url, json=CHAT_MESSAGE, headers=test_headers, timeout=60)
             success = response.status_code == 200
             
             if success:
@@ -308,16 +287,7 @@ class CareLensAPITester:
         
         headers = {"Authorization": f"Bearer {self.token}"}
         
-        ambulance_data = {
-            "lat": 9.1742,
-            "lng": 77.8697, 
-            "patient_name": "Test Patient",
-            "phone": "+91 98765 43210",
-            "emergency_type": "general",
-            "notes": "Test emergency request"
-        }
-        
-        success, response = self.test_api_endpoint("POST", "ambulance/request", 200, ambulance_data, headers)
+        success, response = self.test_api_endpoint("POST", "ambulance/request", 200, AMBULANCE_REQUEST, headers)
         
         if success:
             try:
@@ -1,4 +1,4 @@
-import { useState } from "react";
+import { useState, useEffect } from "react";
 import { Link, useNavigate } from "react-router-dom";
 import { useAuth, API } from "@/App";
 import axios from "axios";
@@ -13,6 +13,22 @@ const EmergencyPage = () => {
 
   const headers = token ? { Authorization: `Bearer ${token}` } : {};
 
+  const requestId = ambulanceReq?.id;
+  useEffect(() => {
+    if (!requestId || !token) return;
+    const ws = new WebSocket(`${API.replace(/^http/, "ws")}/ambulance/requests/${requestId}/track?token=${token}`);
+    ws.onmessage = (event) => {
+      const msg = JSON.parse(event.data);
+      if (msg.type === "ping") return;
+      // Position updates carry the vehicle's coordinates; only their refreshed ETA is shown.
+      // Status-only messages omit the other fields, so merge just the keys a message has.
+      const fields = msg.type === "position" ? ["eta_minutes"] : ["status", "eta_minutes", "hospital_name", "distance_km"];
+      const update = Object.fromEntries(fields.filter((key) => key in msg).map((key) => [key, msg[key]]));
+      setAmbulanceReq((req) => (req && req.id === msg.request_id ? { ...req, ...update } : req));
+    };
+    return () => ws.close();
+  }, [requestId, token]);
+
   const requestAmbulance = async () => {
     if (!token) { navigate("/login"); return; }
     setRequesting(true);
@@ -99,12 +115,13 @@ const EmergencyPage = () => {
               <div className="bg-emerald-50 rounded-2xl p-5 mb-6">
                 <div className="flex items-center justify-center gap-2 text-[#00C853]">
                   <Clock className="w-5 h-5" />
-                  <span className="text-2xl font-bold font-['Outfit']">ETA: {ambulanceReq.eta_minutes} minutes</span>
+                  <span className="text-2xl font-bold font-['Outfit']">{ambulanceReq.status === "expired" ? 'No ambulance nearby is free, please call 108' : ambulanceReq.status === "completed" ? 'Mission completed' : ambulanceReq.eta_minutes != null ? `ETA: ${ambulanceReq.eta_minutes} minutes` : 'Waiting for the next free ambulance nearby'}</span>
                 </div>
               </div>
 
               <div className="text-left space-y-2 text-sm">
                 <p><span className="font-medium text-gray-500">Status:</span> <span className="text-[#00C853] font-bold uppercase">{ambulanceReq.status}</span></p>
+                {ambulanceReq.hospital_name && <p><span className="font-medium text-gray-500">From:</span> {ambulanceReq.hospital_name} ({ambulanceReq.distance_km} km)</p>}
                 <p><span className="font-medium text-gray-500">Request ID:</span> {ambulanceReq.id?.slice(0, 8)}</p>
                 <p><span className="font-medium text-gray-500">Type:</span> {ambulanceReq.emergency_type}</p>
               </div>
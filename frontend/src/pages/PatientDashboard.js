@@ -13,9 +13,10 @@ const PatientDashboard = () => {
 
   const headers = { Authorization: `Bearer ${token}` };
 
-  const fetchStats = useCallback(async () => {
+  const fetchStats = useCallback(async (lat, lng) => {
     try {
-      const res = await axios.get(`${API}/dashboard/stats`, { headers });
+      const params = lat !== undefined ? { lat, lng } : {};
+      const res = await axios.get(`${API}/dashboard/stats`, { headers, params });
       setStats(res.data);
     } catch (e) { console.error(e); }
   }, [token]);
@@ -28,19 +29,22 @@ const PatientDashboard = () => {
   }, [token]);
 
   useEffect(() => {
-    fetchStats();
-    if (navigator.geolocation) {
+    if (!navigator.geolocation) {
+      fetchStats();
+    } else {
       navigator.geolocation.getCurrentPosition(
         (pos) => {
           const { latitude, longitude } = pos.coords;
           setLocation({ lat: latitude, lng: longitude });
           setLocationName(`${latitude.toFixed(2)}°N, ${longitude.toFixed(2)}°E`);
+          fetchStats(latitude, longitude);
           fetchNearby(latitude, longitude);
         },
         () => {
-          // Default to Kovilpatti
+          // Default to Kovilpatti for the hospital list; stats fall back to the last saved location
           setLocation({ lat: 9.1742, lng: 77.8697 });
           setLocationName("Kovilpatti, Tamil Nadu");
+          fetchStats();
           fetchNearby(9.1742, 77.8697);
         }
       );
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""Async load generator for the CareLens API, built on the backend_test.py scenarios.
+
+By default the app runs in-process and fully offline: Mongo is replaced by mongomock
+(with a small $geoNear emulation) and LlmChat by a stub that sleeps for a configurable
+latency. mongomock has no indexes or query planner, so every query is an in-memory
+scan: its numbers track the API's own overhead, not how a real Mongo would perform.
+--storage sqlite runs against the embedded SQLite backend in a temporary file
+instead. Pass --url to load a running deployment.
+
+    python loadtest.py --concurrency 50 --duration 30 --llm-latency 1.5
+    python loadtest.py --storage sqlite
+    python loadtest.py --mix bp=5,nearby=3,chat=1 --save baseline.json
+    python loadtest.py --baseline baseline.json --max-regression 0.25
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import types
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+from tests.scenarios import (
+    NEARBY_HOSPITALS, HOSPITALS_BY_CITY, BP_READING, CHAT_MESSAGE, AMBULANCE_REQUEST, TEST_PASSWORD, new_user
+)
+
+ROOT = Path(__file__).parent
+DEFAULT_MIX = "login=1,me=2,nearby=4,by_city=2,bp=6,bp_records=3,chat=2,ambulance=1,dashboard=2"
+
+
+# ---------- offline stand-ins ----------
+
+def install_llm_stub(latency, jitter):
+    """Register a fake emergentintegrations.llm.chat whose LlmChat sleeps instead of calling out."""
+
+    class UserMessage:
+        def __init__(self, text):
+            self.text = text
+
+    class LlmChat:
+        def __init__(self, api_key=None, session_id=None, system_message=None):
+            self.session_id = session_id
+            self.system_message = system_message
+            self.messages = []
+
+        def with_model(self, provider, model):
+            return self
+
+        async def send_message(self, message):
+            await asyncio.sleep(max(0.0, random.gauss(latency, jitter)))
+            return f"Stub reply to: {message.text}"
+
+    chat = types.ModuleType("emergentintegrations.llm.chat")
+    chat.LlmChat = LlmChat
+    chat.UserMessage = UserMessage
+    for name in ("emergentintegrations", "emergentintegrations.llm"):
+        sys.modules.setdefault(name, types.ModuleType(name))
+    sys.modules["emergentintegrations.llm.chat"] = chat
+
+
+def install_mongo_stand_in():
+    """Swap Motor for mongomock_motor and patch the places where it differs from Mongo on the API's paths.
+
+    Returns a function that undoes every patch.
+    """
+    import mongomock.aggregate
+    import mongomock.collection
+    import mongomock.filtering
+    import mongomock_motor
+    import motor.motor_asyncio
+    from pymongo import ReturnDocument
+
+    undo = []
+
+    def patch(target, name, value):
+        original = getattr(target, name)
+        setattr(target, name, value)
+        undo.append(lambda: setattr(target, name, original))
+
+    def patch_item(mapping, key, value):
+        original = mapping[key]
+        mapping[key] = value
+        undo.append(lambda: mapping.__setitem__(key, original))
+
+    def restore():
+        while undo:
+            undo.pop()()
+
+    def geo_near(in_collection, database, options):
+        lng, lat = options["near"]["coordinates"]
+        max_m = options.get("maxDistance", math.inf)
+        results = []
+        for doc in in_collection:
+            point = (doc.get("location") or {}).get("coordinates")
+            if not point or not mongomock.filtering.filter_applies(options.get("query") or {}, doc):
+                continue
+            p1, p2 = math.radians(lat), math.radians(point[1])
+            a = (math.sin((p2 - p1) / 2) ** 2
+                 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(point[0] - lng) / 2) ** 2)
+            meters = 6371000 * 2 * math.asin(math.sqrt(a))
+            if meters <= max_m:
+                results.append({**doc, options["distanceField"]: meters})
+        results.sort(key=lambda d: d[options["distanceField"]])
+        return results
+
+    patch_item(mongomock.aggregate._PIPELINE_HANDLERS, "$geoNear", geo_near)
+
+    # $round is used when shaping geo results; mongomock lacks it
+    handle_arithmetic = mongomock.aggregate._Parser._handle_arithmetic_operator
+
+    def handle_round(self, operator, values):
+        if operator == "$round":
+            number, places = (list(self.parse_many(values)) + [0])[:2]
+            return None if number is None else round(number, places)
+        return handle_arithmetic(self, operator, values)
+
+    if "$round" not in mongomock.aggregate.arithmetic_operators:
+        mongomock.aggregate.arithmetic_operators.add("$round")
+        undo.append(lambda: mongomock.aggregate.arithmetic_operators.discard("$round"))
+    patch(mongomock.aggregate._Parser, "_handle_arithmetic_operator", handle_round)
+
+    # mongomock re-runs the filter to fetch the ReturnDocument.AFTER copy, so an update that
+    # changes a filtered field (an open request being completed) returned None
+    find_one_and_update = mongomock.collection.Collection.find_one_and_update
+
+    def find_one_and_update_after(self, filter, update, projection=None, sort=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE, **kwargs):
+        if return_document != ReturnDocument.AFTER or upsert:
+            return find_one_and_update(self, filter, update, projection, sort, upsert, return_document, **kwargs)
+        before = find_one_and_update(self, filter, update, {"_id": 1}, sort, False, ReturnDocument.BEFORE, **kwargs)
+        return None if before is None else self.find_one({"_id": before["_id"]}, projection)
+
+    patch(mongomock.collection.Collection, "find_one_and_update", find_one_and_update_after)
+
+    # mongomock_motor's to_list ignores its length, so capped reads returned everything
+    def capped(to_list):
+        async def to_list_capped(self, length=None):
+            docs = await to_list(self)
+            return docs[:length] if length else docs
+        return to_list_capped
+
+    cursors = (
+        mongomock_motor.AsyncCursor, mongomock_motor.AsyncCommandCursor, mongomock_motor.AsyncLatentCommandCursor,
+    )
+    for cursor in cursors:
+        patch(cursor, "to_list", capped(cursor.to_list))
+    patch(motor.motor_asyncio, "AsyncIOMotorClient", mongomock_motor.AsyncMongoMockClient)
+    # Modules that already imported the client by name
+    storage_mongo = sys.modules.get("storage_mongo")
+    if storage_mongo is not None:
+        patch(storage_mongo, "AsyncIOMotorClient", mongomock_motor.AsyncMongoMockClient)
+    return restore
+
+
+def load_app(args):
+    install_llm_stub(args.llm_latency, args.llm_jitter)
+    if args.storage == "sqlite":
+        os.environ["STORAGE_BACKEND"] = "sqlite"
+        os.environ["SQLITE_PATH"] = str(Path(tempfile.mkdtemp(prefix="carelens-loadtest-")) / "carelens.db")
+    else:
+        install_mongo_stand_in()
+        os.environ["STORAGE_BACKEND"] = "mongo"
+        os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+        os.environ.setdefault("DB_NAME", "carelens_loadtest")
+    if not args.keep_limits:
+        # Measure the request path, not the per-user LLM limits or a fleet running dry
+        os.environ.setdefault("LLM_RATE_PER_MINUTE", "1000000")
+        os.environ.setdefault("LLM_BURST", "1000000")
+        os.environ.setdefault("LLM_USER_CONCURRENCY", "1000000")
+        os.environ.setdefault("LLM_MAX_CONCURRENT", str(max(args.concurrency, 8)))
+        os.environ.setdefault("AMBULANCE_UNITS_PER_HOSPITAL", "100000")
+    sys.path.insert(0, str(ROOT / "backend"))
+    import server
+    return server
+
+
+# ---------- scenarios ----------
+
+class Session:
+    def __init__(self, user, token):
+        self.user = user
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+
+async def scenario_register(client, session):
+    return await client.post("auth/register", json=new_user("patient"))
+
+
+async def scenario_login(client, session):
+    return await client.post("auth/login", json={"email": session.user["email"], "password": TEST_PASSWORD})
+
+
+async def scenario_me(client, session):
+    return await client.get("auth/me", headers=session.headers)
+
+
+async def scenario_nearby(client, session):
+    return await client.get(NEARBY_HOSPITALS)
+
+
+async def scenario_by_city(client, session):
+    return await client.get(HOSPITALS_BY_CITY)
+
+
+async def scenario_bp(client, session):
+    return await client.post("bp/record", json=BP_READING, headers=session.headers)
+
+
+async def scenario_bp_records(client, session):
+    return await client.get("bp/records", headers=session.headers)
+
+
+async def scenario_chat(client, session):
+    # no_cache so every call reaches the (stubbed) model
+    return await client.post("chat/message", json={**CHAT_MESSAGE, "no_cache": True}, headers=session.headers)
+
+
+async def scenario_ambulance(client, session):
+    return await client.post("ambulance/request", json=AMBULANCE_REQUEST, headers=session.headers)
+
+
+async def scenario_dashboard(client, session):
+    return await client.get("dashboard/stats", headers=session.headers)
+
+
+SCENARIOS = {
+    name[len("scenario_"):]: fn for name, fn in list(globals().items()) if name.startswith("scenario_")
+}
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}'; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ---------- runner ----------
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lo, hi = math.floor(k), math.ceil(k)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+async def create_sessions(client, count):
+    sessions = []
+    for _ in range(count):
+        user = new_user("patient")
+        r = await client.post("auth/register", json=user)
+        r.raise_for_status()
+        sessions.append(Session(user, r.json()["token"]))
+    return sessions
+
+
+async def run_load(client, args):
+    r = await client.post("seed")
+    r.raise_for_status()
+    sessions = await create_sessions(client, args.users)
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+    latencies = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    deadline = time.perf_counter() + args.duration
+    remaining = [args.requests] if args.requests else None
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            if remaining is not None:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            name = random.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await SCENARIOS[name](client, random.choice(sessions))
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies[name].append(time.perf_counter() - started)
+            statuses[name][status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    report = {"concurrency": args.concurrency, "elapsed_s": round(elapsed, 2), "endpoints": {}}
+    for name in names:
+        values = sorted(latencies[name])
+        if not values:
+            continue
+        errors = sum(n for status, n in statuses[name].items() if not (isinstance(status, int) and status < 400))
+        report["endpoints"][name] = {
+            "requests": len(values),
+            "throughput_rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+            "errors": errors,
+            "statuses": {str(k): v for k, v in statuses[name].items()},
+        }
+    total = sum(e["requests"] for e in report["endpoints"].values())
+    report["total"] = {"requests": total, "throughput_rps": round(total / elapsed, 1)}
+    return report
+
+
+def print_report(report):
+    print(f"\n{report['total']['requests']} requests in {report['elapsed_s']}s "
+          f"at concurrency {report['concurrency']}: {report['total']['throughput_rps']} req/s")
+    print(f"{'scenario':<12}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for name, e in report["endpoints"].items():
+        print(f"{name:<12}{e['requests']:>9}{e['throughput_rps']:>9}"
+              f"{e['p50_ms']:>9}{e['p95_ms']:>9}{e['p99_ms']:>9}{e['errors']:>8}")
+
+
+def compare(report, baseline, max_regression):
+    """Scenarios whose p95 grew more than ``max_regression`` (a fraction) over the baseline."""
+    regressions = []
+    for name, e in report["endpoints"].items():
+        base = baseline["endpoints"].get(name)
+        if base and base["p95_ms"] > 0 and e["p95_ms"] > base["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {base['p95_ms']} -> {e['p95_ms']} ms")
+        if e["errors"] and not (base and base["errors"]):
+            regressions.append(f"{name}: {e['errors']} errors ({e['statuses']})")
+    return regressions
+
+
+async def main_async(args):
+    if args.url:
+        async with httpx.AsyncClient(base_url=f"{args.url.rstrip('/')}/api/", timeout=60) as client:
+            return await run_load(client, args)
+
+    server = load_app(args)
+    await server.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest/api/", timeout=60) as client:
+            return await run_load(client, args)
+    finally:
+        await server.app.router.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="load a running deployment instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests")
+    parser.add_argument("--users", type=int, default=10, help="registered users the scenarios act as")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario weights (default {DEFAULT_MIX})")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="stub LLM latency in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--storage", choices=("mongo", "sqlite"), default="mongo",
+                        help="in-process storage: mongomock or a temporary SQLite file")
+    parser.add_argument("--keep-limits", action="store_true", help="keep the app's LLM and fleet limits")
+    parser.add_argument("--save", help="write the report as JSON")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed p95 growth vs baseline")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    print_report(report)
+    if args.save:
+        Path(args.save).write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.max_regression)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
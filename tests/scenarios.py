@@ -0,0 +1,35 @@
+"""Request payloads for the API scenarios, shared by backend_test.py and loadtest.py."""
+import uuid
+
+TEST_PASSWORD = "testpass123"
+NEARBY_HOSPITALS = "hospitals/nearby?lat=9.17&lng=77.87&radius=50"
+HOSPITALS_BY_CITY = "hospitals/by-city?city=Kovilpatti"
+BP_READING = {
+    "systolic": 120,
+    "diastolic": 80,
+    "pulse": 72,
+    "notes": "Morning reading"
+}
+CHAT_MESSAGE = {
+    "message": "I have a headache. What should I do?",
+    "language": "English"
+}
+AMBULANCE_REQUEST = {
+    "lat": 9.1742,
+    "lng": 77.8697,
+    "patient_name": "Test Patient",
+    "phone": "+91 98765 43210",
+    "emergency_type": "general",
+    "notes": "Test emergency request"
+}
+
+
+def new_user(role="patient"):
+    prefix = "Dr. Test Doctor" if role == "doctor" else "Test Patient"
+    return {
+        "name": f"{prefix} {uuid.uuid4().hex[:8]}",
+        "email": f"{role}_{uuid.uuid4().hex[:8]}@test.com",
+        "password": TEST_PASSWORD,
+        "phone": "+91 98765 43210" if role == "patient" else "+91 98765 43211",
+        "role": role
+    }
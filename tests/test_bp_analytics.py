@@ -0,0 +1,60 @@
+from datetime import date
+
+from bp_analytics import merge_increments, rollup_increments, summarize
+
+
+def reading(recorded_at, systolic, diastolic, pulse=None, status="normal", user_id="u1"):
+    return {"user_id": user_id, "recorded_at": recorded_at, "systolic": systolic, "diastolic": diastolic,
+            "pulse": pulse, "status": status}
+
+
+def test_rollup_day_and_part_use_local_time():
+    # 20:00 UTC is 01:30 next day in IST: neither morning nor evening
+    day, inc = rollup_increments(reading("2026-03-01T20:00:00+00:00", 120, 80))
+    assert day == "2026-03-02"
+    assert not any("." in field for field in inc)
+
+    day, inc = rollup_increments(reading("2026-03-01T02:00:00+00:00", 130, 85, pulse=70))
+    assert day == "2026-03-01"
+    assert inc["morning.count"] == 1 and inc["pulse_count"] == 1
+
+
+def test_merge_increments_sums_per_user_and_day():
+    merged = merge_increments([
+        reading("2026-03-01T03:00:00+00:00", 120, 80, status="normal"),
+        reading("2026-03-01T04:00:00+00:00", 150, 95, status="high"),
+        reading("2026-03-01T04:00:00+00:00", 110, 70, user_id="u2"),
+    ])
+    day = merged[("u1", "2026-03-01")]
+    assert (day["count"], day["systolic_sum"], day["diastolic_sum"], day["high_count"]) == (2, 270, 175, 1)
+    assert merged[("u2", "2026-03-01")]["count"] == 1
+
+
+def rollups_from(docs):
+    return [{"user_id": u, "day": d, **{k: v for k, v in inc.items() if "." not in k},
+             **{part: {k.split(".")[1]: v for k, v in inc.items() if k.startswith(part + ".")}
+                for part in ("morning", "evening")}}
+            for (u, d), inc in merge_increments(docs).items()]
+
+
+def test_summarize_windows_and_flags():
+    today = date(2026, 3, 31)
+    docs = [reading(f"2026-03-{d:02d}T03:00:00+00:00", 120, 78) for d in range(2, 24)]
+    docs += [reading(f"2026-03-{d:02d}T03:00:00+00:00", 160, 96, status="high") for d in range(25, 32)]
+    docs += [reading(f"2026-03-{d:02d}T13:00:00+00:00", 135, 85) for d in range(25, 32)]
+    summary = summarize(rollups_from(docs), today)
+
+    assert summary["7d"]["count"] == 14
+    assert summary["30d"]["count"] == 36
+    assert summary["7d"]["hypertensive_episodes"] == 7
+    assert summary["7d"]["morning"]["systolic"] == 160.0
+    assert summary["7d"]["evening"]["systolic"] == 135.0
+    assert summary["7d"]["pulse"] is None
+    assert set(summary["flags"]) == {"uncontrolled", "rising", "morning_surge"}
+
+
+def test_summarize_without_readings():
+    summary = summarize([], date(2026, 3, 31))
+    for window in ("7d", "30d", "90d"):
+        assert (summary[window]["count"], summary[window]["systolic"]) == (0, None)
+    assert summary["flags"] == []
@@ -0,0 +1,57 @@
+import time
+
+from caching import TTLCache, VersionedResponseCache, etag_matches
+
+ETAG = '"abc123"'
+
+
+def test_etag_matches_weak_wildcard_and_lists():
+    assert etag_matches(ETAG, ETAG)
+    assert etag_matches('W/"abc123"', ETAG)
+    assert etag_matches('"old", W/"abc123" ,"other"', ETAG)
+    assert etag_matches("*", ETAG)
+    assert not etag_matches('"old", "other"', ETAG)
+    assert not etag_matches('abc123', ETAG)
+    assert not etag_matches("", ETAG) and not etag_matches(None, ETAG)
+
+
+def test_versioned_cache_drops_entries_on_bump():
+    cache = VersionedResponseCache(ttl=60)
+    assert cache.get("hospitals") is None
+    entry = cache.put("hospitals", b"[1]")
+    assert cache.get("hospitals") is entry
+    assert entry["etag"] == VersionedResponseCache().put("x", b"[1]")["etag"]
+
+    cache.bump("hospitals")
+    assert cache.get("hospitals") is None
+    # Other listings are unaffected
+    cache.put("doctors", b"[]")
+    cache.bump("hospitals")
+    assert cache.get("doctors") is not None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 2)
+
+
+def test_body_loaded_before_a_bump_is_not_served_after_it():
+    cache = VersionedResponseCache(ttl=60)
+    version = cache.version("hospitals")
+    cache.bump("hospitals")  # a write lands while the old body is being loaded
+    cache.put("hospitals", b"[stale]", version)
+    assert cache.get("hospitals") is None
+
+
+def test_versioned_cache_entries_expire():
+    cache = VersionedResponseCache(ttl=0.01)
+    cache.put("hospitals", b"[]")
+    time.sleep(0.02)
+    assert cache.get("hospitals") is None
+
+
+def test_ttl_cache_evicts_least_recently_used_and_expires():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert "b" not in cache and cache.get("a") == 1 and cache.evictions == 1
+    cache.set("short", 4, ttl=0)
+    assert cache.get("short") is None
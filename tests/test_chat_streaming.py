@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+from chat_streaming import StreamBuffer, iter_llm_reply, relay_sse, sse_event
+
+
+def parse(frames):
+    events = []
+    for frame in frames:
+        if frame.startswith(":"):
+            events.append(("ping", None))
+            continue
+        event, data = frame.strip().split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+async def connected():
+    return False
+
+
+def test_sse_event_framing():
+    assert sse_event("delta", {"delta": "வணக்கம்"}) == 'event: delta\ndata: {"delta": "வணக்கம்"}\n\n'
+
+
+def test_deltas_produced_between_reads_are_coalesced():
+    async def main():
+        buffer = StreamBuffer()
+        frames = relay_sse(buffer, connected, "s1")
+        session = await frames.__anext__()
+        for delta in ("Drink ", "", "water ", "and rest."):
+            buffer.push(delta)
+        buffer.finish()
+        return [session] + [frame async for frame in frames]
+
+    assert parse(asyncio.run(main())) == [
+        ("session", {"session_id": "s1"}),
+        ("delta", {"delta": "Drink water and rest."}),
+        ("done", {"session_id": "s1", "response": "Drink water and rest."}),
+    ]
+
+
+def test_done_after_an_empty_final_read_and_heartbeats_while_idle():
+    async def main():
+        buffer = StreamBuffer()
+        frames = relay_sse(buffer, connected, "s1", heartbeat=0.01)
+        collected = [await frames.__anext__()]
+        buffer.push("Hi")
+        collected.append(await frames.__anext__())
+        # Nothing new within the heartbeat interval
+        collected.append(await frames.__anext__())
+        buffer.finish()
+        collected += [frame async for frame in frames]
+        return collected
+
+    assert parse(asyncio.run(main())) == [
+        ("session", {"session_id": "s1"}),
+        ("delta", {"delta": "Hi"}),
+        ("ping", None),
+        ("done", {"session_id": "s1", "response": "Hi"}),
+    ]
+
+
+def test_errors_end_the_stream_after_the_partial_reply():
+    async def main():
+        buffer = StreamBuffer()
+        buffer.push("Part")
+        buffer.finish("LLM unavailable")
+        return [frame async for frame in relay_sse(buffer, connected, "s1")]
+
+    assert parse(asyncio.run(main()))[1:] == [("delta", {"delta": "Part"}), ("error", {"detail": "LLM unavailable"})]
+
+
+def test_generation_continues_after_the_client_disconnects():
+    async def main():
+        buffer = StreamBuffer()
+        disconnected = asyncio.Event()
+
+        async def is_disconnected():
+            return disconnected.is_set()
+
+        async def produce():
+            for delta in ("one ", "two ", "three"):
+                buffer.push(delta)
+                await asyncio.sleep(0.01)
+            buffer.finish()
+
+        producer = asyncio.create_task(produce())
+        frames = relay_sse(buffer, is_disconnected, "s1")
+        received = [await frames.__anext__(), await frames.__anext__()]
+        disconnected.set()
+        received += [frame async for frame in frames]
+        await producer
+        return received, buffer
+
+    received, buffer = asyncio.run(main())
+    assert parse(received) == [("session", {"session_id": "s1"}), ("delta", {"delta": "one "})]
+    # The reply is complete for saving even though the client left
+    assert buffer.done and buffer.error is None and buffer.text() == "one two three"
+
+
+def test_iter_llm_reply_streams_when_supported_and_falls_back_to_one_chunk():
+    class Whole:
+        async def send_message(self, message):
+            return f"reply to {message}"
+
+    class Streaming(Whole):
+        async def stream_message(self, message):
+            for delta in ("a", "b"):
+                yield delta
+
+    async def collect(chat):
+        return [delta async for delta in iter_llm_reply(chat, "q")]
+
+    assert asyncio.run(collect(Whole())) == ["reply to q"]
+    assert asyncio.run(collect(Streaming())) == ["a", "b"]
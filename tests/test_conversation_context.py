@@ -0,0 +1,50 @@
+from conversation_context import ConversationContext, condense, estimate_tokens
+
+
+def turn(i, words=40):
+    role = "user" if i % 2 == 0 else "assistant"
+    return {"role": role, "content": f"Turn {i}. " + "word " * words}
+
+
+def test_estimate_tokens_counts_utf8_bytes():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("abcd" * 10) == 10
+    # Tamil characters are 3 bytes each in UTF-8
+    assert estimate_tokens("தலைவலி") > estimate_tokens("headache") // 2
+
+
+def test_condense_keeps_first_sentence_and_speaker():
+    assert condense("user", "I have a headache. It started yesterday.") == "Patient: I have a headache."
+    line = condense("assistant", "x" * 500)
+    assert line.startswith("CareLens: ") and line.endswith("…")
+    assert len(line) <= len("CareLens: ") + 160
+
+
+def test_short_history_is_kept_verbatim():
+    history = [turn(i, words=5) for i in range(4)]
+    ctx = ConversationContext.from_history(history, token_budget=2000)
+    assert ctx.turns == history
+    assert ctx.summary == ""
+
+
+def test_old_turns_fold_into_summary_within_budget():
+    history = [turn(i) for i in range(20)]
+    ctx = ConversationContext.from_history(history, token_budget=200, summary_budget=1000, min_recent=2)
+    assert ctx.turns == history[-len(ctx.turns):]
+    assert sum(estimate_tokens(t["content"]) for t in ctx.turns) <= 200
+    assert len(ctx.summary_lines) + len(ctx.turns) == 20
+    assert ctx.summary_lines[0] == "Patient: Turn 0."
+
+
+def test_min_recent_turns_survive_even_over_budget():
+    ctx = ConversationContext.from_history([turn(i, words=400) for i in range(6)], token_budget=10, min_recent=4)
+    assert [t["content"].split(".")[0] for t in ctx.turns] == ["Turn 2", "Turn 3", "Turn 4", "Turn 5"]
+
+
+def test_summary_is_trimmed_from_the_oldest_end():
+    ctx = ConversationContext(token_budget=50, summary_budget=20, min_recent=1)
+    for i in range(30):
+        ctx.append(turn(i)["role"], turn(i)["content"])
+    assert sum(estimate_tokens(line) for line in ctx.summary_lines) <= 20
+    assert ctx.summary_lines[-1].endswith(f"Turn {29 - len(ctx.turns)}.")
+    assert ctx.prompt_tokens() == sum(estimate_tokens(t["content"]) for t in ctx.turns) + estimate_tokens(ctx.summary)
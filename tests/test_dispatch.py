@@ -0,0 +1,124 @@
+from dispatch import DispatchEngine, DispatchRequest, SpeedModel, severity_of
+
+NOW = 1_700_000_000.0
+FLEET = [
+    {"id": "kovilpatti", "lat": 9.1742, "lng": 77.8697, "ambulance": True},
+    {"id": "madurai", "lat": 9.9252, "lng": 78.1198, "ambulance": True},
+    {"id": "no-ambulance", "lat": 9.18, "lng": 77.87, "ambulance": False},
+]
+
+
+def engine(**options):
+    options.setdefault("units_per_hospital", 1)
+    e = DispatchEngine(SpeedModel(speed_kmh=40, road_factor=1.3, turnout_minutes=2), **options)
+    e.load_fleet(FLEET)
+    return e
+
+
+def request(request_id, emergency_type="general", lat=9.17, lng=77.87, waited=0.0):
+    return DispatchRequest(request_id, lat, lng, severity_of(emergency_type), NOW - waited)
+
+
+def test_speed_model_eta_and_reach_agree():
+    model = SpeedModel(speed_kmh=40, road_factor=1.3, turnout_minutes=2)
+    assert model.eta_minutes(0) == 2
+    assert model.eta_minutes(model.reach_km(30)) == 30
+    assert model.reach_km(1) == 0
+
+
+def test_nearest_free_unit_is_assigned_and_fleet_skips_hospitals_without_ambulances():
+    e = engine()
+    e.submit(request("r1"))
+    [a] = e.match(NOW)
+    assert a.hospital["id"] == "kovilpatti"
+    assert a.eta_minutes == SpeedModel().eta_minutes(a.distance_km)
+    assert a.busy_until == NOW + (2 * a.eta_minutes + e.on_scene_minutes) * 60
+    assert len(e.hospitals) == 2
+
+
+def test_severity_orders_the_queue_and_busy_units_go_to_the_next_nearest():
+    e = engine()
+    e.submit(request("general"))
+    e.submit(request("cardiac", "cardiac"))
+    assignments = {a.request_id: a.hospital["id"] for a in e.match(NOW)}
+    assert assignments == {"cardiac": "kovilpatti", "general": "madurai"}
+
+
+def test_requests_wait_when_every_unit_is_busy():
+    e = engine()
+    for i in range(3):
+        e.submit(request(f"r{i}", waited=10 - i))
+    assert [a.request_id for a in e.match(NOW)] == ["r0", "r1"]
+    assert e.match(NOW) == []
+    assert e.stats()["queued"] == 1
+
+    assert e.release("r0")
+    [a] = e.match(NOW)
+    assert (a.request_id, a.hospital["id"]) == ("r2", "kovilpatti")
+
+
+def test_units_beyond_the_max_distance_are_not_sent():
+    e = engine(max_distance_km=50)
+    e.submit(request("local"))
+    e.submit(request("also-local"))
+    e.submit(request("far", lat=13.08, lng=80.27, waited=100))
+    assignments = e.match(NOW)
+    # Madurai is ~87 km away: the second local request waits instead of getting it
+    assert [(a.request_id, a.hospital["id"]) for a in assignments] == [("local", "kovilpatti")]
+    assert e.stats()["queued"] == 2
+
+    e.release("local")
+    [a] = e.match(NOW)
+    assert a.request_id == "also-local"
+
+
+def test_max_eta_caps_reach():
+    e = engine(max_eta_minutes=60)
+    assert e.max_distance_km == SpeedModel().reach_km(60)
+    e.submit(request("r1", lat=9.93, lng=78.12))
+    e.submit(request("r2", lat=9.93, lng=78.12))
+    assert [a.hospital["id"] for a in e.match(NOW)] == ["madurai"]
+
+
+def test_expire_releases_finished_missions_and_times_out_waiting_requests():
+    e = engine(max_queue_minutes=10)
+    e.submit(request("r1"))
+    e.submit(request("r2"))
+    e.submit(request("r3"))
+    missions = {a.request_id: a for a in e.match(NOW)}
+    assert e.expire(NOW) == ([], [])
+
+    later = missions["r1"].busy_until
+    finished, timed_out = e.expire(later)
+    assert (finished, timed_out) == (["r1"], ["r3"])
+    assert e.match(later) == []
+    stats = e.stats()
+    assert (stats["queued"], stats["active_missions"], stats["free_units"]) == (0, 1, 1)
+
+
+def test_cancel_and_restored_missions():
+    e = engine()
+    e.submit(request("r1"))
+    assert e.cancel("r1")
+    assert not e.cancel("r1")
+    e.occupy("kovilpatti", "restored", NOW + 600)
+    e.submit(request("r2"))
+    [a] = e.match(NOW)
+    assert (a.request_id, a.hospital["id"]) == ("r2", "madurai")
+
+
+def test_unreachable_requests_do_not_starve_a_matchable_one_behind_them():
+    e = engine(max_distance_km=50, batch_size=16)
+    e.occupy("madurai", "busy", NOW + 3600)
+    for i in range(40):
+        e.submit(request(f"far{i}", "cardiac", lat=13.08, lng=80.27, waited=100))
+    e.submit(request("near"))
+    [a] = e.match(NOW)
+    assert (a.request_id, a.hospital["id"]) == ("near", "kovilpatti")
+    stats = e.stats()
+    assert (stats["queued"], stats["free_units"]) == (40, 0)
+
+    # The unreachable requests stay queued for a nearer unit
+    e.release("near")
+    assert e.match(NOW) == []
+    assert e.stats()["queued"] == 40
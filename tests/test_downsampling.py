@@ -0,0 +1,39 @@
+import numpy as np
+
+from downsampling import lttb_indices, minmax_indices
+
+
+def test_lttb_returns_everything_when_under_threshold():
+    assert list(lttb_indices([0, 1, 2], [5, 6, 7], 10)) == [0, 1, 2]
+    assert list(lttb_indices(list(range(5)), [1] * 5, 2)) == [0, 1, 2, 3, 4]
+
+
+def test_lttb_keeps_endpoints_and_threshold_points_in_order():
+    x = np.arange(1000)
+    y = np.sin(x / 50) * 20 + 120
+    keep = lttb_indices(x, y, 100)
+    assert len(keep) == 100
+    assert keep[0] == 0 and keep[-1] == 999
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_lttb_keeps_an_isolated_spike():
+    y = np.full(500, 120.0)
+    y[237] = 190
+    assert 237 in lttb_indices(np.arange(500), y, 50)
+
+
+def test_minmax_keeps_every_extreme_of_every_series():
+    rng = np.random.default_rng(7)
+    systolic = rng.integers(100, 140, 1000)
+    diastolic = rng.integers(60, 90, 1000)
+    systolic[10], diastolic[900] = 200, 40
+    keep = minmax_indices([systolic, diastolic], 100)
+    assert len(keep) <= 100
+    assert 10 in keep and 900 in keep
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_minmax_returns_everything_when_under_threshold():
+    assert list(minmax_indices([[3, 1, 2]], 10)) == [0, 1, 2]
+    assert list(minmax_indices([], 10)) == []
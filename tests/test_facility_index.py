@@ -0,0 +1,82 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from facility_index import FacilitySnapshot, FacilitySnapshotCache, haversine_matrix
+from storage import haversine_km
+
+HOSPITALS = [
+    {"id": "kovilpatti", "lat": 9.1742, "lng": 77.8697, "emergency": True, "ambulance": True, "specialties": ["Cardiology"]},
+    {"id": "tuticorin", "lat": 8.7642, "lng": 78.1348, "emergency": True, "ambulance": False, "specialties": ["Orthopedics"]},
+    {"id": "madurai", "lat": 9.9252, "lng": 78.1198, "emergency": False, "ambulance": True, "specialties": ["cardiology"]},
+    {"id": "chennai", "lat": 13.0827, "lng": 80.2707, "emergency": True, "ambulance": True},
+    {"id": "no-coordinates", "lat": None, "lng": None},
+]
+
+
+def test_haversine_matrix_matches_scalar_formula():
+    lat = np.radians([h["lat"] for h in HOSPITALS[:4]])
+    lng = np.radians([h["lng"] for h in HOSPITALS[:4]])
+    dist = haversine_matrix(np.radians([9.17, 13.0]), np.radians([77.87, 80.2]), lat, lng)
+    assert dist.shape == (2, 4)
+    for i, (olat, olng) in enumerate([(9.17, 77.87), (13.0, 80.2)]):
+        for j, h in enumerate(HOSPITALS[:4]):
+            assert dist[i, j] == pytest.approx(haversine_km(olat, olng, h["lat"], h["lng"]), rel=1e-9)
+
+
+def test_snapshot_skips_documents_without_coordinates():
+    assert len(FacilitySnapshot(HOSPITALS)) == 4
+
+
+def test_nearest_is_sorted_per_origin_and_limited_to_k():
+    snapshot = FacilitySnapshot(HOSPITALS)
+    results = snapshot.nearest([(9.17, 77.87), (13.0, 80.2)], k=2)
+    assert [snapshot.docs[i]["id"] for i, _ in results[0]] == ["kovilpatti", "tuticorin"]
+    assert [snapshot.docs[i]["id"] for i, _ in results[1]][0] == "chennai"
+    for row in results:
+        assert len(row) == 2
+        assert row[0][1] <= row[1][1]
+
+
+def test_nearest_applies_radius_and_filters():
+    snapshot = FacilitySnapshot(HOSPITALS)
+    [within] = snapshot.nearest([(9.17, 77.87)], k=5, radius_km=60)
+    assert {snapshot.docs[i]["id"] for i, _ in within} == {"kovilpatti", "tuticorin"}
+
+    mask = snapshot.filter_mask(ambulance=True, specialty="CARDIOLOGY")
+    [matched] = snapshot.nearest([(9.17, 77.87)], k=5, mask=mask)
+    assert [snapshot.docs[i]["id"] for i, _ in matched] == ["kovilpatti", "madurai"]
+
+
+def test_nearest_with_no_candidates_returns_empty_rows():
+    snapshot = FacilitySnapshot(HOSPITALS)
+    mask = snapshot.filter_mask(specialty="neurology")
+    assert snapshot.nearest([(9.17, 77.87), (13.0, 80.2)], k=3, mask=mask) == [[], []]
+    assert snapshot.nearest([], k=3) == []
+
+
+def test_count_within():
+    snapshot = FacilitySnapshot(HOSPITALS)
+    assert snapshot.count_within(9.17, 77.87, 60) == 2
+    assert snapshot.count_within(9.17, 77.87, 60, snapshot.filter_mask(ambulance=True)) == 1
+
+
+def test_snapshot_cache_reloads_after_invalidate():
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        return HOSPITALS[:len(loads)]
+
+    async def scenario():
+        cache = FacilitySnapshotCache(loader, ttl=300)
+        first = await cache.get()
+        assert await cache.get() is first
+        cache.invalidate()
+        second = await cache.get()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert len(loads) == 2
+    assert (len(first), len(second)) == (1, 2)
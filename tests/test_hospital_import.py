@@ -0,0 +1,166 @@
+import asyncio
+import json
+
+import pytest
+
+from hospital_import import (
+    INDIA_BOUNDS, InvalidRecord, facility_id, import_hospitals, iter_records, normalize_facility, parse_bounds,
+)
+
+
+def chunked(data, size):
+    async def chunks():
+        for i in range(0, len(data), size):
+            yield data[i:i + size]
+    return chunks()
+
+
+def records(data, fmt, size=7, max_bytes=16384):
+    async def collect():
+        return [r async for r in iter_records(chunked(data, size), fmt, max_bytes)]
+    return asyncio.run(collect())
+
+
+CSV = (
+    "﻿Hospital Name,Latitude,Longitude,City,State,Specialities\r\n"
+    'Government Hospital,9.1742,77.8697,KOVILPATTI,Tamil Nadu,"Cardiology; Orthopedics"\r\n'
+    '"CSI Hospital, ""Main""",8.7642,78.1348,Tuticorin,Tamil Nadu,"General\nSurgery"\r\n'
+    "\r\n"
+    "Short Row,1\r\n"
+    "Last,13.08,80.27,Chennai,Tamil Nadu,"
+).encode("utf-8")
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_csv_records_survive_any_chunking(size):
+    result = records(CSV, "csv", size)
+    assert [line for line, _ in result] == [2, 3, 6, 7]
+    first, quoted, short, last = [r for _, r in result]
+    assert first["Hospital Name"] == "Government Hospital" and first["Latitude"] == "9.1742"
+    assert quoted["Hospital Name"] == 'CSI Hospital, "Main"' and quoted["Specialities"] == "General\nSurgery"
+    assert short == "expected 6 columns, got 2"
+    assert last["City"] == "Chennai" and last["Specialities"] == ""
+
+
+def test_csv_unbalanced_quote_and_long_records():
+    assert records(b'name,lat\n"open,1\n', "csv") == [(2, "unterminated quoted field")]
+    data = b"name,lat\n" + b"x" * 100 + b",1\nok,2\n"
+    assert records(data, "csv", max_bytes=50) == [(2, "line too long"), (3, {"name": "ok", "lat": "2"})]
+
+
+def test_ndjson_records_and_errors():
+    rows = [json.dumps({"name": "A", "lat": 9.1, "lng": 77.8}), "", "not json", "[1, 2]",
+            json.dumps({"name": "Tamil – தமிழ்", "lat": 9.2, "lng": 77.9})]
+    result = records("\n".join(rows).encode("utf-8"), "ndjson", size=3)
+    assert [line for line, _ in result] == [1, 3, 4, 5]
+    assert result[0][1] == {"name": "A", "lat": 9.1, "lng": 77.8}
+    assert result[1][1].startswith("invalid JSON")
+    assert result[2][1] == "expected a JSON object"
+    assert result[3][1]["name"] == "Tamil – தமிழ்"
+
+
+@pytest.mark.parametrize("size", [1, 5, 4096])
+@pytest.mark.parametrize("trailing_newline", [True, False])
+def test_ndjson_framing_survives_any_chunking(size, trailing_newline):
+    lines = ['{"n": 1}', "   ", '{"n": 2, "pad": "' + "x" * 40 + '"}', '{"n": 3', "", '{"n": 4}']
+    data = "\n".join(lines) + ("\n" if trailing_newline else "")
+    result = records(data.encode("utf-8"), "ndjson", size, max_bytes=30)
+    # Blank lines are skipped but still counted
+    assert [line for line, _ in result] == [1, 3, 4, 6]
+    assert result[0][1] == {"n": 1} and result[3][1] == {"n": 4}
+    assert result[1][1] == "line too long"
+    assert result[2][1].startswith("invalid JSON")
+
+
+def test_ndjson_over_long_last_line_is_reported():
+    assert records(b'{"n": 1}\n' + b"x" * 100, "ndjson", size=8, max_bytes=30) == [(1, {"n": 1}), (2, "line too long")]
+
+
+def test_normalize_facility_maps_columns_and_values():
+    doc = normalize_facility({
+        "Hospital Name": "  Government   Hospital ", "LATITUDE": "9,1742", "Longitude": "77.8697",
+        "City": "tuticorin", "District": "DELHI", "State": "Delhi", "NIN ID": "1234",
+        "Emergency Services": "Yes", "Ambulance": "no", "Specialities": "Cardiology; ;Orthopedics", "Total Beds": "120.0",
+    }, "nhrr")
+    assert doc == {
+        "id": facility_id("nhrr", "1234", "", "", ""), "name": "Government Hospital", "city": "Thoothukudi",
+        "state": "Delhi", "district": "Delhi", "lat": 9.1742, "lng": 77.8697, "source": "nhrr", "registry_id": "1234",
+        "emergency": True, "ambulance": False, "specialties": ["Cardiology", "Orthopedics"], "beds": 120,
+    }
+
+
+def test_facility_ids_are_stable():
+    assert facility_id("nhrr", "1", "A", "B", "C") == facility_id("nhrr", "1", "X", "Y", "Z")
+    assert facility_id("nhrr", "", "Apollo", "Chennai", "TN") == facility_id("nhrr", "", "APOLLO ", "chennai", "tn")
+    assert facility_id("nhrr", "1", "", "", "") != facility_id("other", "1", "", "", "")
+
+
+def test_swapped_coordinates_inside_the_region_are_fixed():
+    doc = normalize_facility({"name": "A", "lat": "77.87", "lng": "9.17"}, "s")
+    assert (doc["lat"], doc["lng"]) == (9.17, 77.87)
+    doc = normalize_facility({"name": "A", "lat": 77.2, "lng": 28.6}, "s")
+    assert (doc["lat"], doc["lng"]) == (28.6, 77.2)
+
+
+@pytest.mark.parametrize("record, error", [
+    ({"lat": 9.1, "lng": 77.8}, "missing name"),
+    ({"name": "A", "lat": "", "lng": 77.8}, "missing coordinate"),
+    ({"name": "A", "lat": "abc", "lng": 77.8}, "bad coordinate"),
+    ({"name": "A", "lat": 0, "lng": 0}, "missing coordinates"),
+    ({"name": "A", "lat": 51.5, "lng": -0.12}, "outside the expected region"),
+    ({"name": "A", "lat": 9.1, "lng": 77.8, "emergency": "maybe"}, "bad flag"),
+    ({"name": "A", "lat": 9.1, "lng": 77.8, "beds": "many"}, "bad beds"),
+])
+def test_invalid_records(record, error):
+    with pytest.raises(InvalidRecord, match=error):
+        normalize_facility(record, "s")
+
+
+def test_without_bounds_only_the_range_is_checked():
+    doc = normalize_facility({"name": "A", "lat": -0.12, "lng": 51.5}, "s", bounds=None)
+    assert (doc["lat"], doc["lng"]) == (-0.12, 51.5)
+    doc = normalize_facility({"name": "A", "lat": 151.2, "lng": -33.9}, "s", bounds=None)
+    assert (doc["lat"], doc["lng"]) == (-33.9, 151.2)
+    with pytest.raises(InvalidRecord):
+        normalize_facility({"name": "A", "lat": 181, "lng": 0}, "s", bounds=None)
+
+
+def test_parse_bounds():
+    assert parse_bounds("6,37.6,68,97.5") == INDIA_BOUNDS
+    assert parse_bounds(" ") is None
+    with pytest.raises(ValueError):
+        parse_bounds("10,5,68,97")
+
+
+class FakeHospitals:
+    def __init__(self):
+        self.docs = {}
+        self.batches = []
+
+    async def upsert_many(self, docs):
+        self.batches.append(len(docs))
+        inserted = sum(1 for d in docs if d["id"] not in self.docs)
+        self.docs.update({d["id"]: d for d in docs})
+        return inserted, len(docs) - inserted
+
+
+def test_import_batches_counts_and_truncates():
+    rows = [json.dumps({"id": i % 5, "name": f"H{i}", "lat": 9.1, "lng": 77.8}) for i in range(12)]
+    rows.insert(3, json.dumps({"name": "Nowhere", "lat": 51.5, "lng": -0.1}))
+    data = "\n".join(rows).encode()
+
+    async def run(max_rows=None):
+        hospitals = FakeHospitals()
+        progress = await import_hospitals(hospitals, chunked(data, 10), "ndjson", "test", batch_size=4, max_rows=max_rows)
+        return hospitals, progress.as_dict()
+
+    hospitals, result = asyncio.run(run())
+    assert (result["status"], result["rows"], result["accepted"], result["rejected"]) == ("completed", 13, 12, 1)
+    assert (result["inserted"], result["updated"], result["truncated"]) == (5, 7, False)
+    assert hospitals.batches == [4, 4, 4] and len(hospitals.docs) == 5
+    assert result["errors"][0]["line"] == 4
+
+    _, result = asyncio.run(run(max_rows=13))
+    assert result["truncated"] is False
+    _, result = asyncio.run(run(max_rows=6))
+    assert (result["rows"], result["accepted"], result["truncated"]) == (6, 5, True)
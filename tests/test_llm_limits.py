@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+import llm_limits
+from llm_limits import LimitPolicy, LlmLimiter, LlmOverloaded, RateLimited, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_limits.time, "monotonic", clock)
+    return clock
+
+
+def test_token_bucket_bursts_then_refills_at_its_rate(clock):
+    bucket = TokenBucket(rate_per_minute=6, burst=2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert bucket.take() == pytest.approx(10)
+    clock.now += 5
+    assert bucket.take() == pytest.approx(5)
+    clock.now += 5
+    assert bucket.take() == 0
+
+
+def test_token_bucket_never_exceeds_burst_and_refunds(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=2)
+    clock.now += 3600
+    waits = [bucket.take() for _ in range(3)]
+    assert waits[:2] == [0, 0] and waits[2] > 0
+    bucket.refund()
+    assert bucket.take() == 0
+
+
+def test_policy_lookup_prefers_tier_then_language():
+    limiter = LlmLimiter(default=LimitPolicy(rate_per_minute=6),
+                         overrides={"Doctor": {"rate_per_minute": 30}, "tamil": {"burst": 5}})
+    assert limiter.policy_for("doctor", "Tamil").rate_per_minute == 30
+    assert limiter.policy_for("patient", "TAMIL") == LimitPolicy(rate_per_minute=6, burst=5)
+    assert limiter.policy_for() is limiter.default
+
+
+def test_user_rate_and_concurrency_limits(clock):
+    async def scenario():
+        limiter = LlmLimiter(default=LimitPolicy(rate_per_minute=6, burst=3, user_concurrency=2))
+        first = await limiter.acquire("u1")
+        second = await limiter.acquire("u1")
+        with pytest.raises(RateLimited):
+            await limiter.acquire("u1")  # third concurrent call
+        first.release()
+        first.release()  # idempotent
+        async with await limiter.acquire("u1"):
+            pass
+        with pytest.raises(RateLimited) as exc:
+            await limiter.acquire("u1")  # bucket empty
+        assert exc.value.retry_after == 10
+        # Other users have their own bucket
+        async with await limiter.acquire("u2"):
+            pass
+        second.release()
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["in_flight"], stats["rate_limited"]) == (0, 2)
+
+
+def test_global_slots_queue_then_shed():
+    async def scenario():
+        policy = LimitPolicy(rate_per_minute=600, burst=10, user_concurrency=10, max_wait=0.05)
+        limiter = LlmLimiter(max_concurrent=1, max_queue=1, default=policy)
+        held = await limiter.acquire("a")
+        waiter = asyncio.create_task(limiter.acquire("b"))
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        with pytest.raises(LlmOverloaded):
+            await limiter.acquire("c")  # queue full
+        held.release()
+        (await waiter).release()
+
+        held = await limiter.acquire("a")
+        with pytest.raises(LlmOverloaded):
+            await limiter.acquire("b")  # waited past max_wait
+        held.release()
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["shed"], stats["in_flight"], stats["waiting"]) == (2, 0, 0)
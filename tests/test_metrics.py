@@ -0,0 +1,44 @@
+from fastapi import FastAPI, HTTPException
+from fastapi.routing import APIRouter
+from fastapi.testclient import TestClient
+
+import metrics
+from metrics import Registry
+
+
+def counts(path):
+    return {labels[2]: sum(series[0]) for labels, series in metrics.http_request_seconds._values.items()
+            if labels[1] == path}
+
+
+def test_timed_route_records_the_status_actually_returned():
+    router = APIRouter(route_class=metrics.TimedRoute)
+
+    @router.get("/metrics-test/items/{item_id}")
+    async def get_item(item_id: int, missing: bool = False):
+        if missing:
+            raise HTTPException(status_code=404, detail="Not found")
+        return {"id": item_id}
+
+    app = FastAPI()
+    app.include_router(router)
+    path = "/metrics-test/items/{item_id}"
+    with TestClient(app) as client:
+        assert client.get("/metrics-test/items/1").status_code == 200
+        assert client.get("/metrics-test/items/1?missing=true").status_code == 404
+        assert client.get("/metrics-test/items/abc").status_code == 422
+    assert counts(path) == {200: 1, 404: 1, 422: 1}
+    assert metrics.http_in_flight._values[("GET", path)] == 0
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    h = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1))
+    h.observe(0.05, "/a")
+    h.observe(0.5, "/a")
+    h.observe(5, "/a")
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+
+import bcrypt
+import pytest
+
+from password_hashing import HasherOverloaded, PasswordHasher
+
+
+def test_hash_and_verify_round_trip():
+    async def main():
+        hasher = PasswordHasher(workers=1)
+        try:
+            hashed = await hasher.hash("s3cret")
+            return hashed, await hasher.verify("s3cret", hashed), await hasher.verify("wrong", hashed), hasher.stats()
+        finally:
+            hasher.shutdown()
+
+    hashed, ok, wrong, stats = asyncio.run(main())
+    assert hashed.startswith("$2") and ok and not wrong
+    assert (stats["hash"]["count"], stats["verify"]["count"]) == (1, 2)
+
+
+def test_hashes_run_off_the_loop_and_excess_requests_are_shed(monkeypatch):
+    release = threading.Event()
+    threads = []
+
+    def slow_hashpw(password, salt):
+        threads.append(threading.current_thread().name)
+        release.wait(5)
+        return b"$2b$hash"
+
+    monkeypatch.setattr(bcrypt, "hashpw", slow_hashpw)
+
+    async def main():
+        hasher = PasswordHasher(workers=1, max_queue=1)
+        running = asyncio.create_task(hasher.hash("a"))
+        queued = asyncio.create_task(hasher.hash("b"))
+        # The loop keeps running while a hash blocks its worker thread
+        await asyncio.sleep(0.05)
+        busy = hasher.stats()
+        with pytest.raises(HasherOverloaded):
+            await hasher.hash("c")
+        release.set()
+        results = await asyncio.gather(running, queued)
+        hasher.shutdown()
+        return busy, results, hasher.stats()
+
+    busy, results, idle = asyncio.run(main())
+    assert (busy["in_flight"], busy["queue_depth"]) == (1, 1)
+    assert results == ["$2b$hash", "$2b$hash"]
+    assert all(name.startswith("bcrypt") for name in threads) and len(threads) == 2
+    assert (idle["rejected"], idle["in_flight"], idle["queue_depth"]) == (1, 0, 0)
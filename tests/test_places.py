@@ -0,0 +1,60 @@
+import asyncio
+
+from facility_index import FacilitySnapshotCache
+from places import PlaceIndex, city_key, normalize_place
+
+
+def hospital(city, state="Tamil Nadu", district=None, lat=9.0, lng=78.0):
+    return {"city": city, "state": state, "district": district, "lat": lat, "lng": lng}
+
+
+def test_city_key_folds_spelling_and_maps_aliases():
+    assert normalize_place("  Thoothukudi, T.N. ") == "thoothukudi t n"
+    assert normalize_place("Tiruchirāppalli") == "tiruchirappalli"
+    assert city_key("TUTICORIN") == city_key("Thoothukkudi") == city_key("thoothukudi") == "thoothukudi"
+    assert city_key("Bengaluru") == "bangalore"
+    assert city_key("Kovilpatti") == "kovilpatti"
+
+
+def test_aliases_find_the_canonical_place_once():
+    index = PlaceIndex([hospital("Thoothukudi"), hospital("Thoothukudi"), hospital("Tiruchirappalli")])
+    [place] = index.complete("tuti")
+    assert (place["name"], place["kind"], place["hospitals"], place["matched"]) == ("Thoothukudi", "city", 2, "Tuticorin")
+    # Both spellings match "t": the place is listed once, under its own name
+    names = [(p["name"], p["matched"]) for p in index.complete("t") if p["kind"] == "city"]
+    assert names == [("Thoothukudi", "Thoothukudi"), ("Tiruchirappalli", "Tiruchirappalli")]
+    assert index.complete("  ") == [] and index.complete("xyz") == []
+
+
+def test_completions_rank_by_hospital_count_then_name_across_kinds():
+    index = PlaceIndex([
+        hospital("Madurai", district="Madurai"), hospital("Madurai", district="Madurai"),
+        hospital("Manamadurai", district="Sivaganga"), hospital("Mandapam", district="Ramanathapuram"),
+        hospital("Mumbai", state="Maharashtra"),
+    ])
+    results = index.complete("ma", limit=4)
+    assert [(p["name"], p["kind"], p["hospitals"]) for p in results] == [
+        ("Madurai", "city", 2), ("Madurai", "district", 2), ("Maharashtra", "state", 1), ("Manamadurai", "city", 1)]
+    assert [p["name"] for p in index.complete("Mum")] == ["Mumbai"]
+
+
+def test_index_follows_the_snapshot_after_invalidation():
+    async def main():
+        docs = [hospital("Kovilpatti")]
+
+        async def loader():
+            return list(docs)
+
+        cache = FacilitySnapshotCache(loader, ttl=300)
+        before = (await cache.get()).derived("places", PlaceIndex).complete("kov")
+        docs.append(hospital("Kovilpatti"))
+        docs.append(hospital("Kodaikanal"))
+        stale = (await cache.get()).derived("places", PlaceIndex).complete("ko")
+        cache.invalidate()
+        fresh = (await cache.get()).derived("places", PlaceIndex).complete("ko")
+        return before, stale, fresh
+
+    before, stale, fresh = asyncio.run(main())
+    assert [(p["name"], p["hospitals"]) for p in before] == [("Kovilpatti", 1)]
+    assert stale == before
+    assert [(p["name"], p["hospitals"]) for p in fresh] == [("Kovilpatti", 2), ("Kodaikanal", 1)]
@@ -0,0 +1,80 @@
+import asyncio
+
+from pubsub import InProcessBroker, Subscription
+
+
+def position(n):
+    return {"type": "position", "n": n}
+
+
+def status(n):
+    return {"type": "status", "n": n}
+
+
+def drain(sub):
+    async def collect():
+        messages = []
+        while (message := await sub.get(timeout=0)) is not None:
+            messages.append(message)
+        return messages
+    return asyncio.run(collect())
+
+
+def test_slow_consumer_gets_only_the_latest_position_in_its_original_place():
+    sub = Subscription("t")
+    sub.deliver(status(1))
+    sub.deliver(position(1))
+    sub.deliver(status(2))
+    sub.deliver(position(2))
+    sub.deliver(position(3))
+    assert drain(sub) == [status(1), position(3), status(2)]
+    assert (sub.coalesced, sub.dropped) == (2, 0)
+
+    # Once delivered, the next position queues behind newer messages again
+    sub.deliver(status(3))
+    sub.deliver(position(4))
+    assert drain(sub) == [status(3), position(4)]
+
+
+def test_overflow_drops_the_oldest_messages():
+    sub = Subscription("t", maxsize=3)
+    sub.deliver(position(1))
+    for n in range(1, 5):
+        sub.deliver(status(n))
+    # The pending position was the oldest entry and went first
+    assert drain(sub) == [status(2), status(3), status(4)]
+    assert sub.dropped == 2
+
+    sub.deliver(position(2))
+    assert drain(sub) == [position(2)]
+
+
+def test_get_times_out_and_closed_subscriptions_ignore_deliveries():
+    sub = Subscription("t")
+    assert asyncio.run(sub.get(timeout=0.01)) is None
+    sub.deliver(status(1))
+    sub.close()
+    sub.deliver(status(2))
+    assert drain(sub) == []
+
+
+def test_broker_fans_out_per_topic_and_forgets_empty_topics():
+    async def main():
+        broker = InProcessBroker(queue_size=4)
+        a, b, other = broker.subscribe("r1"), broker.subscribe("r1"), broker.subscribe("r2")
+        waiting = asyncio.create_task(a.get(timeout=1))
+        await broker.publish("r1", status(1))
+        first = await waiting
+        broker.unsubscribe(a)
+        await broker.publish("r1", position(1))
+        await broker.publish("r1", position(2))
+        stats = broker.stats()
+        broker.unsubscribe(b)
+        broker.unsubscribe(other)
+        return first, await b.get(timeout=0), await other.get(timeout=0), stats, broker.stats()
+
+    first, for_b, for_other, stats, after = asyncio.run(main())
+    # Unsubscribing discards what was still pending
+    assert first == status(1) and for_b is None and for_other is None
+    assert (stats["topics"], stats["subscribers"], stats["published"], stats["coalesced"]) == (2, 2, 3, 1)
+    assert (after["topics"], after["subscribers"]) == (0, 0)
@@ -0,0 +1,106 @@
+import search_index
+from search_index import SearchIndex, tokenize
+
+HOSPITALS = [
+    {"id": "h1", "name": "Kovilpatti Heart Centre", "specialties": ["Cardiology"], "type": "Private",
+     "city": "Kovilpatti", "emergency": True, "ambulance": True, "rating": 4.1},
+    {"id": "h2", "name": "Government Hospital", "specialties": ["Cardiology", "Orthopedics"], "type": "Government",
+     "city": "Kovilpatti", "emergency": True, "ambulance": False, "rating": 3.5},
+    {"id": "h3", "name": "Madurai Cardiac Institute", "specialties": ["Cardiac Surgery"], "type": "Private",
+     "city": "Madurai", "emergency": False, "ambulance": True, "rating": 4.8},
+    {"id": "h4", "name": "Sri Ortho Clinic", "specialties": ["Orthopedics"], "type": "Private",
+     "city": "Thoothukudi", "emergency": False, "ambulance": False, "rating": 4.9},
+]
+
+
+def build():
+    index = SearchIndex({"name": 3, "specialties": 2, "type": 1, "city": 1.5},
+                        facets=["emergency", "ambulance", "specialties", "type"])
+    for doc in HOSPITALS:
+        index.add(doc)
+    return index
+
+
+def ids(result):
+    return [r["id"] for r in result["results"]]
+
+
+def test_tokenize_folds_case_and_accents():
+    assert tokenize("Café  CARDIOLOGY-Unit") == ["cafe", "cardiology", "unit"]
+
+
+def test_every_term_must_match_and_field_weights_rank():
+    index = build()
+    assert ids(index.search("cardiology kovilpatti")) == ["h1", "h2"]
+    # "heart" is only in h1's name
+    assert ids(index.search("heart")) == ["h1"]
+    assert index.search("cardiology chennai")["total"] == 0
+
+
+def test_last_term_matches_as_prefix_and_exact_outranks_prefix():
+    index = build()
+    assert set(ids(index.search("cardi"))) == {"h1", "h2", "h3"}
+    assert ids(index.search("ortho"))[0] == "h4"
+    assert index.search("cardiology kov")["total"] == 2
+    # Only the last term is a prefix
+    assert index.search("cardi kovilpatti")["total"] == 0
+
+
+def test_filters_and_facets_follow_the_matched_set():
+    index = build()
+    result = index.search("cardiology", {"emergency": True, "type": None})
+    assert set(ids(result)) == {"h1", "h2"}
+    assert result["facets"]["emergency"] == {"true": 2}
+    assert result["facets"]["specialties"] == {"Cardiology": 2, "Orthopedics": 1}
+    assert ids(index.search("", {"specialties": "orthopedics", "ambulance": False})) == ["h4", "h2"]
+
+
+def test_empty_query_browses_by_rating_and_pages():
+    index = build()
+    result = index.search()
+    assert ids(result) == ["h4", "h3", "h1", "h2"]
+    assert result["total"] == 4
+    assert result["facets"]["type"] == {"Private": 3, "Government": 1}
+    assert ids(index.search(limit=2, offset=1)) == ["h3", "h1"]
+
+
+def test_browse_cache_is_dropped_on_add_and_remove():
+    index = build()
+    assert index.search()["total"] == 4
+    index.add({"id": "h5", "name": "New Hospital", "type": "Private", "rating": 5.0})
+    assert ids(index.search(limit=1)) == ["h5"]
+    index.remove("h4")
+    assert index.search()["total"] == 4
+    assert index.search("ortho")["total"] == 1
+    assert index.search("", {"type": "private"})["facets"]["type"] == {"Private": 3}
+
+
+def test_readding_a_document_replaces_its_terms():
+    index = build()
+    index.add({**HOSPITALS[0], "name": "Kovilpatti Medical Centre"})
+    assert index.search("heart")["total"] == 0
+    assert ids(index.search("medical")) == ["h1"]
+    assert len(index) == 4
+
+
+def test_prefix_expansion_keeps_the_exact_term_and_the_most_common_completions(monkeypatch):
+    monkeypatch.setattr(search_index, "MAX_PREFIX_TERMS", 2)
+    index = SearchIndex({"name": 1}, facets=[])
+    for i, name in enumerate(["gov", "gova", "govb", "govb", "govc", "govc", "govc"]):
+        index.add({"id": f"d{i}", "name": name})
+    assert sorted(index._expand("gov", prefix=True)) == ["gov", "govc"]
+    assert index.search("gov")["total"] == 4
+
+
+def test_broad_queries_score_a_capped_candidate_set(monkeypatch):
+    monkeypatch.setattr(search_index, "MAX_CANDIDATES", 3)
+    index = SearchIndex({"name": 2, "city": 1}, facets=[])
+    for i in range(10):
+        index.add({"id": f"c{i}", "name": "Clinic", "city": "Madurai", "rating": i / 10})
+    index.add({"id": "named", "name": "Madurai Clinic", "city": "Madurai", "rating": 0})
+    # The capped set keeps the highest-weighted posting, then the best rated
+    assert ids(index.search("madurai")) == ["named", "c9", "c8"]
+    assert index.search("madurai")["total"] == 3
+    # The rarest token supplies the candidates, so a rare term is found behind a common one
+    index.add({"id": "rare", "name": "Clinic Rare", "city": "Madurai", "rating": 0})
+    assert ids(index.search("clinic rare")) == ["rare"]
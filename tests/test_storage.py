@@ -0,0 +1,222 @@
+"""The same repository operations against both storage backends (Mongo via mongomock)."""
+import asyncio
+import uuid
+
+import pytest
+
+import bp_analytics
+import loadtest
+from storage import create_repositories
+
+HOSPITALS = [
+    {"id": "h1", "name": "Government Hospital", "city": "Kovilpatti", "lat": 9.1742, "lng": 77.8697, "rating": 3.9},
+    {"id": "h2", "name": "CSI Hospital", "city": "Thoothukudi", "lat": 8.7642, "lng": 78.1348, "rating": 4.2},
+    {"id": "h3", "name": "Meenakshi Mission", "city": "Madurai", "lat": 9.9252, "lng": 78.1198, "rating": 4.6},
+    {"id": "h4", "name": "Apollo", "city": "Chennai", "lat": 13.0827, "lng": 80.2707, "rating": 4.8},
+]
+
+
+@pytest.fixture(scope="module")
+def mongo_stand_in():
+    """mongomock in place of Motor for this module only."""
+    import storage_mongo  # noqa: F401 -- imported first so its AsyncIOMotorClient is patched too
+    restore = loadtest.install_mongo_stand_in()
+    yield
+    restore()
+
+
+@pytest.fixture(params=["mongo", "sqlite"])
+def run(request, tmp_path, monkeypatch, mongo_stand_in):
+    """Run ``scenario(repos)`` against freshly prepared, empty repositories."""
+    monkeypatch.setenv("MONGO_URL", "mongodb://localhost:27017")
+    monkeypatch.setenv("DB_NAME", f"test_{uuid.uuid4().hex}")
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "carelens.db"))
+
+    def run(scenario):
+        async def main():
+            repos = create_repositories(request.param)
+            await repos.prepare()
+            try:
+                return await scenario(repos)
+            finally:
+                await repos.close()
+        return asyncio.run(main())
+
+    return run
+
+
+def reading(user_id, recorded_at, systolic, status="normal"):
+    return {"id": str(uuid.uuid4()), "user_id": user_id, "recorded_at": recorded_at,
+            "systolic": systolic, "diastolic": 80, "pulse": 70, "status": status}
+
+
+def message(session_id, role, content, timestamp, user_id="u1"):
+    return {"session_id": session_id, "user_id": user_id, "role": role, "content": content,
+            "language": "Tamil", "timestamp": timestamp}
+
+
+def test_hospital_upsert_keeps_fields_the_update_lacks(run):
+    async def scenario(repos):
+        first = await repos.hospitals.upsert_many(HOSPITALS[:2])
+        second = await repos.hospitals.upsert_many([
+            {"id": "h1", "name": "Government Hospital Kovilpatti", "city": "Kovilpatti", "lat": 9.18, "lng": 77.87},
+            HOSPITALS[2],
+        ])
+        return first, second, await repos.hospitals.count(), await repos.hospitals.by_city_prefix("kovil")
+
+    first, second, count, [h1] = run(scenario)
+    assert (first, second, count) == ((2, 0), (1, 1), 3)
+    assert h1 == {"id": "h1", "name": "Government Hospital Kovilpatti", "city": "Kovilpatti",
+                  "lat": 9.18, "lng": 77.87, "rating": 3.9}
+
+
+def test_nearby_and_city_scans(run):
+    async def scenario(repos):
+        await repos.hospitals.insert_many(HOSPITALS)
+        return (
+            await repos.hospitals.nearby(9.17, 77.87, 100),
+            await repos.hospitals.nearby(9.17, 77.87, 100, skip=1, limit=1),
+            await repos.hospitals.by_city_prefix("ch"),
+            await repos.hospitals.by_city_prefix("x"),
+            await repos.hospitals.all(),
+        )
+
+    nearby, page, chennai, none, everything = run(scenario)
+    assert [h["id"] for h in nearby] == ["h1", "h2", "h3"]
+    assert [h["distance_km"] for h in nearby] == sorted(h["distance_km"] for h in nearby)
+    assert nearby[0]["distance_km"] == 0.5
+    assert [h["id"] for h in page] == ["h2"]
+    assert [h["id"] for h in chennai] == ["h4"] and none == []
+    # Storage-only fields never reach callers
+    assert all(set(h) == set(HOSPITALS[0]) for h in everything)
+
+
+def test_bp_records_rollups_and_stats(run):
+    docs = [
+        reading("u1", "2026-03-01T03:00:00+00:00", 120),
+        reading("u1", "2026-03-01T13:00:00+00:00", 150, "high"),
+        reading("u1", "2026-03-02T03:00:00+00:00", 130),
+        reading("u2", "2026-03-01T03:00:00+00:00", 110),
+    ]
+
+    async def scenario(repos):
+        await repos.bp_records.insert_many(docs)
+        await bp_analytics.apply_readings(repos.bp_rollups, docs)
+        await repos.user_stats.record_bp("u1", 3, docs[2])
+        # An older reading uploaded later does not replace latest_bp
+        await repos.user_stats.record_bp("u1", 1, reading("u1", "2020-01-01T00:00:00+00:00", 100))
+        incremental = await repos.bp_rollups.since("u1", "2026-03-01", 10)
+        rebuilt_users = await bp_analytics.backfill(repos, "u1")
+        # A user with rollups but no readings is cleared, not left stale
+        await repos.bp_rollups.increment({("u3", "2026-03-01"): {"count": 1}})
+        cleared_users = await bp_analytics.backfill(repos, "u3")
+        return (
+            incremental, await repos.bp_rollups.since("u1", "2026-03-01", 10), rebuilt_users + cleared_users,
+            await repos.bp_rollups.since("u3", "2026-01-01", 10),
+            await repos.bp_records.recent("u1", 2), await repos.bp_records.count("u1"),
+            await repos.bp_records.latest("u1"),
+            await repos.bp_records.series("u1", "2026-03-01T00:00:00", "2026-03-01T23:59:59", ("recorded_at", "systolic")),
+            await repos.user_stats.get("u1"),
+        )
+
+    incremental, rebuilt, users, cleared, recent, count, latest, series, stats = run(scenario)
+    by_day = {r["day"]: r for r in incremental}
+    assert by_day["2026-03-01"]["count"] == 2 and by_day["2026-03-01"]["high_count"] == 1
+    assert by_day["2026-03-01"]["morning"]["count"] == 1 and by_day["2026-03-01"]["evening"]["systolic_sum"] == 150
+    assert sorted(rebuilt, key=lambda r: r["day"]) == sorted(incremental, key=lambda r: r["day"])
+    assert users == 2 and cleared == []
+    assert [r["systolic"] for r in recent] == [130, 150] and count == 3 and latest["systolic"] == 130
+    assert series == [{"recorded_at": d["recorded_at"], "systolic": d["systolic"]} for d in docs[:2]]
+    assert (stats["bp_readings"], stats["latest_bp"]["systolic"]) == (4, 130)
+
+
+def test_merge_counts_never_lowers_counters(run):
+    newer = reading("u1", "2026-03-02T00:00:00+00:00", 140)
+    older = reading("u1", "2026-03-01T00:00:00+00:00", 120)
+
+    async def scenario(repos):
+        await repos.user_stats.record_bp("u1", 1, newer)
+        await repos.user_stats.increment("u1", {"ai_consultations": 5})
+        merged = await repos.user_stats.merge_counts(
+            "u1", {"bp_readings": 3, "ai_consultations": 2, "ambulance_requests": 1},
+            latest_bp=older, fields={"backfilled": True},
+        )
+        fresh = await repos.user_stats.merge_counts("u2", {"bp_readings": 2}, latest_bp=older)
+        return merged, fresh
+
+    merged, fresh = run(scenario)
+    assert {k: merged[k] for k in ("bp_readings", "ai_consultations", "ambulance_requests", "backfilled")} == {
+        "bp_readings": 3, "ai_consultations": 5, "ambulance_requests": 1, "backfilled": True}
+    assert merged["latest_bp"] == newer
+    assert (fresh["bp_readings"], fresh["latest_bp"]) == (2, older)
+
+
+def test_session_summaries_and_merge(run):
+    async def scenario(repos):
+        await repos.chat_messages.insert_many([
+            message("s1", "user", "q1", "2026-01-01T00:00:00"),
+            message("s1", "assistant", "a1", "2026-01-01T00:00:01"),
+            message("s2", "user", "q2", "2026-01-02T00:00:00"),
+            message("s1", "user", "other user", "2026-01-03T00:00:00", user_id="u2"),
+        ])
+        summaries = sorted(await repos.chat_messages.session_summaries("u1"), key=lambda s: s["session_id"])
+        # s1 got a new exchange before its first backfill
+        await repos.chat_sessions.record_exchange("u1", "s1", "a2", "2026-02-01T00:00:00", "English")
+        for s in summaries:
+            await repos.chat_sessions.merge_summary("u1", s["session_id"], {**s, "message_count": s["count"]})
+        return (summaries, await repos.chat_sessions.list("u1"), await repos.chat_messages.count_user_turns("u1"),
+                await repos.chat_messages.recent("s1", "u1", 1))
+
+    summaries, sessions, turns, recent = run(scenario)
+    assert [(s["session_id"], s["count"], s["last_message"], s["created_at"]) for s in summaries] == [
+        ("s1", 2, "a1", "2026-01-01T00:00:00"), ("s2", 1, "q2", "2026-01-02T00:00:00")]
+    s1, s2 = sessions
+    assert (s1["session_id"], s1["message_count"], s1["last_message"], s1["language"]) == ("s1", 2, "a2", "English")
+    assert s1["created_at"] == "2026-01-01T00:00:00"
+    assert (s2["session_id"], s2["message_count"], s2["last_message"]) == ("s2", 1, "q2")
+    assert turns == 2 and [m["content"] for m in recent] == ["a1"]
+
+
+def test_ambulance_lifecycle(run):
+    def request(request_id, status, busy_until=None, created_at="2026-01-01T00:00:00+00:00"):
+        doc = {"id": request_id, "user_id": "u1", "status": status, "created_at": created_at, "lat": 9.17, "lng": 77.87}
+        if busy_until:
+            doc["busy_until"] = busy_until
+        return doc
+
+    async def scenario(repos):
+        for doc in [
+            request("queued", "queued", created_at="2026-01-02T00:00:00+00:00"),
+            request("legacy", "dispatched"),
+            request("back", "dispatched", "2026-01-01T01:00:00+00:00"),
+            request("out", "dispatched", "2026-01-01T09:00:00+00:00"),
+            request("done", "completed"),
+        ]:
+            await repos.ambulance.insert(doc)
+        closed = await repos.ambulance.finish_elapsed("2026-01-01T05:00:00+00:00", {"status": "completed"})
+        still_open = [r["id"] for r in await repos.ambulance.open()]
+        first_open = [r["id"] for r in await repos.ambulance.open(1)]
+        completed = await repos.ambulance.close_open("out", "u1", {"status": "completed"})
+        again = await repos.ambulance.close_open("out", "u1", {"status": "completed"})
+        await repos.ambulance.finish(["queued", "done"], {"status": "expired"})
+        return (closed, still_open, first_open, completed, again,
+                {r: (await repos.ambulance.get(r))["status"] for r in ("queued", "legacy", "done")},
+                await repos.ambulance.count("u1"))
+
+    closed, still_open, first_open, completed, again, statuses, count = run(scenario)
+    assert closed == 2
+    assert still_open == ["out", "queued"] and first_open == ["out"]
+    assert completed["status"] == "completed" and "_id" not in completed and again is None
+    assert statuses == {"queued": "expired", "legacy": "completed", "done": "completed"}
+    assert count == 5
+
+
+def test_data_versions_count_bumps_per_name(run):
+    async def scenario(repos):
+        empty = await repos.data_versions.get()
+        await repos.data_versions.bump("hospitals")
+        await repos.data_versions.bump("hospitals")
+        await repos.data_versions.bump("doctors")
+        return empty, await repos.data_versions.get()
+
+    assert run(scenario) == ({}, {"hospitals": 2, "doctors": 1})
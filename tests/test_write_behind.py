@@ -0,0 +1,116 @@
+import asyncio
+
+from write_behind import WriteBehindBuffer
+
+
+class FakeCollection:
+    def __init__(self, name="bp_records", fail=False):
+        self.name = name
+        self.fail = fail
+        self.batches = []
+
+    async def insert_many(self, docs, ordered=True):
+        if self.fail:
+            raise RuntimeError("insert failed")
+        self.batches.append([d["n"] for d in docs])
+
+
+def docs(*numbers, user_id="u1"):
+    return [{"n": n, "user_id": user_id} for n in numbers]
+
+
+def test_writes_through_until_started():
+    async def main():
+        buffer = WriteBehindBuffer()
+        collection = FakeCollection()
+        await buffer.add(collection, docs(1, 2))
+        return collection.batches, buffer.pending
+
+    assert asyncio.run(main()) == ([[1, 2]], 0)
+
+
+def test_flushes_when_a_collection_reaches_max_batch():
+    async def main():
+        buffer = WriteBehindBuffer(max_batch=3, flush_interval=60)
+        collection = FakeCollection()
+        buffer.start()
+        await buffer.add(collection, docs(1, 2))
+        await asyncio.sleep(0.01)
+        before = list(collection.batches)
+        await buffer.add(collection, docs(3, 4))
+        await asyncio.sleep(0.01)
+        after = list(collection.batches)
+        await buffer.close()
+        return before, after
+
+    before, after = asyncio.run(main())
+    assert before == []
+    # Batches never exceed max_batch
+    assert after == [[1, 2, 3], [4]]
+
+
+def test_flushes_on_the_interval_and_shows_buffered_documents_meanwhile():
+    async def main():
+        buffer = WriteBehindBuffer(max_batch=100, flush_interval=0.05)
+        collection = FakeCollection()
+        buffer.start()
+        await buffer.add(collection, docs(1) + docs(2, user_id="u2"))
+        buffered = buffer.buffered("bp_records", lambda d: d["user_id"] == "u1")
+        await asyncio.sleep(0.15)
+        flushed = list(collection.batches)
+        await buffer.close()
+        return buffered, flushed, buffer.buffered("bp_records", lambda d: True)
+
+    buffered, flushed, after = asyncio.run(main())
+    assert buffered == [{"n": 1, "user_id": "u1"}]
+    assert flushed == [[1, 2]] and after == []
+
+
+def test_close_drains_everything_and_later_adds_write_through():
+    async def main():
+        buffer = WriteBehindBuffer(max_batch=100, flush_interval=60)
+        records, messages = FakeCollection(), FakeCollection("chat_messages")
+        buffer.start()
+        await buffer.add(records, docs(1, 2))
+        await buffer.add(messages, docs(3))
+        await buffer.close()
+        drained = (list(records.batches), list(messages.batches))
+        await buffer.add(records, docs(4))
+        return drained, records.batches, buffer.stats()
+
+    drained, batches, stats = asyncio.run(main())
+    assert drained == ([[1, 2]], [[3]])
+    assert batches == [[1, 2], [4]]
+    assert (stats["pending"], stats["written"], stats["failed"]) == (0, 3, 0)
+
+
+def test_failed_inserts_are_counted_and_do_not_stop_other_collections():
+    async def main():
+        buffer = WriteBehindBuffer(max_batch=100, flush_interval=60)
+        broken, healthy = FakeCollection("broken", fail=True), FakeCollection()
+        buffer.start()
+        await buffer.add(broken, docs(1, 2))
+        await buffer.add(healthy, docs(3))
+        await buffer.flush()
+        await buffer.add(healthy, docs(4))
+        await buffer.close()
+        return healthy.batches, buffer.stats()
+
+    batches, stats = asyncio.run(main())
+    assert batches == [[3], [4]]
+    assert (stats["written"], stats["failed"], stats["pending"]) == (2, 2, 0)
+
+
+def test_callers_past_max_pending_wait_for_a_flush():
+    async def main():
+        buffer = WriteBehindBuffer(max_batch=100, flush_interval=60, max_pending=3)
+        collection = FakeCollection()
+        buffer.start()
+        await buffer.add(collection, docs(1, 2))
+        pending = buffer.pending
+        await buffer.add(collection, docs(3))
+        result = (pending, buffer.pending, list(collection.batches))
+        await buffer.close()
+        return result
+
+    assert asyncio.run(main()) == (2, 0, [[1, 2, 3]])